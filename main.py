@@ -1,496 +1,648 @@
 # ============================================
-# APP CHASIDE · 3 pestañas laterales
-# Presentación | Análisis general | Información individual
+# APP CHASIDE · 5 pestañas laterales
+# Presentación | Análisis general | Información individual | Histórico de cohortes | Análisis de reactivos
 # ============================================
 
-import io
+import functools
+import hashlib
+import os
+from datetime import datetime
+
 import numpy as np
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_LEFT
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from motor_chaside import (
+    AREAS,
+    AREAS_LONG,
+    DEFAULT_PERFILES,
+    ESTRATEGIAS_CHASIDE,
+    DESC_INTENSIDAD,
+    CAT_MAP_LARGO,
+    COLUMNA_EMAIL,
+    COLUMNA_CAMPUS,
+    CRITERIOS_DUPLICADOS,
+    CRITERIO_DUPLICADOS,
+    INDICADORES_CALIDAD,
+    CRITERIOS_CALIDAD,
+    RUTA_HISTORICO,
+    RUTA_INSTANTANEAS,
+    ETIQUETAS_SEMAFORO,
+    RegistroResultados,
+    Precalentamiento,
+    validadores_fuentes,
+    huella_contenido,
+    clave_instantanea,
+    guardar_instantanea,
+    cargar_instantanea,
+    cargar_duplicados_instantanea,
+    parsear_fuentes,
+    cargar_fuentes,
+    depurar_duplicados,
+    dataframe_a_excel_bytes,
+    resolver_umbral_calidad,
+    describir_criterios_calidad,
+    process_data,
+    actualizar_por_perfiles,
+    build_pdf_report,
+    config_smtp,
+    BitacoraEnvios,
+    RUTA_BITACORA_ENVIOS,
+    enviar_reportes,
+    construir_conclusion_recomendacion,
+    conclusiones_cohorte,
+    bootstrap_pareto,
+    agrupar_perfiles,
+    nombrar_grupos,
+    IndiceHamming,
+    TablasNormativas,
+    recomendar_carreras,
+    describir_percentiles,
+    TOTAL_COHORTE,
+    CORRELACION_ITEM_RESTO_MIN,
+    TASA_SI_MIN,
+    TASA_SI_MAX,
+    acumular_momentos,
+    analisis_reactivos,
+    alfa_por_area,
+    barrido_sensibilidad_pesos,
+    resumir_estabilidad,
+    guardar_cohorte,
+    listar_cohortes,
+    listar_carreras_historico,
+    clasificacion_resultado,
+    clasificacion_historico,
+    comparar_clasificaciones,
+    tendencia_por_columna,
+    promedio_areas_historico,
+    historial_estudiante
+)
+
 
 # -------------------------------------------------
 # CONFIG
 # -------------------------------------------------
 st.set_page_config(page_title="Diagnóstico Vocacional - Escala CHASIDE", layout="wide")
 
-# -------------------------------------------------
-# CONSTANTES
-# -------------------------------------------------
-AREAS = ['C', 'H', 'A', 'S', 'I', 'D', 'E']
-
-AREAS_LONG = {
-    "C": "Administrativo",
-    "H": "Humanidades y Sociales",
-    "A": "Artístico",
-    "S": "Ciencias de la Salud",
-    "I": "Enseñanzas Técnicas",
-    "D": "Defensa y Seguridad",
-    "E": "Ciencias Experimentales"
-}
+# Las vistas de los resultados compartidos no copian datos mientras nadie los modifique
+# (comportamiento predeterminado desde pandas 3).
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
 
-INTERESES_ITEMS = {
-    'C': [1, 12, 20, 53, 64, 71, 78, 85, 91, 98],
-    'H': [9, 25, 34, 41, 56, 67, 74, 80, 89, 95],
-    'A': [3, 11, 21, 28, 36, 45, 50, 57, 81, 96],
-    'S': [8, 16, 23, 33, 44, 52, 62, 70, 87, 92],
-    'I': [6, 19, 27, 38, 47, 54, 60, 75, 83, 97],
-    'D': [5, 14, 24, 31, 37, 48, 58, 65, 73, 84],
-    'E': [17, 32, 35, 42, 49, 61, 68, 77, 88, 93]
-}
+FUENTE_PREDETERMINADA = os.environ.get(
+    'CHASIDE_FUENTE',
+    "https://docs.google.com/spreadsheets/d/1BNAeOSj2F378vcJE5-T8iJ8hvoseOleOHr-I7mVfYu4/export?format=csv"
+)
 
-APTITUDES_ITEMS = {
-    'C': [2, 15, 46, 51],
-    'H': [30, 63, 72, 86],
-    'A': [22, 39, 76, 82],
-    'S': [4, 29, 40, 69],
-    'I': [10, 26, 59, 90],
-    'D': [13, 18, 43, 66],
-    'E': [7, 55, 79, 94]
+PRESETS_PESOS = {
+    "80 / 20 (predeterminado)": (0.8, 0.2),
+    "70 / 30": (0.7, 0.3),
+    "60 / 40": (0.6, 0.4),
+    "50 / 50": (0.5, 0.5)
 }
 
-DEFAULT_PERFILES = {
-    'Arquitectura': ['A', 'I', 'C'],
-    'Contador Público': ['C', 'D'],
-    'Licenciatura en Administración': ['C', 'D'],
-    'Ingeniería Ambiental': ['I', 'C', 'E'],
-    'Ingeniería Bioquímica': ['I', 'C', 'E'],
-    'Ingeniería en Gestión Empresarial': ['C', 'D', 'H'],
-    'Ingeniería Industrial': ['C', 'D', 'H'],
-    'Ingeniería en Inteligencia Artificial': ['I', 'E'],
-    'Ingeniería Mecatrónica': ['I', 'E'],
-    'Ingeniería en Sistemas Computacionales': ['I', 'E']
-}
+K_GRUPOS_PREDETERMINADO = 4
+K_RECOMENDACIONES = 3
 
-ESTRATEGIAS_CHASIDE = {
-    "C": {
-        "area": "Administrativo",
-        "estrategia": (
-            "Fortalecer organización, planeación, seguimiento de instrucciones, "
-            "gestión del tiempo y resolución estructurada de problemas."
-        )
-    },
-    "H": {
-        "area": "Humanidades y Sociales",
-        "estrategia": (
-            "Promover comunicación oral y escrita, argumentación, comprensión de textos, "
-            "análisis de casos y trabajo colaborativo."
-        )
-    },
-    "A": {
-        "area": "Artístico",
-        "estrategia": (
-            "Incorporar ejercicios de creatividad, diseño, visualización de ideas, "
-            "prototipos y solución innovadora de problemas."
-        )
-    },
-    "S": {
-        "area": "Ciencias de la Salud",
-        "estrategia": (
-            "Favorecer observación, precisión, estudio de casos, empatía profesional "
-            "y actividades con orientación al servicio."
-        )
-    },
-    "I": {
-        "area": "Enseñanzas Técnicas",
-        "estrategia": (
-            "Reforzar pensamiento lógico, modelado, cálculo, uso de herramientas, "
-            "prácticas guiadas y resolución técnica de problemas."
-        )
-    },
-    "D": {
-        "area": "Defensa y Seguridad",
-        "estrategia": (
-            "Impulsar liderazgo, disciplina, trabajo en equipo, responsabilidad "
-            "y toma de decisiones en contextos estructurados."
-        )
-    },
-    "E": {
-        "area": "Ciencias Experimentales",
-        "estrategia": (
-            "Estimular observación sistemática, experimentación, interpretación de datos, "
-            "método y pensamiento crítico."
-        )
-    }
+COLORES_SEMAFORO = {
+    'Verde': '#22c55e',
+    'Amarillo': '#f59e0b',
+    'Rojo': '#6b7280',
+    'Sin sugerencia': '#9ca3af',
+    'Respondió siempre igual': '#ef4444'
 }
 
-DESC_INTENSIDAD = {
-    "Sin perfil": "Estudiante cuya elección de carrera no muestra correspondencia con su perfil vocacional.",
-    "Perfil en riesgo": "Estudiante cuyo perfil vocacional presenta una coincidencia mínima con la carrera elegida.",
-    "Perfil en transición": "Estudiante cuya elección profesional y perfil vocacional presentan congruencia, aunque aún en proceso de consolidación.",
-    "Jóven promesa": "Estudiante con alta congruencia entre su perfil vocacional y la carrera elegida."
+COLORES_INTENSIDAD = {
+    'Sin perfil': '#dc2626',
+    'Perfil en riesgo': '#f59e0b',
+    'Perfil en transición': '#84cc16',
+    'Jóven promesa': '#16a34a'
 }
 
-CAT_MAP_LARGO = {
-    'Verde': 'El perfil coincide con la carrera elegida',
-    'Amarillo': 'El perfil NO va acorde con la carrera elegida',
-    'Rojo': 'No se observa un perfil prioritario',
-    'Sin sugerencia': 'No se observa un perfil prioritario',
-    'Respondió siempre igual': 'Respondió siempre igual'
-}
-
-COLUMNA_EMAIL = 'Dirección de correo electrónico'
 
 # -------------------------------------------------
-# UTILIDADES
+# CACHÉS DE STREAMLIT
 # -------------------------------------------------
-def col_item(columnas_items, i: int) -> str:
-    return columnas_items[i - 1]
+@st.cache_data(show_spinner=False)
+def load_data(fuentes: tuple, criterio_duplicados: str, validadores: tuple):
+    # Los envíos repetidos se depuran al cargar, antes de puntuar: (df depurado, reporte de descartados).
+    # Los validadores sólo forman parte de la clave: si la fuente cambió, se vuelve a descargar.
+    # Una fuente sin ETag ni Last-Modified llega como None y su descarga queda en caché todo el proceso.
+    return depurar_duplicados(cargar_fuentes(list(fuentes)), criterio_duplicados)
+
+
+def clave_version(fuentes, criterio_duplicados, peso_intereses, peso_aptitudes, criterios, perfiles):
+    # (clave sin perfiles, versión completa): la primera decide si basta la actualización incremental.
+    clave_procesamiento = (
+        fuentes,
+        criterio_duplicados,
+        peso_intereses,
+        peso_aptitudes,
+        tuple((k, c['modo'], c['valor']) for k, c in criterios.items())
+    )
+    return clave_procesamiento, clave_procesamiento + (tuple((c, tuple(l)) for c, l in perfiles.items()),)
 
 
-def transformar_url_google_sheets(url: str) -> str:
-    url = url.strip()
+def perfiles_version(version) -> dict:
+    # Los perfiles por carrera son el último componente de la versión (ver clave_version).
+    return {c: list(letras) for c, letras in version[-1]}
 
-    if "export?format=csv" in url:
-        return url
 
-    if "docs.google.com/spreadsheets" in url:
-        try:
-            file_id = url.split("/d/")[1].split("/")[0]
+def identificador_version(version) -> str:
+    # Huella corta y estable de la versión (fuentes, pesos, criterios y perfiles) para mostrar.
+    return hashlib.sha256(repr(version).encode()).hexdigest()[:8]
 
-            gid = "0"
-            if "gid=" in url:
-                gid = url.split("gid=")[-1].split("&")[0].split("#")[0]
 
-            return f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=csv&gid={gid}"
-        except Exception:
-            raise ValueError(
-                "No se pudo transformar automáticamente el enlace de Google Sheets. "
-                "Pega el vínculo en formato /edit o directamente en formato /export?format=csv."
-            )
+def describir_cambio_version(anterior, actual) -> str:
+    componentes = [
+        'fuente de datos', 'criterio de duplicados', 'peso de intereses', 'peso de aptitudes',
+        'criterios de calidad', 'perfiles por carrera'
+    ]
+    return ', '.join(c for c, a, b in zip(componentes, anterior, actual) if a != b)
 
-    return url
 
+def huella_datos_fuentes(fuentes, criterio_duplicados) -> tuple:
+    # (validadores, huella de los datos). Si alguna fuente remota no da ETag ni Last-Modified,
+    # la huella incluye el contenido descargado; como la descarga queda en load_data, todas las
+    # versiones que se calculen en el proceso parten de esos mismos datos.
+    validadores = validadores_fuentes(fuentes)
+    if all(v is not None for v in validadores):
+        return validadores, list(validadores)
+    df_raw, _ = load_data(fuentes, criterio_duplicados, validadores)
+    return validadores, list(validadores) + [huella_contenido(df_raw)]
 
-@st.cache_data(show_spinner=False)
-def load_data(url: str) -> pd.DataFrame:
-    final_url = transformar_url_google_sheets(url)
-    return pd.read_csv(final_url)
 
+def guardar_instantanea_version(fuentes, huella_datos, criterio_duplicados, peso_intereses, peso_aptitudes,
+                                criterios, perfiles, resultado, duplicados):
+    # La instantánea es una optimización: si no se puede escribir, la app sigue con el resultado en memoria.
+    clave = clave_instantanea(
+        fuentes, huella_datos, peso_intereses, peso_aptitudes, criterios, perfiles, criterio_duplicados
+    )
+    try:
+        guardar_instantanea(RUTA_INSTANTANEAS, clave, resultado, {
+            'fuentes': [list(f) for f in fuentes],
+            'huella_datos': huella_datos,
+            'criterio_duplicados': criterio_duplicados,
+            'peso_intereses': peso_intereses,
+            'peso_aptitudes': peso_aptitudes,
+            'criterios_calidad': criterios,
+            'perfiles': perfiles
+        }, duplicados)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def procesar_version(fuentes, criterio_duplicados, peso_intereses, peso_aptitudes, criterios, perfiles):
+    # Sólo la instantánea en disco se busca por la huella del contenido actual de las fuentes:
+    # una instantánea de datos que ya cambiaron no se reutiliza. El registro en memoria se indexa
+    # por clave_version, sin huella, así que una versión que alguna sesión o el registro aún
+    # retienen se sigue sirviendo aunque la fuente haya cambiado. Con una instantánea vigente se
+    # lee el archivo Arrow sin puntuar; si no la hay, se puntúa y se deja la instantánea para el siguiente.
+    # Devuelve (resultado, reporte de duplicados descartados, huella de los datos, error al guardar).
+    validadores, huella_datos = huella_datos_fuentes(fuentes, criterio_duplicados)
+    clave = clave_instantanea(
+        fuentes, huella_datos, peso_intereses, peso_aptitudes, criterios, perfiles, criterio_duplicados
+    )
+    resultado = cargar_instantanea(RUTA_INSTANTANEAS, clave)
+    if resultado is not None:
+        return resultado, cargar_duplicados_instantanea(RUTA_INSTANTANEAS, clave), huella_datos, None
+    df_raw, duplicados = load_data(fuentes, criterio_duplicados, validadores)
+    resultado = process_data(df_raw, perfiles, peso_intereses, peso_aptitudes, criterios)
+    return resultado, duplicados, huella_datos, guardar_instantanea_version(
+        fuentes, huella_datos, criterio_duplicados, peso_intereses, peso_aptitudes, criterios, perfiles,
+        resultado, duplicados
+    )
 
-def dataframe_a_excel_bytes(dic_hojas: dict) -> bytes:
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        for nombre_hoja, df_hoja in dic_hojas.items():
-            nombre_limpio = str(nombre_hoja)[:31] if nombre_hoja else "Hoja"
-            df_hoja.to_excel(writer, index=False, sheet_name=nombre_limpio)
-    output.seek(0)
-    return output.getvalue()
 
+@st.cache_resource(show_spinner=False)
+def registro_resultados() -> RegistroResultados:
+    # Un único registro por proceso: todas las sesiones leen el mismo resultado por versión.
+    return RegistroResultados()
 
-def process_data(df: pd.DataFrame, perfil_carreras: dict, peso_intereses: float, peso_aptitudes: float):
-    df = df.copy()
-    df.columns = df.columns.str.strip()
 
-    columna_nombre = 'Ingrese su nombre completo'
-    columna_carrera = '¿A qué carrera desea ingresar?'
+def publicar_version(version, resultado, duplicados, huella_datos):
+    # El reporte de duplicados y la huella de los datos viajan con la versión: cualquier sesión
+    # los usa sin recargar la fuente, y una versión derivada de ésta guarda su instantánea con
+    # la huella de los datos de los que de verdad salió.
+    compartido = registro_resultados().publicar(version, resultado)
+    compartido.fijar('duplicados', duplicados)
+    compartido.fijar('huella_datos', huella_datos)
+    return compartido
 
-    faltantes = [c for c in [columna_nombre, columna_carrera] if c not in df.columns]
-    if faltantes:
-        raise ValueError(
-            f"Faltan columnas requeridas: {faltantes}. "
-            f"Columnas detectadas: {list(df.columns)}"
-        )
 
-    columnas_items = df.columns[6:104]
+def duplicados_descartados(compartido):
+    return compartido.derivado('duplicados', lambda: None)
 
-    if len(columnas_items) != 98:
-        raise ValueError(
-            f"Se esperaban 98 reactivos CHASIDE, pero se detectaron {len(columnas_items)}. "
-            f"Verifica el orden de columnas del archivo."
-        )
 
-    df_items = (
-        df[columnas_items]
-        .astype(str)
-        .apply(lambda col: col.str.strip().str.lower())
-        .replace({
-            'sí': 1, 'si': 1, 's': 1, '1': 1, 'true': 1, 'verdadero': 1, 'x': 1,
-            'no': 0, 'n': 0, '0': 0, 'false': 0, 'falso': 0, '': 0, 'nan': 0
-        })
-        .apply(pd.to_numeric, errors='coerce')
-        .fillna(0)
-        .astype(int)
-    )
-    df[columnas_items] = df_items
+def huella_datos_version(compartido):
+    return compartido.derivado('huella_datos', lambda: None)
 
-    df['Desv_Intrapersona'] = df[columnas_items].std(axis=1)
-    umbral_intrapersonal = df['Desv_Intrapersona'].quantile(0.10)
-    df['Respondio_Siempre_Igual'] = df['Desv_Intrapersona'] <= umbral_intrapersonal
 
-    for a in AREAS:
-        df[f'INTERES_{a}'] = df[[col_item(columnas_items, i) for i in INTERESES_ITEMS[a]]].sum(axis=1)
-        df[f'APTITUD_{a}'] = df[[col_item(columnas_items, i) for i in APTITUDES_ITEMS[a]]].sum(axis=1)
+@st.cache_data(show_spinner=False)
+def barrido_sensibilidad_cacheado(interes, aptitud, carreras, respondio_igual, perfil_carreras):
+    return barrido_sensibilidad_pesos(interes, aptitud, carreras, respondio_igual, perfil_carreras)
+
+
+# -------------------------------------------------
+# LISTADOS DE ESTUDIANTES
+# Se construyen sólo para el nivel o destino que se consulta y se memorizan en la
+# versión compartida, de modo que otras sesiones y reejecuciones los reutilizan.
+# -------------------------------------------------
+NIVELES_INTENSIDAD = ['Sin perfil', 'Perfil en riesgo', 'Perfil en transición', 'Jóven promesa']
+TAMANOS_PAGINA = [25, 50, 100, 250]
+ORDEN_PREDETERMINADO = "Orden predeterminado"
 
-    for a in AREAS:
-        df[f'PUNTAJE_COMBINADO_{a}'] = (
-            df[f'INTERES_{a}'] * peso_intereses +
-            df[f'APTITUD_{a}'] * peso_aptitudes
-        )
-        df[f'TOTAL_{a}'] = df[f'INTERES_{a}'] + df[f'APTITUD_{a}']
 
-    df['Area_Fuerte_Ponderada'] = df.apply(
-        lambda r: max(AREAS, key=lambda a: r[f'PUNTAJE_COMBINADO_{a}']),
-        axis=1
+def conclusiones(compartido) -> pd.Series:
+    df, df_intensidad, _, columna_carrera, _, _ = compartido.resultado
+    return compartido.derivado(
+        'conclusiones', lambda: conclusiones_cohorte(df, df_intensidad, columna_carrera)
     )
 
-    score_cols = [f'PUNTAJE_COMBINADO_{a}' for a in AREAS]
-    df['Score'] = df[score_cols].max(axis=1)
 
-    def evaluar(area_chaside, carrera):
-        p = perfil_carreras.get(str(carrera).strip())
-        if not p:
-            return 'Sin perfil definido'
-        if area_chaside in p:
-            return 'Coherente'
-        return 'Neutral'
+def construir_grupos_perfil(df: pd.DataFrame, k: int) -> dict:
+    validos = ~df['Respondio_Siempre_Igual'].to_numpy(dtype=bool)
+    puntajes = df[[f'PUNTAJE_COMBINADO_{a}' for a in AREAS]].to_numpy(dtype=float)
+    # Se agrupa la forma del perfil (puntajes centrados por estudiante), no su nivel general.
+    centrados = puntajes - puntajes.mean(axis=1, keepdims=True)
+    etiquetas, centroides = agrupar_perfiles(centrados[validos], k)
+    nombres = nombrar_grupos(centroides)
+
+    grupo = np.full(len(df), 'Sin grupo (respuestas no confiables)', dtype=object)
+    grupo[validos] = np.array(nombres, dtype=object)[etiquetas]
+    return {
+        'grupo': pd.Series(grupo, index=df.index, name='Grupo de perfil'),
+        'nombres': nombres,
+        'centroides': pd.DataFrame(centroides, index=nombres, columns=AREAS)
+    }
+
+
+def grupos_perfil(compartido, k: int) -> dict:
+    # Centroides y asignaciones por versión compartida y número de grupos.
+    df = compartido.resultado[0]
+    return compartido.derivado(('grupos_perfil', k), lambda: construir_grupos_perfil(df, k))
+
+
+def indice_similares(compartido) -> IndiceHamming:
+    df, _, columnas_items, _, _, _ = compartido.resultado
+    return compartido.derivado('indice_hamming', lambda: IndiceHamming(df[columnas_items].to_numpy()))
+
 
-    df['Coincidencia_Ponderada'] = df.apply(
-        lambda r: evaluar(r['Area_Fuerte_Ponderada'], r[columna_carrera]),
-        axis=1
+def normas(compartido) -> TablasNormativas:
+    return compartido.derivado('normas', lambda: TablasNormativas.desde_resultado(compartido.resultado))
+
+
+def construir_percentiles_cohorte(compartido) -> pd.DataFrame:
+    df, _, _, columna_carrera, _, _ = compartido.resultado
+    tablas = normas(compartido)
+    puntajes = df[[f'PUNTAJE_COMBINADO_{a}' for a in AREAS]].to_numpy(dtype=float)
+    carreras = df[columna_carrera].astype(str).str.strip().to_numpy()
+    return pd.concat([
+        pd.DataFrame(tablas.percentiles_lote(puntajes, carreras).round(1), index=df.index,
+                     columns=[f'Percentil {a} (carrera)' for a in AREAS]),
+        pd.DataFrame(tablas.percentiles(puntajes).round(1), index=df.index,
+                     columns=[f'Percentil {a} (cohorte)' for a in AREAS])
+    ], axis=1)
+
+
+def percentiles_cohorte(compartido) -> pd.DataFrame:
+    # Percentil por área de cada estudiante frente a su carrera y a toda la cohorte.
+    return compartido.derivado('percentiles_cohorte', lambda: construir_percentiles_cohorte(compartido))
+
+
+def texto_ubicacion_percentiles(percentiles_carrera, percentiles_general) -> str:
+    return (
+        f"Percentil frente a su carrera por área: {describir_percentiles(percentiles_carrera)}\n"
+        f"Percentil frente a toda la cohorte por área: {describir_percentiles(percentiles_general)}"
     )
 
-    def carrera_mejor(r):
-        if r['Respondio_Siempre_Igual']:
-            return 'Información no confiable'
-        a = r['Area_Fuerte_Ponderada']
-        c_actual = str(r[columna_carrera]).strip()
-        sugeridas = [c for c, letras in perfil_carreras.items() if a in letras]
-        return c_actual if c_actual in sugeridas else (
-            ', '.join(sugeridas) if sugeridas else 'Sin sugerencia clara'
-        )
 
-    def diagnostico(r):
-        if r['Carrera_Mejor_Perfilada'] == 'Información no confiable':
-            return 'Información no confiable'
-        if str(r[columna_carrera]).strip() == str(r['Carrera_Mejor_Perfilada']).strip():
-            return 'Perfil adecuado'
-        if r['Carrera_Mejor_Perfilada'] == 'Sin sugerencia clara':
-            return 'Sin sugerencia clara'
-        return f"Sugerencia: {r['Carrera_Mejor_Perfilada']}"
-
-    def semaforo(r):
-        diag = r['Diagnóstico Primario Vocacional']
-        if diag == 'Información no confiable':
-            return 'Respondió siempre igual'
-        if diag == 'Sin sugerencia clara':
-            return 'Sin sugerencia'
-        if diag == 'Perfil adecuado' and r['Coincidencia_Ponderada'] == 'Coherente':
-            return 'Verde'
-        if diag == 'Perfil adecuado' and r['Coincidencia_Ponderada'] == 'Neutral':
-            return 'Amarillo'
-        if isinstance(diag, str) and diag.startswith('Sugerencia:') and r['Coincidencia_Ponderada'] == 'Coherente':
-            return 'Verde'
-        if isinstance(diag, str) and diag.startswith('Sugerencia:') and r['Coincidencia_Ponderada'] == 'Neutral':
-            return 'Amarillo'
-        return 'Rojo'
-
-    df['Carrera_Mejor_Perfilada'] = df.apply(carrera_mejor, axis=1)
-    df['Diagnóstico Primario Vocacional'] = df.apply(diagnostico, axis=1)
-    df['Semáforo Vocacional'] = df.apply(semaforo, axis=1)
-
-    df['Carrera_Corta'] = (
+def recomendaciones(compartido) -> dict:
+    # Carreras más afines de cada estudiante contra todo el catálogo de perfiles de la versión.
+    df, _, _, columna_carrera, _, _ = compartido.resultado
+    return compartido.derivado('recomendaciones', lambda: recomendar_carreras(
+        df[[f'PUNTAJE_COMBINADO_{a}' for a in AREAS]].to_numpy(dtype=float),
+        perfiles_version(compartido.version),
+        K_RECOMENDACIONES,
         df[columna_carrera]
-        .astype(str)
-        .str.replace('Ingeniería', 'Ing.', regex=False)
+    ))
+
+
+def construir_tabla_recomendaciones(compartido) -> pd.DataFrame:
+    df = compartido.resultado[0]
+    rec = recomendaciones(compartido)
+    nombres = rec['nombres']
+    texto = [
+        ' · '.join(
+            f"{j + 1}. {nombres[c]} ({a:.2f}" + (f", +{m:.2f})" if m == m else ")")
+            for j, (c, a, m) in enumerate(zip(fila_c, fila_a, fila_m))
+        )
+        for fila_c, fila_a, fila_m in zip(rec['indices'].tolist(), rec['afinidad'].tolist(), rec['margen'].tolist())
+    ]
+    return pd.DataFrame({
+        'Carreras más afines (afinidad, margen)': texto,
+        'Lugar de la carrera elegida': np.where(rec['lugar_elegida'] > 0, rec['lugar_elegida'], np.nan)
+    }, index=df.index)
+
+
+def tabla_recomendaciones(compartido) -> pd.DataFrame:
+    return compartido.derivado('tabla_recomendaciones', lambda: construir_tabla_recomendaciones(compartido))
+
+
+def clasificacion_version(compartido) -> pd.DataFrame:
+    df, df_intensidad, _, columna_carrera, columna_nombre, _ = compartido.resultado
+    return compartido.derivado(
+        'clasificacion',
+        lambda: clasificacion_resultado(df, df_intensidad, columna_carrera, columna_nombre)
     )
 
-    df_intensidad = df[df['Semáforo Vocacional'].isin(['Verde', 'Amarillo'])].copy()
 
-    def asignar_niveles_por_carrera(grupo):
-        grupo = grupo.copy()
-        grupo['Nivel_Intensidad'] = pd.Series(index=grupo.index, dtype='object')
+def comparacion_version(compartido, clave_referencia, referencia) -> dict:
+    # Cambios frente a una referencia (versión anterior o cohorte del histórico). Se calcula una
+    # vez por referencia y queda con la versión actual; referencia() sólo se lee si hace falta.
+    return compartido.derivado(
+        ('comparacion', clave_referencia),
+        lambda: comparar_clasificaciones(referencia(), clasificacion_version(compartido))
+    )
 
-        amar = grupo[grupo['Semáforo Vocacional'] == 'Amarillo'].copy()
-        ver = grupo[grupo['Semáforo Vocacional'] == 'Verde'].copy()
 
-        if len(amar) > 0:
-            amar = amar.sort_values('Score', ascending=True).copy()
-            amar['rank_pct'] = (np.arange(len(amar)) + 1) / len(amar)
-            amar['Nivel_Intensidad'] = np.where(
-                amar['rank_pct'] <= 0.25,
-                'Sin perfil',
-                'Perfil en riesgo'
-            )
-            grupo.loc[amar.index, 'Nivel_Intensidad'] = amar['Nivel_Intensidad'].astype(object)
-
-        if len(ver) > 0:
-            ver = ver.sort_values('Score', ascending=True).copy()
-            ver['rank_pct'] = (np.arange(len(ver)) + 1) / len(ver)
-            ver['Nivel_Intensidad'] = np.where(
-                ver['rank_pct'] > 0.75,
-                'Jóven promesa',
-                'Perfil en transición'
-            )
-            grupo.loc[ver.index, 'Nivel_Intensidad'] = ver['Nivel_Intensidad'].astype(object)
+TAMANO_BLOQUE_REACTIVOS = 50000
 
-        return grupo
 
-    if not df_intensidad.empty:
-        df_intensidad = (
-            df_intensidad
-            .groupby(columna_carrera, group_keys=False)
-            .apply(asignar_niveles_por_carrera)
-            .copy()
+def momentos_reactivos(compartido) -> dict:
+    # Momentos de los 98 reactivos (toda la cohorte y por carrera), acumulados por bloques una vez por versión.
+    df, _, columnas_items, columna_carrera, _, _ = compartido.resultado
+
+    def construir():
+        items = df[columnas_items]
+        carreras = df[columna_carrera].astype(str).str.strip()
+        bloques = (
+            (
+                items.iloc[i:i + TAMANO_BLOQUE_REACTIVOS].to_numpy(),
+                carreras.iloc[i:i + TAMANO_BLOQUE_REACTIVOS].to_numpy()
+            )
+            for i in range(0, len(df), TAMANO_BLOQUE_REACTIVOS)
         )
+        return acumular_momentos(bloques)
+    return compartido.derivado('momentos_reactivos', construir)
+
+
+def construir_listado_intensidad(compartido, nivel: str, k: int) -> pd.DataFrame:
+    _, df_intensidad, _, columna_carrera, columna_nombre, _ = compartido.resultado
+    columnas_exportar = [
+        columna_nombre,
+        COLUMNA_EMAIL,
+        COLUMNA_CAMPUS,
+        columna_carrera,
+        'Carrera_Corta',
+        'Semáforo Vocacional',
+        'Nivel_Intensidad'
+    ]
+    columnas_exportar = [c for c in columnas_exportar if c in df_intensidad.columns]
+
+    tabla = df_intensidad.loc[df_intensidad['Nivel_Intensidad'] == nivel, columnas_exportar]
+    tabla = tabla.assign(**{
+        'Grupo de perfil': grupos_perfil(compartido, k)['grupo'].loc[tabla.index],
+        'Conclusión y recomendación': conclusiones(compartido).loc[tabla.index]
+    }).join(tabla_recomendaciones(compartido)).join(percentiles_cohorte(compartido).filter(like='(carrera)'))
+
+    columnas_orden = [c for c in [columna_carrera, columna_nombre] if c in tabla.columns]
+    if columnas_orden:
+        tabla = tabla.sort_values(columnas_orden)
+
+    return tabla.rename(columns={
+        columna_nombre: 'Nombre del estudiante',
+        COLUMNA_EMAIL: 'Correo electrónico',
+        columna_carrera: 'Carrera',
+        'Carrera_Corta': 'Carrera corta',
+        'Semáforo Vocacional': 'Semáforo vocacional',
+        'Nivel_Intensidad': 'Nivel de intensidad'
+    })
+
+
+def listado_intensidad(compartido, nivel: str, k: int) -> pd.DataFrame:
+    return compartido.derivado(
+        ('listado_intensidad', nivel, k),
+        lambda: construir_listado_intensidad(compartido, nivel, k)
+    )
 
-    def letras_carrera(carrera):
-        return perfil_carreras.get(str(carrera).strip(), [])
 
-    def puntaje_promedio_carrera(row, carrera):
-        letras = letras_carrera(carrera)
-        if not letras:
-            return np.nan
-        return np.mean([row[f'PUNTAJE_COMBINADO_{l}'] for l in letras])
+def construir_listado_transicion(compartido, carrera: str, destino: str, k: int) -> pd.DataFrame:
+    df, _, _, columna_carrera, columna_nombre, _ = compartido.resultado
+    columnas_exportar_trans = [
+        columna_nombre,
+        COLUMNA_EMAIL,
+        COLUMNA_CAMPUS,
+        columna_carrera,
+        'Area_Fuerte_Ponderada',
+        'Semáforo Vocacional',
+        'Destino_Compatible'
+    ]
+    columnas_exportar_trans = [c for c in columnas_exportar_trans if c in df.columns]
 
-    def mejor_destino_compatible(row):
-        carrera = str(row[columna_carrera]).strip()
-        letras = letras_carrera(carrera)
+    mask = (
+        (df['Semáforo Vocacional'] != 'Respondió siempre igual')
+        & (df[columna_carrera] == carrera)
+        & (df['Destino_Compatible'] == destino)
+    )
+    tabla_dest = df.loc[mask, columnas_exportar_trans]
+    tabla_dest = tabla_dest.assign(**{
+        'Grupo de perfil': grupos_perfil(compartido, k)['grupo'].loc[tabla_dest.index],
+        'Conclusión y recomendación': conclusiones(compartido).loc[tabla_dest.index]
+    }).join(tabla_recomendaciones(compartido)).join(percentiles_cohorte(compartido).filter(like='(carrera)'))
+
+    if columna_nombre in tabla_dest.columns:
+        tabla_dest = tabla_dest.sort_values(columna_nombre)
+
+    return tabla_dest.rename(columns={
+        columna_nombre: 'Nombre del estudiante',
+        COLUMNA_EMAIL: 'Correo electrónico',
+        columna_carrera: 'Carrera elegida',
+        'Area_Fuerte_Ponderada': 'Área fuerte CHASIDE',
+        'Semáforo Vocacional': 'Semáforo vocacional',
+        'Destino_Compatible': 'Carrera sugerida compatible'
+    })
+
+
+def listado_transicion(compartido, carrera: str, destino: str, k: int) -> pd.DataFrame:
+    return compartido.derivado(
+        ('listado_transicion', carrera, destino, k),
+        lambda: construir_listado_transicion(compartido, carrera, destino, k)
+    )
 
-        mejor = carrera
-        mejor_score = puntaje_promedio_carrera(row, carrera)
 
-        for c, letras_c in perfil_carreras.items():
-            if len(set(letras).intersection(letras_c)) >= 2:
-                score = puntaje_promedio_carrera(row, c)
-                if pd.notna(score) and score > mejor_score:
-                    mejor_score = score
-                    mejor = c
+def construir_base_pareto(df: pd.DataFrame, df_intensidad: pd.DataFrame, columna_carrera: str) -> dict:
+    filas_int = df.loc[df_intensidad.index]
+    df_pareto = pd.DataFrame(
+        {a: filas_int[f'INTERES_{a}'] + filas_int[f'APTITUD_{a}'] for a in AREAS},
+        index=df_intensidad.index
+    )
+    df_pareto['Nivel_Intensidad'] = df_intensidad['Nivel_Intensidad'].values
+    df_pareto['Carrera'] = filas_int[columna_carrera].values
+    df_pareto['Carrera_Corta'] = (
+        df_pareto['Carrera']
+        .astype(str)
+        .str.replace('Ingeniería', 'Ing.', regex=False)
+    )
+    return {
+        'tabla': df_pareto,
+        'totales': df_pareto[AREAS].to_numpy(dtype=float),
+        'grupos': df_pareto.groupby(['Carrera_Corta', 'Nivel_Intensidad']).indices
+    }
 
-        return mejor
 
-    df['Destino_Compatible'] = df.apply(mejor_destino_compatible, axis=1)
+def base_pareto(compartido) -> dict:
+    # Totales por letra y posiciones de cada grupo (carrera, nivel), calculados una vez por versión.
+    df, df_intensidad, _, columna_carrera, _, _ = compartido.resultado
+    return compartido.derivado(
+        'base_pareto', lambda: construir_base_pareto(df, df_intensidad, columna_carrera)
+    )
 
-    return df, df_intensidad, columnas_items, columna_carrera, columna_nombre, umbral_intrapersonal
 
+COLUMNAS_PUNTAJES_PDF = [f'INTERES_{a}' for a in AREAS] + [f'APTITUD_{a}' for a in AREAS]
 
-def build_pdf_report(estudiante, carrera, categoria, intensidad, texto_ubicacion, conclusion_txt):
-    buffer = io.BytesIO()
 
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=1.8 * cm,
-        leftMargin=1.8 * cm,
-        topMargin=1.6 * cm,
-        bottomMargin=1.6 * cm
+def construir_envios_reportes(compartido) -> pd.DataFrame:
+    df, df_intensidad, _, columna_carrera, columna_nombre, _ = compartido.resultado
+    correo = (
+        df[COLUMNA_EMAIL].fillna('').astype(str).str.strip()
+        if COLUMNA_EMAIL in df.columns
+        else pd.Series('', index=df.index)
+    )
+    intensidad = df_intensidad['Nivel_Intensidad'].reindex(df.index) if not df_intensidad.empty else None
+    percentiles = percentiles_cohorte(compartido)
+    ubicacion = [
+        texto_ubicacion_percentiles(carrera, cohorte)
+        for carrera, cohorte in zip(
+            percentiles.filter(like='(carrera)').to_numpy(), percentiles.filter(like='(cohorte)').to_numpy()
+        )
+    ]
+    return pd.DataFrame({
+        'correo': correo,
+        'nombre': df[columna_nombre].astype(str),
+        'carrera': df[columna_carrera].astype(str),
+        'categoria': df['Semáforo Vocacional'].map(CAT_MAP_LARGO).fillna(df['Semáforo Vocacional']),
+        'intensidad': pd.Series(intensidad, index=df.index).fillna("No disponible"),
+        'conclusion': conclusiones(compartido),
+        'ubicacion': ubicacion,
+        'correo_valido': correo.str.fullmatch(r'[^@\s]+@[^@\s]+\.[^@\s]+'),
+        **{c: df[c] for c in COLUMNAS_PUNTAJES_PDF}
+    }, index=df.index)
+
+
+def envios_reportes(compartido) -> pd.DataFrame:
+    # Destinatario y contenido del PDF de cada estudiante; los PDF se generan al enviarse.
+    return compartido.derivado('envios_reportes', lambda: construir_envios_reportes(compartido))
+
+
+def pdf_envio(envio: dict) -> bytes:
+    return build_pdf_report(
+        estudiante=envio['nombre'],
+        carrera=envio['carrera'],
+        categoria=envio['categoria'],
+        intensidad=envio['intensidad'],
+        texto_ubicacion=envio['ubicacion'],
+        conclusion_txt=envio['conclusion'],
+        puntajes=envio
     )
 
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(
-        name='TitleBlue',
-        parent=styles['Title'],
-        fontName='Helvetica-Bold',
-        fontSize=18,
-        leading=22,
-        textColor=colors.HexColor("#0F766E"),
-        alignment=TA_LEFT,
-        spaceAfter=10
-    ))
-    styles.add(ParagraphStyle(
-        name='HeadingTeal',
-        parent=styles['Heading2'],
-        fontName='Helvetica-Bold',
-        fontSize=12,
-        leading=15,
-        textColor=colors.HexColor("#0F766E"),
-        spaceBefore=8,
-        spaceAfter=6
-    ))
-    styles.add(ParagraphStyle(
-        name='BodySmall',
-        parent=styles['BodyText'],
-        fontName='Helvetica',
-        fontSize=10,
-        leading=14,
-        spaceAfter=6
-    ))
 
-    story = []
-    story.append(Paragraph("Reporte individual CHASIDE", styles['TitleBlue']))
-    story.append(Paragraph(f"<b>Estudiante:</b> {estudiante}", styles['BodySmall']))
-    story.append(Paragraph(f"<b>Carrera:</b> {carrera}", styles['BodySmall']))
-    story.append(Paragraph(f"<b>Perfil identificado:</b> {categoria}", styles['BodySmall']))
-    story.append(Paragraph(f"<b>Intensidad vocacional:</b> {intensidad}", styles['BodySmall']))
-    story.append(Spacer(1, 8))
-
-    if texto_ubicacion.strip():
-        story.append(Paragraph("Resumen del participante", styles['HeadingTeal']))
-        for linea in texto_ubicacion.split("\n"):
-            if linea.strip():
-                story.append(Paragraph(linea.strip(), styles['BodySmall']))
-                
-    story.append(Paragraph("Conclusión y recomendación", styles['HeadingTeal']))
-    story.append(Paragraph(conclusion_txt, styles['BodySmall']))
-
-    doc.build(story)
-    pdf = buffer.getvalue()
-    buffer.close()
-    return pdf
-
-
-def construir_conclusion_recomendacion(al, carrera_sel, destino_compatible, nivel_alumno):
-    categoria = al['Semáforo Vocacional']
-    respondio_igual = bool(al.get('Respondio_Siempre_Igual', False))
-
-    if respondio_igual or categoria == 'Respondió siempre igual':
-        return (
-            "El patrón de respuestas sugiere baja variabilidad, por lo que el perfil obtenido debe interpretarse con cautela. "
-            "Esto puede indicar que la prueba fue contestada con respuestas muy homogéneas o sin suficiente diferenciación entre intereses y aptitudes. "
-            "Se recomienda reaplicar la prueba en condiciones controladas y posteriormente realizar una entrevista breve de orientación vocacional."
-        )
+def secretos_smtp() -> dict:
+    # Sección [smtp] de .streamlit/secrets.toml, si existe.
+    try:
+        return dict(st.secrets.get('smtp', {}))
+    except Exception:
+        return {}
 
-    if nivel_alumno == 'Sin perfil':
-        if destino_compatible != carrera_sel:
-            return (
-                f"El estudiante muestra baja correspondencia entre su perfil vocacional y la carrera elegida. "
-                f"Además, el análisis compatible sugiere mayor afinidad hacia {destino_compatible}. "
-                f"Se recomienda repetir la prueba y, si el resultado persiste, valorar orientación vocacional y posible transición."
-            )
-        return (
-            f"El estudiante muestra baja correspondencia entre su perfil vocacional y la carrera elegida. "
-            f"Se recomienda repetir la prueba y acompañar el proceso con orientación vocacional individual."
-        )
 
-    if nivel_alumno == 'Perfil en riesgo':
-        if destino_compatible != carrera_sel:
-            return (
-                f"El estudiante presenta coincidencia mínima entre su perfil vocacional y la carrera elegida. "
-                f"El análisis compatible sugiere mejor ajuste hacia {destino_compatible}. "
-                f"Se recomienda seguimiento tutorial temprano y orientación vocacional."
-            )
-        return (
-            f"El estudiante presenta coincidencia mínima entre su perfil vocacional y la carrera elegida. "
-            f"Se recomienda seguimiento tutorial, fortalecimiento de hábitos de estudio y revisión vocacional complementaria."
-        )
+def render_tabla_paginada(tabla: pd.DataFrame, key: str):
+    # Filtra, ordena y pagina en el servidor; al navegador sólo viaja la página visible.
+    col_filtro, col_orden, col_sentido, col_tamano = st.columns([3, 2, 1, 1])
+    filtro = col_filtro.text_input("Buscar", key=f"{key}_filtro", placeholder="Nombre, correo, carrera…")
+    columna_orden = col_orden.selectbox(
+        "Ordenar por", [ORDEN_PREDETERMINADO] + list(tabla.columns), key=f"{key}_orden"
+    )
+    descendente = col_sentido.toggle("Descendente", key=f"{key}_desc")
+    tamano = col_tamano.selectbox("Filas por página", TAMANOS_PAGINA, key=f"{key}_tamano")
+
+    vista = tabla
+    if filtro:
+        coincide = np.zeros(len(vista), dtype=bool)
+        for columna in vista.columns:
+            coincide |= vista[columna].astype(str).str.contains(filtro, case=False, regex=False).to_numpy()
+        vista = vista[coincide]
+    if columna_orden != ORDEN_PREDETERMINADO:
+        vista = vista.sort_values(columna_orden, ascending=not descendente, kind='stable')
+    elif descendente:
+        vista = vista.iloc[::-1]
+
+    n_paginas = max(1, -(-len(vista) // tamano))
+    clave_pagina = f"{key}_pagina"
+    # La página vive sólo en session_state; el widget no recibe valor por defecto.
+    st.session_state.setdefault(clave_pagina, 1)
+    if st.session_state[clave_pagina] > n_paginas:
+        st.session_state[clave_pagina] = 1
+    pagina = st.number_input("Página", min_value=1, max_value=n_paginas, step=1, key=clave_pagina)
+
+    inicio = (pagina - 1) * tamano
+    st.dataframe(vista.iloc[inicio:inicio + tamano], use_container_width=True, hide_index=True)
+    st.caption(
+        f"Mostrando {min(inicio + 1, len(vista))}–{min(inicio + tamano, len(vista))} de {len(vista)} "
+        f"estudiantes · página {pagina} de {n_paginas}."
+    )
 
-    if nivel_alumno == 'Perfil en transición':
-        return (
-            f"El estudiante muestra una congruencia vocacional funcional con la carrera elegida. "
-            f"Se recomienda acompañamiento académico preventivo y seguimiento durante el primer semestre."
-        )
 
-    if nivel_alumno == 'Jóven promesa':
-        return (
-            f"El estudiante presenta alta congruencia entre su perfil vocacional y la carrera elegida. "
-            f"Se recomienda fortalecer su trayectoria y promover actividades de alto desempeño."
+# -------------------------------------------------
+# PRECALENTAMIENTO DE CACHÉS
+# Al arrancar el proceso, un hilo calcula la fuente predeterminada con cada relación de
+# pesos predefinida y DEFAULT_PERFILES, y deja listos los agregados del análisis general.
+# -------------------------------------------------
+def precalentar_agregados(compartido):
+    df, _, _, columna_carrera, _, _ = compartido.resultado
+    conclusiones(compartido)
+    base_pareto(compartido)
+    indice_similares(compartido)
+    for nivel in NIVELES_INTENSIDAD:
+        listado_intensidad(compartido, nivel, K_GRUPOS_PREDETERMINADO)
+
+    validos = df[df['Semáforo Vocacional'] != 'Respondió siempre igual']
+    destinos = validos.groupby(validos[columna_carrera].astype(str))['Destino_Compatible'].unique()
+    for carrera, destinos_carrera in destinos.items():
+        for destino in destinos_carrera:
+            listado_transicion(compartido, carrera, destino, K_GRUPOS_PREDETERMINADO)
+
+
+def precalentar_version(fuentes, peso_intereses, peso_aptitudes):
+    _, version = clave_version(
+        fuentes, CRITERIO_DUPLICADOS, peso_intereses, peso_aptitudes, CRITERIOS_CALIDAD, DEFAULT_PERFILES
+    )
+    resultado, duplicados, huella_datos, _ = procesar_version(
+        fuentes, CRITERIO_DUPLICADOS, peso_intereses, peso_aptitudes, CRITERIOS_CALIDAD, DEFAULT_PERFILES
+    )
+    precalentar_agregados(publicar_version(version, resultado, duplicados, huella_datos))
+
+
+@st.cache_resource(show_spinner=False)
+def iniciar_precalentamiento():
+    # Un solo precalentamiento por proceso; CHASIDE_PRECALENTAMIENTO=0 lo desactiva.
+    if os.environ.get('CHASIDE_PRECALENTAMIENTO', '1') == '0':
+        return None
+    fuentes = tuple(parsear_fuentes(FUENTE_PREDETERMINADA))
+    tareas = [
+        (
+            clave_version(fuentes, CRITERIO_DUPLICADOS, peso_i, peso_a, CRITERIOS_CALIDAD, DEFAULT_PERFILES)[1],
+            functools.partial(precalentar_version, fuentes, peso_i, peso_a)
         )
+        for peso_i, peso_a in PRESETS_PESOS.values()
+    ]
+    return Precalentamiento(tareas).iniciar()
 
-    if categoria == 'Verde':
-        return "El perfil identificado coincide con la carrera elegida. Se recomienda mantener acompañamiento preventivo."
 
-    if categoria == 'Amarillo':
-        return "El perfil identificado no coincide plenamente con la carrera elegida. Se recomienda orientación vocacional y seguimiento tutorial."
+precalentamiento = iniciar_precalentamiento()
 
-    return "El resultado sugiere la necesidad de una interpretación complementaria mediante orientación y seguimiento académico."
 
 # -------------------------------------------------
 # SIDEBAR
@@ -499,14 +651,31 @@ st.sidebar.title("CHASIDE · Navegación")
 
 seccion = st.sidebar.radio(
     "Ir a",
-    ["Presentación", "Análisis general", "Información individual"]
+    [
+        "Presentación", "Análisis general", "Información individual", "Envío de reportes",
+        "Histórico de cohortes", "Análisis de reactivos"
+    ]
 )
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("Escala / fuente de datos")
-url = st.sidebar.text_input(
-    "URL de la escala (CSV export)",
-    "https://docs.google.com/spreadsheets/d/1BNAeOSj2F378vcJE5-T8iJ8hvoseOleOHr-I7mVfYu4/export?format=csv"
+texto_fuentes = st.sidebar.text_area(
+    "URL de la escala (CSV export), una por línea",
+    FUENTE_PREDETERMINADA,
+    help=(
+        "Para combinar varios campus escribe una fuente por línea con el formato "
+        "`Campus | URL`. Las hojas se descargan en paralelo y se unen con la columna 'Campus'."
+    )
+)
+criterio_duplicados = st.sidebar.selectbox(
+    "Envíos repetidos de un mismo estudiante",
+    list(CRITERIOS_DUPLICADOS),
+    index=list(CRITERIOS_DUPLICADOS).index(CRITERIO_DUPLICADOS),
+    format_func=CRITERIOS_DUPLICADOS.get,
+    help=(
+        "Se considera el mismo estudiante cuando coinciden correo y nombre, sin distinguir "
+        "mayúsculas, acentos ni espacios. Los envíos descartados se listan en el Análisis general."
+    )
 )
 
 st.sidebar.markdown("---")
@@ -514,37 +683,58 @@ st.sidebar.subheader("⚙️ Ajustes del algoritmo")
 
 preset = st.sidebar.selectbox(
     "Relación Intereses / Aptitudes",
-    [
-        "80 / 20 (predeterminado)",
-        "70 / 30",
-        "60 / 40",
-        "50 / 50",
-        "Personalizado"
-    ],
+    list(PRESETS_PESOS) + ["Personalizado"],
     index=0
 )
 
-if preset == "80 / 20 (predeterminado)":
-    peso_intereses = 0.8
-    peso_aptitudes = 0.2
-elif preset == "70 / 30":
-    peso_intereses = 0.7
-    peso_aptitudes = 0.3
-elif preset == "60 / 40":
-    peso_intereses = 0.6
-    peso_aptitudes = 0.4
-elif preset == "50 / 50":
-    peso_intereses = 0.5
-    peso_aptitudes = 0.5
+if preset in PRESETS_PESOS:
+    peso_intereses, peso_aptitudes = PRESETS_PESOS[preset]
 else:
     wi = st.sidebar.slider("Peso de Intereses (%)", 0, 100, 80, 5)
     peso_intereses = wi / 100
-    peso_aptitudes = 1 - peso_intereses
+    peso_aptitudes = round(1 - peso_intereses, 2)
 
 st.sidebar.caption(
     f"Pesos activos → Intereses: {peso_intereses:.2f} | Aptitudes: {peso_aptitudes:.2f}"
 )
 
+k_grupos = st.sidebar.slider(
+    "Grupos de perfil (k-means)",
+    2, 8, K_GRUPOS_PREDETERMINADO, 1,
+    help="Número de grupos naturales de perfil que se buscan entre los puntajes combinados."
+)
+
+with st.sidebar.expander("🧪 Criterios de calidad de respuesta"):
+    st.caption(
+        "Las respuestas que cumplan cualquiera de estos criterios se tratan como "
+        "'Información no confiable'. Todo sí / todo no se marca siempre."
+    )
+    criterios_calidad = {}
+    for indicador, meta in INDICADORES_CALIDAD.items():
+        st.markdown(f"**{meta['etiqueta']}**")
+        modo = st.radio(
+            "Tipo de umbral",
+            ['cuantil', 'absoluto'],
+            index=['cuantil', 'absoluto'].index(meta['modo']),
+            format_func=lambda m: "Proporción (cuantil)" if m == 'cuantil' else "Valor absoluto",
+            horizontal=True,
+            key=f"calidad_modo_{indicador}"
+        )
+        if modo == 'cuantil':
+            valor = st.slider(
+                "Proporción más extrema que se marca",
+                0.0, 0.5, float(meta['cuantil']), 0.01,
+                key=f"calidad_cuantil_{indicador}"
+            )
+        else:
+            minimo, maximo, paso = meta['rango']
+            valor = st.slider(
+                "Umbral " + ("(se marca si es menor o igual)" if meta['sentido'] == 'menor' else "(se marca si es mayor o igual)"),
+                minimo, maximo, meta['absoluto'], paso,
+                key=f"calidad_absoluto_{indicador}"
+            )
+        criterios_calidad[indicador] = {'modo': modo, 'valor': valor}
+
 st.sidebar.markdown("### Perfil esperado por carrera")
 
 if "usar_predeterminados" not in st.session_state:
@@ -574,21 +764,110 @@ for carrera, letras_default in DEFAULT_PERFILES.items():
         key=widget_key
     )
 
+
 # -------------------------------------------------
 # CARGA DE DATOS
 # -------------------------------------------------
 try:
-    df_raw = load_data(url)
-    df, df_intensidad, columnas_items, columna_carrera, columna_nombre, umbral_intrapersonal = process_data(
-        df_raw,
-        perfil_config,
-        peso_intereses,
-        peso_aptitudes
+    fuentes = tuple(parsear_fuentes(texto_fuentes))
+
+    # Si sólo cambian los perfiles por carrera, se recalculan únicamente las filas afectadas.
+    perfiles_actuales = {c: list(letras) for c, letras in perfil_config.items()}
+    clave_procesamiento, version = clave_version(
+        fuentes, criterio_duplicados, peso_intereses, peso_aptitudes, criterios_calidad, perfiles_actuales
     )
+
+    # Cada versión se procesa una sola vez y se comparte, sin copias, entre todas las sesiones.
+    registro = registro_resultados()
+    compartido = registro.obtener(version)
+    if compartido is None and precalentamiento is not None and precalentamiento.pendiente(version):
+        with st.spinner("Terminando de precalentar esta configuración…"):
+            precalentamiento.esperar(version, timeout=300)
+        compartido = registro.obtener(version)
+    if compartido is None:
+        previo = st.session_state.get("resultado_procesado")
+        if previo is not None and previo['clave'] == clave_procesamiento:
+            resultado = actualizar_por_perfiles(previo['compartido'].resultado, previo['perfiles'], perfil_config)
+            duplicados = duplicados_descartados(previo['compartido'])
+            huella_datos = huella_datos_version(previo['compartido'])
+            error_instantanea = guardar_instantanea_version(
+                fuentes, huella_datos, criterio_duplicados, peso_intereses, peso_aptitudes, criterios_calidad,
+                perfiles_actuales, resultado, duplicados
+            )
+        else:
+            resultado, duplicados, huella_datos, error_instantanea = procesar_version(
+                fuentes,
+                criterio_duplicados,
+                peso_intereses,
+                peso_aptitudes,
+                criterios_calidad,
+                perfiles_actuales
+            )
+        if error_instantanea:
+            st.sidebar.caption(f"⚠️ No se pudo guardar la instantánea de resultados: {error_instantanea}")
+        compartido = publicar_version(version, resultado, duplicados, huella_datos)
+
+    # La versión que se deja de usar queda como referencia para "Cambios de clasificación";
+    # sólo se conserva su tabla reducida por correo, no el resultado completo.
+    anterior = st.session_state.get("resultado_procesado")
+    if anterior is not None and anterior['compartido'].version != version:
+        st.session_state.version_anterior = {
+            'version': anterior['compartido'].version,
+            'descripcion': describir_cambio_version(anterior['compartido'].version, version),
+            'clasificacion': clasificacion_version(anterior['compartido'])
+        }
+
+    st.session_state.resultado_procesado = {
+        'clave': clave_procesamiento,
+        'perfiles': perfiles_actuales,
+        'compartido': compartido
+    }
+    df, df_intensidad, columnas_items, columna_carrera, columna_nombre, umbral_intrapersonal = compartido.resultado
 except Exception as e:
     st.error(f"❌ No fue posible cargar/procesar el archivo: {e}")
     st.stop()
 
+st.sidebar.markdown("---")
+st.sidebar.subheader("🗂️ Histórico de cohortes")
+hoy = datetime.now()
+nombre_cohorte = st.sidebar.text_input(
+    "Nombre de la cohorte",
+    f"{hoy.year}-{1 if hoy.month <= 6 else 2}",
+    help="Identificador con el que se guardarán los resultados procesados (p. ej. 2025-1)."
+)
+if st.sidebar.button("💾 Guardar cohorte actual en el histórico", use_container_width=True):
+    try:
+        n_guardados = guardar_cohorte(
+            RUTA_HISTORICO,
+            nombre_cohorte,
+            df,
+            df_intensidad,
+            columna_carrera,
+            columna_nombre,
+            peso_intereses,
+            peso_aptitudes
+        )
+        st.sidebar.success(f"Cohorte '{nombre_cohorte.strip()}' guardada ({n_guardados} estudiantes).")
+    except Exception as e:
+        st.sidebar.error(f"❌ No fue posible guardar la cohorte: {e}")
+
+if precalentamiento is not None:
+    avance = precalentamiento.estado()
+    if avance['completadas'] < avance['total']:
+        st.sidebar.progress(
+            avance['completadas'] / avance['total'],
+            text=f"Precalentando cachés: {avance['completadas']} de {avance['total']} configuraciones listas…"
+        )
+    elif avance['errores']:
+        st.sidebar.caption(f"⚠️ El precalentamiento no pudo completar: {avance['errores'][0]}")
+
+estado_registro = registro.estado()
+st.sidebar.caption(
+    f"Resultados compartidos en el servidor: {estado_registro['versiones']} versión(es) · "
+    f"{estado_registro['memoria_mb']:.1f} MB de {estado_registro['memoria_max_mb']:.0f} MB"
+)
+
+
 # -------------------------------------------------
 # RENDER 1 · PRESENTACIÓN
 # -------------------------------------------------
@@ -651,25 +930,48 @@ capaz de:
 """
     )
 
+
 # -------------------------------------------------
 # RENDER 2 · ANÁLISIS GENERAL
 # -------------------------------------------------
 def render_analisis_general():
     st.title("Diagnóstico Vocacional - Escala CHASIDE")
+    umbrales_calidad = {
+        k: resolver_umbral_calidad(df[k].to_numpy(), INDICADORES_CALIDAD[k]['sentido'], c)
+        for k, c in criterios_calidad.items()
+    }
     st.caption(
-        f"Criterio de calidad de respuesta: el 10% inferior de la desviación intrapersona "
-        f"se clasifica como 'Respondió siempre igual'. Umbral actual = {umbral_intrapersonal:.4f}"
+        "Criterios de calidad de respuesta (se clasifican como 'Respondió siempre igual'): "
+        f"{describir_criterios_calidad(criterios_calidad, umbrales_calidad)}. "
+        f"Estudiantes marcados: {int(df['Respondio_Siempre_Igual'].sum())} de {len(df)}."
     )
 
+    duplicados = duplicados_descartados(compartido)
+    if duplicados is not None and not duplicados.empty:
+        with st.expander(
+            f"🔁 Envíos duplicados descartados: {len(duplicados)} "
+            f"(criterio: {CRITERIOS_DUPLICADOS[criterio_duplicados].lower()})"
+        ):
+            st.caption(
+                "Estos envíos repiten el correo y nombre de otro estudiante y no se puntúan. "
+                "'Fila_Hoja' es la fila en la hoja de origen y 'Fila_Hoja_Conservada', la del envío que se conservó."
+            )
+            st.dataframe(duplicados, hide_index=True, use_container_width=True)
+            st.download_button(
+                label="⬇️ Descargar envíos duplicados descartados (.xlsx)",
+                data=lambda: dataframe_a_excel_bytes({'Duplicados': duplicados}),
+                file_name="envios_duplicados_CHASIDE.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True,
+                key="download_duplicados_xlsx"
+            )
+
     # -------------------------
     # Pastel
     # -------------------------
     st.subheader("📊 Distribución de respuestas del estudiantado")
 
-    df_pastel = df.copy()
-    df_pastel['Categoría_Pastel'] = df_pastel['Semáforo Vocacional'].replace(CAT_MAP_LARGO)
-
-    resumen = df_pastel['Categoría_Pastel'].value_counts().reset_index()
+    resumen = df['Semáforo Vocacional'].replace(CAT_MAP_LARGO).value_counts().reset_index()
     resumen.columns = ['Categoría', 'N']
 
     fig = px.pie(
@@ -697,8 +999,9 @@ def render_analisis_general():
     # -------------------------
     st.header("📊 Distribución por carrera y categoría")
 
-    df_barras = df.copy()
-    df_barras['Categoría_Barras'] = df_barras['Semáforo Vocacional'].replace(CAT_MAP_LARGO)
+    df_barras = df[['Carrera_Corta']].assign(
+        Categoría_Barras=df['Semáforo Vocacional'].replace(CAT_MAP_LARGO)
+    )
 
     cats_order_largo = [
         'El perfil coincide con la carrera elegida',
@@ -761,12 +1064,7 @@ def render_analisis_general():
             y='N',
             color='Nivel_Intensidad',
             category_orders={'Nivel_Intensidad': orden_niveles},
-            color_discrete_map={
-                'Sin perfil': '#dc2626',
-                'Perfil en riesgo': '#f59e0b',
-                'Perfil en transición': '#84cc16',
-                'Jóven promesa': '#16a34a'
-            },
+            color_discrete_map=COLORES_INTENSIDAD,
             barmode='stack'
         )
         fig_int.update_layout(
@@ -777,96 +1075,82 @@ def render_analisis_general():
         )
         st.plotly_chart(fig_int, use_container_width=True)
 
-        # -------------------------
-        # Listados de intervención por intensidad
-        # -------------------------
-        st.markdown("## 📋 Listado de estudiantes por intensidad vocacional")
-        st.caption(
-            "Este apartado permite identificar a los estudiantes clasificados en cada nivel "
-            "de intensidad vocacional para facilitar acciones de acompañamiento, canalización o seguimiento."
-        )
+        render_listado_intensidad()
 
-        columnas_exportar = [
-            columna_nombre,
-            COLUMNA_EMAIL,
-            columna_carrera,
-            'Carrera_Corta',
-            'Semáforo Vocacional',
-            'Nivel_Intensidad'
-        ]
-        columnas_exportar = [c for c in columnas_exportar if c in df_intensidad.columns]
-
-        tabs_int = st.tabs([
-            "Sin perfil",
-            "Perfil en riesgo",
-            "Perfil en transición",
-            "Jóven promesa"
-        ])
-
-        hojas_intensidad = {}
-
-        for tab, nivel in zip(
-            tabs_int,
-            ['Sin perfil', 'Perfil en riesgo', 'Perfil en transición', 'Jóven promesa']
-        ):
-            with tab:
-                sub_nivel = df_intensidad[df_intensidad['Nivel_Intensidad'] == nivel].copy()
-
-                if sub_nivel.empty:
-                    st.info(f"No hay estudiantes clasificados como '{nivel}'.")
-                    hojas_intensidad[nivel] = pd.DataFrame(columns=[
-                        'Nombre del estudiante',
-                        'Correo electrónico',
-                        'Carrera',
-                        'Carrera corta',
-                        'Semáforo vocacional',
-                        'Nivel de intensidad'
-                    ])
-                else:
-                    tabla = sub_nivel[columnas_exportar].copy()
-
-                    columnas_orden = [c for c in [columna_carrera, columna_nombre] if c in tabla.columns]
-                    if columnas_orden:
-                        tabla = tabla.sort_values(columnas_orden)
-
-                    tabla = tabla.rename(columns={
-                        columna_nombre: 'Nombre del estudiante',
-                        COLUMNA_EMAIL: 'Correo electrónico',
-                        columna_carrera: 'Carrera',
-                        'Carrera_Corta': 'Carrera corta',
-                        'Semáforo Vocacional': 'Semáforo vocacional',
-                        'Nivel_Intensidad': 'Nivel de intensidad'
-                    })
-
-                    st.dataframe(tabla, use_container_width=True)
-                    st.metric("Total de estudiantes", len(tabla))
-                    hojas_intensidad[nivel] = tabla
+    # -------------------------
+    # Sankey
+    # -------------------------
+    render_transicion()
 
-        excel_intensidad = dataframe_a_excel_bytes(hojas_intensidad)
+    # -------------------------
+    # Pareto
+    # -------------------------
+    render_pareto()
 
-        st.download_button(
-            label="⬇️ Descargar listado de intensidad vocacional (.xlsx)",
-            data=excel_intensidad,
-            file_name="listado_intensidad_vocacional.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True,
-            key="download_intensidad_xlsx"
-        )
+    # -------------------------
+    # Grupos de perfil
+    # -------------------------
+    render_grupos_perfil()
 
     # -------------------------
-    # Sankey
+    # Sensibilidad a los pesos
     # -------------------------
+    render_sensibilidad_pesos()
+
+
+# -------------------------------------------------
+# RENDER 2 · LISTADO POR INTENSIDAD (fragmento)
+# -------------------------------------------------
+@st.fragment
+def render_listado_intensidad():
+    st.markdown("## 📋 Listado de estudiantes por intensidad vocacional")
+    st.caption(
+        "Este apartado permite identificar a los estudiantes clasificados en cada nivel "
+        "de intensidad vocacional para facilitar acciones de acompañamiento, canalización o seguimiento."
+    )
+
+    nivel_sel = st.segmented_control(
+        "Nivel de intensidad",
+        NIVELES_INTENSIDAD,
+        default=NIVELES_INTENSIDAD[0],
+        required=True,
+        key="listado_nivel"
+    )
+    tabla = listado_intensidad(compartido, nivel_sel, k_grupos)
+
+    if tabla.empty:
+        st.info(f"No hay estudiantes clasificados como '{nivel_sel}'.")
+    else:
+        render_tabla_paginada(tabla, key="pag_intensidad")
+        st.metric("Total de estudiantes", len(tabla))
+
+    st.download_button(
+        label="⬇️ Descargar listado de intensidad vocacional (.xlsx)",
+        data=lambda: dataframe_a_excel_bytes(
+            {n: listado_intensidad(compartido, n, k_grupos) for n in NIVELES_INTENSIDAD}
+        ),
+        file_name="listado_intensidad_vocacional.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        use_container_width=True,
+        key="download_intensidad_xlsx"
+    )
+
+
+# -------------------------------------------------
+# RENDER 2 · TRANSICIÓN VOCACIONAL (fragmento)
+# -------------------------------------------------
+@st.fragment
+def render_transicion():
     st.header("🌊 Transición vocacional compatible por carrera")
 
-    df_sankey = df.copy()
-    df_sankey = df_sankey[df_sankey['Semáforo Vocacional'] != 'Respondió siempre igual'].copy()
+    df_sankey = df[df['Semáforo Vocacional'] != 'Respondió siempre igual']
 
     carreras = sorted(df_sankey[columna_carrera].dropna().astype(str).unique())
 
     if carreras:
         carrera_sel = st.selectbox("Selecciona carrera:", carreras, key="sankey_carrera")
 
-        sub = df_sankey[df_sankey[columna_carrera] == carrera_sel].copy()
+        sub = df_sankey[df_sankey[columna_carrera] == carrera_sel]
 
         if not sub.empty:
             flujos = sub['Destino_Compatible'].value_counts().reset_index()
@@ -893,68 +1177,39 @@ def render_analisis_general():
                 "destino vocacional compatible. Esto permite identificar a quiénes conviene intervenir."
             )
 
-            columnas_exportar_trans = [
-                columna_nombre,
-                COLUMNA_EMAIL,
-                columna_carrera,
-                'Area_Fuerte_Ponderada',
-                'Semáforo Vocacional',
-                'Destino_Compatible'
-            ]
-            columnas_exportar_trans = [c for c in columnas_exportar_trans if c in sub.columns]
-
             destinos_ordenados = flujos['Destino_Compatible'].tolist()
-            tabs_trans = st.tabs(destinos_ordenados)
-
-            hojas_transicion = {}
-
-            for tab_dest, destino in zip(tabs_trans, destinos_ordenados):
-                with tab_dest:
-                    sub_dest = sub[sub['Destino_Compatible'] == destino].copy()
-
-                    if sub_dest.empty:
-                        st.info(f"No hay estudiantes con destino compatible '{destino}'.")
-                        hojas_transicion[destino] = pd.DataFrame(columns=[
-                            'Nombre del estudiante',
-                            'Correo electrónico',
-                            'Carrera elegida',
-                            'Área fuerte CHASIDE',
-                            'Semáforo vocacional',
-                            'Carrera sugerida compatible'
-                        ])
-                    else:
-                        tabla_dest = sub_dest[columnas_exportar_trans].copy()
-
-                        if columna_nombre in tabla_dest.columns:
-                            tabla_dest = tabla_dest.sort_values(columna_nombre)
-
-                        tabla_dest = tabla_dest.rename(columns={
-                            columna_nombre: 'Nombre del estudiante',
-                            COLUMNA_EMAIL: 'Correo electrónico',
-                            columna_carrera: 'Carrera elegida',
-                            'Area_Fuerte_Ponderada': 'Área fuerte CHASIDE',
-                            'Semáforo Vocacional': 'Semáforo vocacional',
-                            'Destino_Compatible': 'Carrera sugerida compatible'
-                        })
-
-                        st.dataframe(tabla_dest, use_container_width=True)
-                        st.metric("Total de estudiantes", len(tabla_dest))
-                        hojas_transicion[destino] = tabla_dest
+            destino_sel = st.segmented_control(
+                "Carrera sugerida compatible",
+                destinos_ordenados,
+                default=destinos_ordenados[0],
+                required=True,
+                key=f"listado_destino_{carrera_sel}"
+            )
+            tabla_dest = listado_transicion(compartido, carrera_sel, destino_sel, k_grupos)
 
-            excel_transicion = dataframe_a_excel_bytes(hojas_transicion)
+            if tabla_dest.empty:
+                st.info(f"No hay estudiantes con destino compatible '{destino_sel}'.")
+            else:
+                render_tabla_paginada(tabla_dest, key=f"pag_transicion_{carrera_sel}")
+                st.metric("Total de estudiantes", len(tabla_dest))
 
             st.download_button(
                 label=f"⬇️ Descargar listado de transición vocacional de {str(carrera_sel)} (.xlsx)",
-                data=excel_transicion,
+                data=lambda: dataframe_a_excel_bytes(
+                    {d: listado_transicion(compartido, carrera_sel, d, k_grupos) for d in destinos_ordenados}
+                ),
                 file_name=f"listado_transicion_{str(carrera_sel).replace(' ', '_')}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True,
                 key=f"download_transicion_{str(carrera_sel)}"
             )
 
-    # -------------------------
-    # Pareto
-    # -------------------------
+
+# -------------------------------------------------
+# RENDER 2 · PRIORIDADES PARETO (fragmento)
+# -------------------------------------------------
+@st.fragment
+def render_pareto():
     st.header("📊 Prioridades CHASIDE por carrera")
     st.caption(
         "Seleccione una carrera para comparar el promedio del grupo 'Perfil en riesgo' "
@@ -964,19 +1219,8 @@ def render_analisis_general():
     if df_intensidad.empty:
         st.info("No hay datos suficientes para calcular el Pareto.")
     else:
-        df_pareto = df.copy()
-
-        for a in AREAS:
-            df_pareto[a] = df[f'INTERES_{a}'] + df[f'APTITUD_{a}']
-
-        df_pareto = df_pareto.loc[df_intensidad.index].copy()
-        df_pareto['Nivel_Intensidad'] = df_intensidad['Nivel_Intensidad'].values
-        df_pareto['Carrera'] = df.loc[df_pareto.index, columna_carrera].values
-        df_pareto['Carrera_Corta'] = (
-            df_pareto['Carrera']
-            .astype(str)
-            .str.replace('Ingeniería', 'Ing.', regex=False)
-        )
+        base = base_pareto(compartido)
+        df_pareto = base['tabla']
 
         carreras_disp_p = sorted(df_pareto['Carrera_Corta'].dropna().unique())
 
@@ -987,9 +1231,11 @@ def render_analisis_general():
                 key="select_pareto_fusion"
             )
 
-            sub_p = df_pareto[df_pareto['Carrera_Corta'] == carrera_sel_corta].copy()
-            riesgo = sub_p[sub_p['Nivel_Intensidad'] == 'Perfil en riesgo'].copy()
-            promesa = sub_p[sub_p['Nivel_Intensidad'] == 'Jóven promesa'].copy()
+            sin_filas = np.empty(0, dtype=int)
+            idx_riesgo = base['grupos'].get((carrera_sel_corta, 'Perfil en riesgo'), sin_filas)
+            idx_promesa = base['grupos'].get((carrera_sel_corta, 'Jóven promesa'), sin_filas)
+            riesgo = df_pareto.iloc[idx_riesgo]
+            promesa = df_pareto.iloc[idx_promesa]
 
             if riesgo.empty or promesa.empty:
                 st.warning("No hay suficientes estudiantes en 'Perfil en riesgo' y 'Jóven promesa' para esta carrera.")
@@ -1032,6 +1278,39 @@ def render_analisis_general():
                         df_plot.at[idx, 'Dentro_80'] = True
                         acumulado_tmp = df_plot.at[idx, 'Acumulado']
 
+                # -------------------------
+                # Incertidumbre por bootstrap
+                # -------------------------
+                usar_bootstrap = st.toggle(
+                    "Intervalos de confianza por bootstrap",
+                    key="pareto_bootstrap",
+                    help=(
+                        "Remuestrea con reemplazo los grupos 'Perfil en riesgo' y 'Jóven promesa' para "
+                        "estimar un intervalo del 95% para cada error porcentual y la proporción de "
+                        "remuestras en que cada letra queda dentro del 80% acumulado."
+                    )
+                )
+                if usar_bootstrap:
+                    n_remuestras = st.select_slider(
+                        "Número de remuestras",
+                        [500, 1000, 2000, 5000, 10000],
+                        value=2000,
+                        key="pareto_remuestras"
+                    )
+                    intervalos = compartido.derivado(
+                        ('bootstrap_pareto', carrera_sel_corta, n_remuestras),
+                        lambda: bootstrap_pareto(
+                            base['totales'][idx_riesgo],
+                            base['totales'][idx_promesa],
+                            n_remuestras
+                        )
+                    )
+                    df_plot = df_plot.merge(
+                        intervalos[['Letra', 'IC_Inferior', 'IC_Superior', 'Prob_Dentro_80']],
+                        on='Letra',
+                        how='left'
+                    )
+
                 colores_barras = []
                 for _, row in df_plot.iterrows():
                     if row['Dentro_80']:
@@ -1051,6 +1330,13 @@ def render_analisis_general():
                     y=df_plot['Error_Porcentual'],
                     name='Error porcentual de estudiantes en rezago respecto a alto desempeño',
                     marker_color=colores_barras,
+                    error_y=dict(
+                        type='data',
+                        symmetric=False,
+                        array=(df_plot['IC_Superior'] - df_plot['Error_Porcentual']).clip(lower=0),
+                        arrayminus=(df_plot['Error_Porcentual'] - df_plot['IC_Inferior']).clip(lower=0),
+                        color='#334155'
+                    ) if usar_bootstrap else None,
                     customdata=np.stack(
                         [
                             df_plot['Área'],
@@ -1101,6 +1387,25 @@ def render_analisis_general():
 
                 st.plotly_chart(fig_pareto, use_container_width=True)
 
+                if usar_bootstrap:
+                    st.caption(
+                        f"Grupos remuestreados: {len(idx_riesgo)} en 'Perfil en riesgo' y "
+                        f"{len(idx_promesa)} en 'Jóven promesa'. Las barras de error muestran el intervalo del 95%."
+                    )
+                    st.dataframe(
+                        df_plot[['Letra', 'Área', 'Error_Porcentual', 'IC_Inferior', 'IC_Superior', 'Prob_Dentro_80']]
+                        .assign(Prob_Dentro_80=lambda t: t['Prob_Dentro_80'] * 100)
+                        .rename(columns={
+                            'Error_Porcentual': 'Error porcentual (%)',
+                            'IC_Inferior': 'IC 95% inferior',
+                            'IC_Superior': 'IC 95% superior',
+                            'Prob_Dentro_80': 'Remuestras dentro del 80% (%)'
+                        })
+                        .round(2),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+
                 st.markdown("### 📝 Resumen ejecutivo de prioridades")
 
                 if total_error == 0:
@@ -1108,7 +1413,7 @@ def render_analisis_general():
                         "No se observaron brechas entre 'Perfil en riesgo' y 'Jóven promesa' en esta carrera."
                     )
                 else:
-                    criticas = df_plot[df_plot['Dentro_80']].copy()
+                    criticas = df_plot[df_plot['Dentro_80']]
                     letras_criticas = criticas['Letra'].tolist()
                     acumulado_final = criticas['Acumulado'].iloc[-1] if not criticas.empty else 0
 
@@ -1122,6 +1427,14 @@ def render_analisis_general():
                         f"entre el grupo **Perfil en riesgo** y el grupo **Jóven promesa**."
                     )
 
+                    if usar_bootstrap:
+                        inciertas = df_plot.loc[df_plot['Prob_Dentro_80'].between(0.2, 0.8), 'Letra'].tolist()
+                        if inciertas:
+                            st.markdown(
+                                f"Con el tamaño actual de los grupos, la pertenencia al 80% de **{', '.join(inciertas)}** "
+                                f"es incierta (entre 20% y 80% de las remuestras); conviene interpretarla con cautela."
+                            )
+
                     st.markdown("**Áreas prioritarias de intervención y estrategia sugerida:**")
                     for _, row in criticas.iterrows():
                         letra = row['Letra']
@@ -1135,9 +1448,161 @@ def render_analisis_general():
   **Estrategia sugerida para {carrera_sel_corta}:** {estrategia}
 """
                         )
+
+
+# -------------------------------------------------
+# RENDER 2a · GRUPOS DE PERFIL
+# -------------------------------------------------
+def render_grupos_perfil():
+    st.header("🧩 Grupos naturales de perfil CHASIDE")
+    st.caption(
+        "Agrupa a los estudiantes por la forma de sus siete puntajes combinados (k-means por mini-lotes), "
+        "más allá de su única área fuerte. Cada grupo se nombra por sus dos letras más altas; el número "
+        "de grupos se ajusta en la barra lateral. Quienes respondieron siempre igual no se agrupan."
+    )
+
+    grupos = grupos_perfil(compartido, k_grupos)
+    if not grupos['nombres']:
+        st.info("No hay respuestas confiables suficientes para formar grupos de perfil.")
+        return
+
+    en_grupo = grupos['grupo'].isin(grupos['nombres'])
+    columnas_puntaje = [f'PUNTAJE_COMBINADO_{a}' for a in AREAS]
+    perfil_medio = (
+        df.loc[en_grupo, columnas_puntaje]
+        .groupby(grupos['grupo'][en_grupo])
+        .mean()
+        .reindex(grupos['nombres'])
+    )
+    perfil_medio.columns = AREAS
+
+    fig_grupos = px.imshow(
+        perfil_medio,
+        aspect='auto',
+        text_auto='.1f',
+        color_continuous_scale='Blues',
+        labels=dict(x="Área CHASIDE", y="Grupo", color="Puntaje medio")
+    )
+    fig_grupos.update_layout(height=max(320, 60 * len(perfil_medio)), margin=dict(t=40, b=40))
+    st.plotly_chart(fig_grupos, use_container_width=True)
+
+    st.markdown("### 🎓 Grupos de perfil por carrera")
+    por_carrera = pd.crosstab(df.loc[en_grupo, 'Carrera_Corta'], grupos['grupo'][en_grupo])
+    por_carrera = por_carrera.reindex(columns=grupos['nombres'], fill_value=0)
+    pct_carrera = por_carrera.div(por_carrera.sum(axis=1), axis=0) * 100
+
+    fig_cruce = px.imshow(
+        pct_carrera,
+        aspect='auto',
+        text_auto='.0f',
+        color_continuous_scale='Purples',
+        labels=dict(x="Grupo de perfil", y="Carrera", color="% de la carrera")
+    )
+    fig_cruce.update_layout(height=max(360, 40 * len(pct_carrera)), margin=dict(t=40, b=40))
+    st.plotly_chart(fig_cruce, use_container_width=True)
+
+    st.dataframe(
+        por_carrera.assign(Total=por_carrera.sum(axis=1)).rename_axis(index='Carrera', columns=None),
+        use_container_width=True
+    )
+
+
+# -------------------------------------------------
+# RENDER 2b · SENSIBILIDAD A LOS PESOS
+# -------------------------------------------------
+@st.fragment
+def render_sensibilidad_pesos():
+    st.header("🎚️ Sensibilidad a la relación Intereses / Aptitudes")
+    st.caption(
+        "Evalúa de una sola vez las 21 relaciones de pesos (0/100 a 100/0 en pasos de 5%) "
+        "sobre los puntajes de intereses y aptitudes ya calculados, para ver qué tan estable es "
+        "la clasificación de cada estudiante y de cada carrera al cambiar los pesos."
+    )
+
+    if not st.toggle("Activar análisis de sensibilidad", key="sens_activar"):
+        return
+
+    barrido = barrido_sensibilidad_cacheado(
+        df[[f'INTERES_{a}' for a in AREAS]].to_numpy(),
+        df[[f'APTITUD_{a}' for a in AREAS]].to_numpy(),
+        df[columna_carrera].astype(str).str.strip().to_numpy(),
+        df['Respondio_Siempre_Igual'].to_numpy(),
+        perfil_config
+    )
+    por_estudiante, por_carrera = resumir_estabilidad(barrido, df[columna_carrera], peso_intereses)
+
+    carreras_sens = sorted(por_carrera['Carrera'].unique())
+    carrera_sens = st.selectbox(
+        "Carrera para el análisis de sensibilidad:",
+        ["Todas las carreras"] + carreras_sens,
+        key="sens_carrera"
+    )
+
+    if carrera_sens == "Todas las carreras":
+        conteos = por_carrera.groupby('Peso_Intereses')[ETIQUETAS_SEMAFORO].sum().reset_index()
+        mask_est = np.ones(len(df), dtype=bool)
+    else:
+        conteos = por_carrera[por_carrera['Carrera'] == carrera_sens].drop(columns='Carrera')
+        mask_est = (df[columna_carrera].astype(str).str.strip() == carrera_sens).to_numpy()
+
+    conteos_largo = conteos.melt(id_vars='Peso_Intereses', var_name='Semáforo', value_name='N')
+    totales = conteos_largo.groupby('Peso_Intereses')['N'].transform('sum')
+    conteos_largo['Porcentaje'] = np.where(totales > 0, conteos_largo['N'] / totales * 100, 0.0)
+    conteos_largo['Peso de intereses (%)'] = conteos_largo['Peso_Intereses'] * 100
+
+    fig_sens = px.area(
+        conteos_largo,
+        x='Peso de intereses (%)',
+        y='Porcentaje',
+        color='Semáforo',
+        category_orders={'Semáforo': ETIQUETAS_SEMAFORO},
+        color_discrete_map=COLORES_SEMAFORO,
+        hover_data=['N']
+    )
+    fig_sens.add_vline(x=peso_intereses * 100, line_dash='dash', line_color='#7c3aed')
+    fig_sens.update_layout(
+        height=480,
+        yaxis_title="Porcentaje de estudiantes (%)",
+        legend=dict(orientation="h", y=-0.25, x=0.5, xanchor="center"),
+        margin=dict(t=40, b=120)
+    )
+    st.plotly_chart(fig_sens, use_container_width=True)
+
+    st.markdown("### 🗺️ Porcentaje en Verde por carrera y relación de pesos")
+    pct_verde = por_carrera.assign(
+        Total=por_carrera[ETIQUETAS_SEMAFORO].sum(axis=1)
+    )
+    pct_verde['Verde_%'] = np.where(pct_verde['Total'] > 0, pct_verde['Verde'] / pct_verde['Total'] * 100, 0.0)
+    mapa = pct_verde.pivot(index='Carrera', columns='Peso_Intereses', values='Verde_%')
+    mapa.columns = [f"{int(round(c * 100))}%" for c in mapa.columns]
+
+    fig_mapa = px.imshow(
+        mapa,
+        aspect='auto',
+        color_continuous_scale='Greens',
+        labels=dict(x="Peso de intereses", y="Carrera", color="% Verde")
+    )
+    fig_mapa.update_layout(height=max(360, 40 * len(mapa)), margin=dict(t=40, b=40))
+    st.plotly_chart(fig_mapa, use_container_width=True)
+
+    st.markdown("### 📋 Estabilidad individual de la clasificación")
+    tabla_sens = por_estudiante.copy()
+    tabla_sens.insert(0, 'Carrera', df[columna_carrera].to_numpy())
+    tabla_sens.insert(0, 'Nombre del estudiante', df[columna_nombre].to_numpy())
+    tabla_sens = (
+        tabla_sens[mask_est]
+        .sort_values(['Estabilidad semáforo (%)', 'Nombre del estudiante'])
+    )
+    st.dataframe(tabla_sens, use_container_width=True, hide_index=True)
+
+    estables = (tabla_sens['Semáforos distintos'] == 1).mean() * 100 if len(tabla_sens) else 0.0
+    st.metric("Estudiantes con el mismo semáforo en las 21 relaciones", f"{estables:.1f}%")
+
+
 # -------------------------------------------------
 # RENDER 3 · INFORMACIÓN INDIVIDUAL
 # -------------------------------------------------
+@st.fragment
 def render_info_individual():
     st.title("📘 Información particular del estudiantado – CHASIDE")
     st.caption(
@@ -1151,7 +1616,7 @@ def render_info_individual():
         return
 
     carrera_sel = st.selectbox("Carrera a evaluar:", carreras, index=0, key="ind_carrera")
-    d_carrera = df[df[columna_carrera] == carrera_sel].copy()
+    d_carrera = df[df[columna_carrera] == carrera_sel]
 
     if d_carrera.empty:
         st.warning("No hay estudiantes para esta carrera.")
@@ -1161,7 +1626,7 @@ def render_info_individual():
     est_sel = st.selectbox("Estudiante:", nombres, index=0, key="ind_estudiante")
 
     alumno_mask = (df[columna_carrera] == carrera_sel) & (df[columna_nombre].astype(str) == est_sel)
-    alumno = df[alumno_mask].copy()
+    alumno = df[alumno_mask]
     if alumno.empty:
         st.warning("No se encontró el estudiante seleccionado.")
         return
@@ -1188,7 +1653,6 @@ def render_info_individual():
     correo_participante = al[COLUMNA_EMAIL] if COLUMNA_EMAIL in al.index else "No disponible"
     sexo_participante = al['Seleccione su sexo'] if 'Seleccione su sexo' in al.index else "No disponible"
 
-
     st.markdown("## 📝 Conclusión y recomendación")
     texto_conclusion = construir_conclusion_recomendacion(
         al=al,
@@ -1197,16 +1661,68 @@ def render_info_individual():
         nivel_alumno=nivel_alumno
     )
     st.markdown(texto_conclusion)
+    if al.get('Respondio_Siempre_Igual', False) and al.get('Motivo_No_Confiable', ''):
+        st.caption(f"Criterios de calidad detectados: {al['Motivo_No_Confiable']}.")
+
+    st.markdown("## 📊 Posición frente a sus pares")
+    tablas = normas(compartido)
+    carrera_norma = str(carrera_sel).strip()
+    puntajes_al = al[[f'PUNTAJE_COMBINADO_{a}' for a in AREAS]].to_numpy(dtype=float)
+    percentiles_carrera = tablas.percentiles(puntajes_al, carrera_norma)
+    percentiles_general = tablas.percentiles(puntajes_al)
+    st.caption(
+        f"Percentil del puntaje combinado de cada área frente a los {tablas.tamano(carrera_norma):,} estudiantes "
+        f"de {carrera_sel} y a los {tablas.tamano():,} de toda la cohorte con respuestas confiables."
+    )
+    st.dataframe(
+        pd.DataFrame({
+            'Área': [f"{a} · {AREAS_LONG[a]}" for a in AREAS],
+            'Puntaje combinado': puntajes_al.round(2),
+            'Percentil en su carrera': percentiles_carrera.round(1),
+            'Percentil en la cohorte': percentiles_general.round(1)
+        }),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            c: st.column_config.ProgressColumn(c, min_value=0, max_value=100, format="%.0f")
+            for c in ('Percentil en su carrera', 'Percentil en la cohorte')
+        }
+    )
+
+    st.markdown("## 🧭 Carreras más afines del catálogo")
+    rec = recomendaciones(compartido)
+    posicion = df.index.get_loc(alumno.index[0])
+    lugar = int(rec['lugar_elegida'][posicion])
+    st.caption(
+        "Afinidad: promedio del puntaje combinado en las letras del perfil de cada carrera, calculada contra "
+        f"las {len(rec['nombres'])} carreras con perfil definido. El margen es la ventaja sobre la carrera "
+        "que le sigue en el ranking. "
+        + (f"{carrera_sel} ocupa el lugar {lugar} de {len(rec['nombres'])}." if lugar
+           else f"{carrera_sel} no tiene perfil definido en el catálogo.")
+    )
+    st.dataframe(
+        pd.DataFrame({
+            'Lugar': np.arange(1, rec['indices'].shape[1] + 1),
+            'Carrera': [rec['nombres'][c] for c in rec['indices'][posicion]],
+            'Afinidad': rec['afinidad'][posicion].round(2),
+            'Margen sobre la siguiente': rec['margen'][posicion].round(2)
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+    if al.get('Respondio_Siempre_Igual', False):
+        st.caption("⚠️ Las respuestas de este estudiante no son confiables; tome el ranking con cautela.")
+
+    texto_ubicacion_pdf = texto_ubicacion_percentiles(percentiles_carrera, percentiles_general)
 
-    texto_ubicacion_pdf = ""
-    
     pdf_bytes = build_pdf_report(
         estudiante=est_sel,
         carrera=carrera_sel,
         categoria=categoria_larga,
         intensidad=nivel_alumno if pd.notna(nivel_alumno) else "No disponible",
         texto_ubicacion=texto_ubicacion_pdf,
-        conclusion_txt=texto_conclusion
+        conclusion_txt=texto_conclusion,
+        puntajes=al
     )
 
     st.download_button(
@@ -1216,6 +1732,407 @@ def render_info_individual():
         mime="application/pdf",
         use_container_width=True
     )
+
+    render_similares(posicion, carrera_sel)
+
+
+# -------------------------------------------------
+# RENDER 3 · ESTUDIANTES SIMILARES (fragmento)
+# -------------------------------------------------
+@st.fragment
+def render_similares(posicion: int, carrera_sel: str):
+    st.markdown("## 👥 Estudiantes con respuestas similares")
+    st.caption(
+        "Estudiantes de toda la cohorte cuyas 98 respuestas difieren en menos reactivos de las del "
+        "estudiante seleccionado (distancia de Hamming), con la carrera que eligieron y su clasificación."
+    )
+    n_similares = st.slider("Número de estudiantes similares", 5, 25, 10, 1, key="ind_similares_k")
+    vecinos, distancias = indice_similares(compartido).vecinos(posicion, n_similares)
+
+    if len(vecinos) == 0:
+        st.info("No hay otros estudiantes con quienes comparar.")
+    else:
+        similares = df.iloc[vecinos]
+        tabla_similares = pd.DataFrame({
+            'Nombre del estudiante': similares[columna_nombre].to_numpy(),
+            'Carrera elegida': similares[columna_carrera].to_numpy(),
+            'Semáforo vocacional': similares['Semáforo Vocacional'].to_numpy(),
+            'Nivel de intensidad': df_intensidad['Nivel_Intensidad'].reindex(similares.index).to_numpy(),
+            'Carrera sugerida compatible': similares['Destino_Compatible'].to_numpy(),
+            'Reactivos distintos': distancias,
+            'Coincidencia (%)': np.round((1 - distancias / len(columnas_items)) * 100, 1)
+        })
+        st.dataframe(tabla_similares, use_container_width=True, hide_index=True)
+
+        misma_carrera = (similares[columna_carrera].astype(str) == carrera_sel).mean() * 100
+        st.metric("Similares que eligieron la misma carrera", f"{misma_carrera:.0f}%")
+
+
+# -------------------------------------------------
+# RENDER 3b · ENVÍO MASIVO DE REPORTES (fragmento)
+# -------------------------------------------------
+@st.fragment
+def render_envio_reportes():
+    st.title("📧 Envío masivo de reportes por correo – CHASIDE")
+    st.caption(
+        "Envía a cada estudiante su reporte en PDF al correo registrado en el cuestionario. "
+        "Los envíos quedan en una bitácora: si el proceso se interrumpe, al repetirlo con el mismo "
+        "identificador sólo se mandan los reportes pendientes."
+    )
+
+    try:
+        config = config_smtp(secretos_smtp())
+    except ValueError as e:
+        st.error(f"Configuración SMTP no válida: {e}")
+        return
+    if not config['host']:
+        st.info(
+            "Configure el servidor SMTP con las variables CHASIDE_SMTP_HOST, CHASIDE_SMTP_PUERTO, "
+            "CHASIDE_SMTP_USUARIO, CHASIDE_SMTP_CONTRASENA y CHASIDE_SMTP_REMITENTE, o con la sección "
+            "[smtp] de los secretos de la app."
+        )
+        return
+
+    envios = envios_reportes(compartido)
+    carreras = ["Todas"] + sorted(envios['carrera'].unique())
+    col_carrera, col_campana = st.columns(2)
+    carrera_envio = col_carrera.selectbox("Carrera", carreras, key="envio_carrera")
+    campana = col_campana.text_input(
+        "Identificador del envío", value=f"reportes-{identificador_version(compartido.version)}",
+        key="envio_campana"
+    ).strip()
+
+    seleccion = envios if carrera_envio == "Todas" else envios[envios['carrera'] == carrera_envio]
+    sin_correo = int((~seleccion['correo_valido']).sum())
+    seleccion = seleccion[seleccion['correo_valido']]
+
+    bitacora = BitacoraEnvios(RUTA_BITACORA_ENVIOS)
+    try:
+        # Las métricas se llenan después del envío para reflejar la bitácora actualizada.
+        c1, c2, c3 = st.columns(3)
+        st.caption(
+            f"Servidor {config['host']}:{config['puerto']} · remitente {config['remitente'] or 'sin definir'} · "
+            f"{config['conexiones']} conexiones · hasta {config['por_minuto']} mensajes por minuto."
+        )
+
+        if st.button("Enviar reportes", type="primary", disabled=not campana or seleccion.empty,
+                     key="envio_enviar"):
+            barra = st.progress(0.0, text="Enviando reportes…")
+            resumen = enviar_reportes(
+                seleccion[['correo', 'nombre', 'carrera', 'categoria', 'intensidad', 'conclusion', 'ubicacion']
+                          + COLUMNAS_PUNTAJES_PDF].to_dict('records'),
+                pdf_envio,
+                config,
+                bitacora,
+                campana,
+                al_avanzar=lambda hechos, total: barra.progress(
+                    hechos / total, text=f"Enviando reportes… {hechos:,} de {total:,}"
+                )
+            )
+            barra.empty()
+            st.success(
+                f"Enviados: {resumen['enviados']:,} · fallidos: {resumen['fallidos']:,} · "
+                f"omitidos por haberse enviado antes: {resumen['omitidos']:,}."
+            )
+        registro = bitacora.resumen(campana)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    finally:
+        bitacora.cerrar()
+
+    c1.metric("Estudiantes con correo", f"{len(seleccion):,}")
+    c2.metric("Ya enviados en este envío", f"{int((registro['estado'] == 'enviado').sum()):,}")
+    c3.metric("Sin correo válido", f"{sin_correo:,}")
+
+    fallidos = registro[registro['estado'] == 'fallido']
+    if not fallidos.empty:
+        st.warning(f"{len(fallidos):,} reportes no se pudieron enviar; se reintentarán al repetir el envío.")
+        st.dataframe(fallidos, use_container_width=True, hide_index=True)
+
+
+# -------------------------------------------------
+# RENDER 4 · HISTÓRICO DE COHORTES
+# -------------------------------------------------
+def render_historico():
+    st.title("🗂️ Histórico de cohortes – CHASIDE")
+    st.caption(
+        "Compare generaciones guardadas en el histórico local. Las agregaciones se calculan "
+        f"directamente en la base `{RUTA_HISTORICO}`, sin cargar los resultados completos de cada cohorte."
+    )
+
+    render_cambios_version()
+
+    st.header("📚 Cohortes guardadas")
+    cohortes_guardadas = listar_cohortes(RUTA_HISTORICO)
+    if cohortes_guardadas.empty:
+        st.info("Aún no hay cohortes guardadas. Use el botón del panel lateral para guardar la cohorte actual.")
+        return
+
+    st.dataframe(
+        cohortes_guardadas.rename(columns={
+            'cohorte': 'Cohorte',
+            'fecha_guardado': 'Fecha de guardado',
+            'peso_intereses': 'Peso intereses',
+            'peso_aptitudes': 'Peso aptitudes',
+            'n_estudiantes': 'Estudiantes'
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+
+    todas = cohortes_guardadas['cohorte'].tolist()
+    cohortes_sel = st.multiselect("Cohortes a comparar:", todas, default=todas, key="hist_cohortes")
+    carrera_hist = st.selectbox(
+        "Carrera:",
+        ["Todas las carreras"] + listar_carreras_historico(RUTA_HISTORICO),
+        key="hist_carrera"
+    )
+    carrera_filtro = None if carrera_hist == "Todas las carreras" else carrera_hist
+
+    if not cohortes_sel:
+        st.warning("Seleccione al menos una cohorte.")
+        return
+
+    st.header("🚦 Evolución del semáforo vocacional")
+    tend_sem = tendencia_por_columna(RUTA_HISTORICO, 'semaforo', cohortes_sel, carrera_filtro)
+    if tend_sem.empty:
+        st.info("No hay registros para la selección actual.")
+    else:
+        fig_sem = px.bar(
+            tend_sem,
+            x='cohorte',
+            y='Porcentaje',
+            color='semaforo',
+            color_discrete_map=COLORES_SEMAFORO,
+            barmode='stack',
+            hover_data=['N'],
+            labels={'cohorte': 'Cohorte', 'semaforo': 'Semáforo vocacional'}
+        )
+        fig_sem.update_layout(
+            height=520,
+            legend=dict(orientation="h", y=-0.2, x=0.5, xanchor="center"),
+            margin=dict(t=40, b=120)
+        )
+        st.plotly_chart(fig_sem, use_container_width=True)
+
+    st.header("📈 Evolución de la intensidad vocacional")
+    tend_int = tendencia_por_columna(RUTA_HISTORICO, 'nivel_intensidad', cohortes_sel, carrera_filtro)
+    if tend_int.empty:
+        st.info("No hay datos de intensidad para la selección actual.")
+    else:
+        fig_tend_int = px.bar(
+            tend_int,
+            x='cohorte',
+            y='Porcentaje',
+            color='nivel_intensidad',
+            category_orders={'nivel_intensidad': list(COLORES_INTENSIDAD)},
+            color_discrete_map=COLORES_INTENSIDAD,
+            barmode='stack',
+            hover_data=['N'],
+            labels={'cohorte': 'Cohorte', 'nivel_intensidad': 'Nivel de intensidad'}
+        )
+        fig_tend_int.update_layout(
+            height=520,
+            legend=dict(orientation="h", y=-0.2, x=0.5, xanchor="center"),
+            margin=dict(t=40, b=120)
+        )
+        st.plotly_chart(fig_tend_int, use_container_width=True)
+
+    st.header("🧭 Promedio por área CHASIDE")
+    prom_areas = promedio_areas_historico(RUTA_HISTORICO, cohortes_sel, carrera_filtro)
+    if not prom_areas.empty:
+        prom_largo = prom_areas.melt(
+            id_vars=['cohorte', 'N'],
+            value_vars=AREAS,
+            var_name='Letra',
+            value_name='Promedio'
+        )
+        fig_areas = px.line(
+            prom_largo,
+            x='cohorte',
+            y='Promedio',
+            color='Letra',
+            markers=True,
+            labels={'cohorte': 'Cohorte', 'Promedio': 'Puntaje total promedio'}
+        )
+        fig_areas.update_layout(height=480, margin=dict(t=40, b=60))
+        st.plotly_chart(fig_areas, use_container_width=True)
+
+    st.header("🔎 Trayectoria de un estudiante")
+    email_buscar = st.text_input("Correo electrónico del estudiante:", key="hist_email")
+    if email_buscar.strip():
+        trayectoria = historial_estudiante(RUTA_HISTORICO, email_buscar)
+        if trayectoria.empty:
+            st.info("No se encontraron registros para ese correo.")
+        else:
+            st.dataframe(
+                trayectoria.rename(columns={
+                    'cohorte': 'Cohorte',
+                    'carrera': 'Carrera',
+                    'nombre': 'Nombre del estudiante',
+                    'area_fuerte': 'Área fuerte CHASIDE',
+                    'semaforo': 'Semáforo vocacional',
+                    'nivel_intensidad': 'Nivel de intensidad',
+                    'destino_compatible': 'Carrera sugerida compatible'
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
+
+# -------------------------------------------------
+# RENDER 4 · CAMBIOS DE CLASIFICACIÓN (fragmento)
+# -------------------------------------------------
+@st.fragment
+def render_cambios_version():
+    st.header("🔀 Cambios de clasificación")
+    st.caption(
+        "Estudiantes cuya carrera elegida, semáforo, nivel de intensidad o carrera sugerida compatible "
+        "cambió respecto a una referencia. Se comparan por correo electrónico; los envíos sin correo no se incluyen."
+    )
+
+    referencias = {}
+    anterior = st.session_state.get("version_anterior")
+    if anterior is not None:
+        referencias[f"Versión anterior de esta sesión (cambió: {anterior['descripcion']})"] = (
+            ('version', anterior['version']),
+            lambda: anterior['clasificacion']
+        )
+    for cohorte, fecha in listar_cohortes(RUTA_HISTORICO)[['cohorte', 'fecha_guardado']].itertuples(index=False):
+        referencias[f"Cohorte guardada '{cohorte}' ({fecha})"] = (
+            ('historico', cohorte, fecha),
+            functools.partial(clasificacion_historico, RUTA_HISTORICO, cohorte)
+        )
+
+    if not referencias:
+        st.info(
+            "Cambie los pesos, los perfiles o la fuente de datos, o guarde una cohorte en el histórico, "
+            "para comparar contra la versión actual."
+        )
+        return
+
+    referencia = st.selectbox("Comparar la versión actual contra:", list(referencias), key="cambios_referencia")
+    clave_referencia, construir_referencia = referencias[referencia]
+    comparacion = comparacion_version(compartido, clave_referencia, construir_referencia)
+    conteos = comparacion['conteos']
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Estudiantes en ambas", f"{conteos['comparados']:,}")
+    c2.metric("Con cambios", f"{conteos['con_cambios']:,}")
+    c3.metric("Nuevos", f"{conteos['nuevos']:,}")
+    c4.metric("Ya no aparecen", f"{conteos['ya_no_aparecen']:,}")
+
+    if comparacion['cambios'].empty:
+        st.success("No hay cambios de clasificación frente a la referencia.")
+        return
+
+    resumen = comparacion['resumen']
+    if not resumen.empty:
+        st.subheader("Movimientos principales")
+        st.markdown("\n".join(f"- {d}" for d in resumen['Descripción'].head(5)))
+        with st.expander(f"Todos los movimientos ({len(resumen)})"):
+            st.dataframe(resumen.drop(columns='Descripción'), use_container_width=True, hide_index=True)
+
+    st.subheader("Estudiantes con cambios")
+    render_tabla_paginada(comparacion['cambios'], key="cambios")
+    st.download_button(
+        label="⬇️ Descargar cambios de clasificación (.xlsx)",
+        data=lambda: dataframe_a_excel_bytes({
+            'Resumen': resumen,
+            'Cambios': comparacion['cambios']
+        }),
+        file_name="cambios_clasificacion_CHASIDE.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        use_container_width=True,
+        key="download_cambios_xlsx"
+    )
+
+
+# -------------------------------------------------
+# RENDER 5 · ANÁLISIS DE REACTIVOS
+# -------------------------------------------------
+def render_analisis_reactivos():
+    st.title("🔎 Análisis de reactivos – CHASIDE")
+    st.caption(
+        "Comportamiento de cada uno de los 98 reactivos: proporción de respuestas 'sí', correlación "
+        "reactivo-resto dentro de su escala de área (10 reactivos de intereses + 4 de aptitudes) y "
+        "alfa de Cronbach por área, para toda la cohorte y por carrera."
+    )
+
+    momentos = momentos_reactivos(compartido)
+    if momentos.get(TOTAL_COHORTE, (0,))[0] < 2:
+        st.warning("Se necesitan al menos dos estudiantes para el análisis de reactivos.")
+        return
+
+    tabla = compartido.derivado(
+        'analisis_reactivos', lambda: analisis_reactivos(momentos, [str(c) for c in columnas_items])
+    )
+    alfas = compartido.derivado('alfa_por_area', lambda: alfa_por_area(momentos))
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Reactivos a revisar", f"{int(tabla['Revisar'].sum())} de {len(tabla)}")
+    col2.metric("Correlación reactivo-resto mediana", f"{tabla['Correlacion_Item_Resto'].median():.2f}")
+    col3.metric("Alfa mediano por área (cohorte)", f"{alfas.loc[0, AREAS].astype(float).median():.2f}")
+    st.caption(
+        f"Se marca para revisión un reactivo con menos de {TASA_SI_MIN:.0%} o más de {TASA_SI_MAX:.0%} "
+        f"de respuestas 'sí', o con correlación reactivo-resto menor a {CORRELACION_ITEM_RESTO_MIN:.2f}."
+    )
+
+    st.header("📈 Correlación reactivo-resto por área")
+    fig_items = px.bar(
+        tabla,
+        x='Reactivo',
+        y='Correlacion_Item_Resto',
+        color='Área',
+        category_orders={'Área': AREAS},
+        hover_data=['Tipo', 'Tasa_Si'],
+        labels={'Correlacion_Item_Resto': 'Correlación reactivo-resto'}
+    )
+    fig_items.add_hline(y=CORRELACION_ITEM_RESTO_MIN, line_dash='dash', line_color='#dc2626')
+    fig_items.update_layout(
+        height=460,
+        legend=dict(orientation="h", y=-0.2, x=0.5, xanchor="center"),
+        margin=dict(t=40, b=120)
+    )
+    st.plotly_chart(fig_items, use_container_width=True)
+
+    st.header("📋 Detalle por reactivo")
+    solo_revisar = st.toggle("Mostrar sólo reactivos a revisar", key="reactivos_revisar")
+    vista = tabla[tabla['Revisar']] if solo_revisar else tabla
+    tabla_vista = vista.rename(columns={
+        'Tasa_Si': "Proporción 'sí'",
+        'Correlacion_Item_Resto': 'Correlación reactivo-resto'
+    }).round(3)
+    st.dataframe(tabla_vista, use_container_width=True, hide_index=True)
+
+    st.header("🧮 Alfa de Cronbach por área y carrera")
+    mapa_alfa = alfas.set_index('Grupo')[AREAS].astype(float)
+    fig_alfa = px.imshow(
+        mapa_alfa,
+        aspect='auto',
+        text_auto='.2f',
+        color_continuous_scale='RdYlGn',
+        zmin=0,
+        zmax=1,
+        labels=dict(x="Área CHASIDE", y="Grupo", color="Alfa")
+    )
+    fig_alfa.update_layout(height=max(360, 40 * len(mapa_alfa)), margin=dict(t=40, b=40))
+    st.plotly_chart(fig_alfa, use_container_width=True)
+
+    st.download_button(
+        label="⬇️ Descargar análisis de reactivos (.xlsx)",
+        data=lambda: dataframe_a_excel_bytes({
+            'Reactivos': tabla,
+            'Alfa por área': alfas
+        }),
+        file_name="analisis_reactivos_CHASIDE.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        use_container_width=True,
+        key="download_reactivos_xlsx"
+    )
+
+
 # -------------------------------------------------
 # APP
 # -------------------------------------------------
@@ -1223,5 +2140,11 @@ if seccion == "Presentación":
     render_presentacion()
 elif seccion == "Análisis general":
     render_analisis_general()
-else:
+elif seccion == "Información individual":
     render_info_individual()
+elif seccion == "Envío de reportes":
+    render_envio_reportes()
+elif seccion == "Histórico de cohortes":
+    render_historico()
+else:
+    render_analisis_reactivos()
@@ -0,0 +1,2690 @@
+# ============================================
+# MOTOR CHASIDE
+# Puntuación, clasificación, ingesta y reportes sin dependencia de Streamlit.
+# Lo usan la app (main.py) y el servicio de puntuación (servicio_puntuacion.py).
+# ============================================
+
+import asyncio
+import hashlib
+import io
+import json
+import os
+import queue
+import re
+import shutil
+import smtplib
+import sys
+import tempfile
+import time
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from email.message import EmailMessage
+from functools import lru_cache
+
+import httpx
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_LEFT
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Flowable
+
+
+# -------------------------------------------------
+# CONSTANTES
+# -------------------------------------------------
+AREAS = ['C', 'H', 'A', 'S', 'I', 'D', 'E']
+
+AREAS_LONG = {
+    "C": "Administrativo",
+    "H": "Humanidades y Sociales",
+    "A": "Artístico",
+    "S": "Ciencias de la Salud",
+    "I": "Enseñanzas Técnicas",
+    "D": "Defensa y Seguridad",
+    "E": "Ciencias Experimentales"
+}
+
+INTERESES_ITEMS = {
+    'C': [1, 12, 20, 53, 64, 71, 78, 85, 91, 98],
+    'H': [9, 25, 34, 41, 56, 67, 74, 80, 89, 95],
+    'A': [3, 11, 21, 28, 36, 45, 50, 57, 81, 96],
+    'S': [8, 16, 23, 33, 44, 52, 62, 70, 87, 92],
+    'I': [6, 19, 27, 38, 47, 54, 60, 75, 83, 97],
+    'D': [5, 14, 24, 31, 37, 48, 58, 65, 73, 84],
+    'E': [17, 32, 35, 42, 49, 61, 68, 77, 88, 93]
+}
+
+APTITUDES_ITEMS = {
+    'C': [2, 15, 46, 51],
+    'H': [30, 63, 72, 86],
+    'A': [22, 39, 76, 82],
+    'S': [4, 29, 40, 69],
+    'I': [10, 26, 59, 90],
+    'D': [13, 18, 43, 66],
+    'E': [7, 55, 79, 94]
+}
+
+DEFAULT_PERFILES = {
+    'Arquitectura': ['A', 'I', 'C'],
+    'Contador Público': ['C', 'D'],
+    'Licenciatura en Administración': ['C', 'D'],
+    'Ingeniería Ambiental': ['I', 'C', 'E'],
+    'Ingeniería Bioquímica': ['I', 'C', 'E'],
+    'Ingeniería en Gestión Empresarial': ['C', 'D', 'H'],
+    'Ingeniería Industrial': ['C', 'D', 'H'],
+    'Ingeniería en Inteligencia Artificial': ['I', 'E'],
+    'Ingeniería Mecatrónica': ['I', 'E'],
+    'Ingeniería en Sistemas Computacionales': ['I', 'E']
+}
+
+ESTRATEGIAS_CHASIDE = {
+    "C": {
+        "area": "Administrativo",
+        "estrategia": (
+            "Fortalecer organización, planeación, seguimiento de instrucciones, "
+            "gestión del tiempo y resolución estructurada de problemas."
+        )
+    },
+    "H": {
+        "area": "Humanidades y Sociales",
+        "estrategia": (
+            "Promover comunicación oral y escrita, argumentación, comprensión de textos, "
+            "análisis de casos y trabajo colaborativo."
+        )
+    },
+    "A": {
+        "area": "Artístico",
+        "estrategia": (
+            "Incorporar ejercicios de creatividad, diseño, visualización de ideas, "
+            "prototipos y solución innovadora de problemas."
+        )
+    },
+    "S": {
+        "area": "Ciencias de la Salud",
+        "estrategia": (
+            "Favorecer observación, precisión, estudio de casos, empatía profesional "
+            "y actividades con orientación al servicio."
+        )
+    },
+    "I": {
+        "area": "Enseñanzas Técnicas",
+        "estrategia": (
+            "Reforzar pensamiento lógico, modelado, cálculo, uso de herramientas, "
+            "prácticas guiadas y resolución técnica de problemas."
+        )
+    },
+    "D": {
+        "area": "Defensa y Seguridad",
+        "estrategia": (
+            "Impulsar liderazgo, disciplina, trabajo en equipo, responsabilidad "
+            "y toma de decisiones en contextos estructurados."
+        )
+    },
+    "E": {
+        "area": "Ciencias Experimentales",
+        "estrategia": (
+            "Estimular observación sistemática, experimentación, interpretación de datos, "
+            "método y pensamiento crítico."
+        )
+    }
+}
+
+DESC_INTENSIDAD = {
+    "Sin perfil": "Estudiante cuya elección de carrera no muestra correspondencia con su perfil vocacional.",
+    "Perfil en riesgo": "Estudiante cuyo perfil vocacional presenta una coincidencia mínima con la carrera elegida.",
+    "Perfil en transición": "Estudiante cuya elección profesional y perfil vocacional presentan congruencia, aunque aún en proceso de consolidación.",
+    "Jóven promesa": "Estudiante con alta congruencia entre su perfil vocacional y la carrera elegida."
+}
+
+CAT_MAP_LARGO = {
+    'Verde': 'El perfil coincide con la carrera elegida',
+    'Amarillo': 'El perfil NO va acorde con la carrera elegida',
+    'Rojo': 'No se observa un perfil prioritario',
+    'Sin sugerencia': 'No se observa un perfil prioritario',
+    'Respondió siempre igual': 'Respondió siempre igual'
+}
+
+COLUMNA_EMAIL = 'Dirección de correo electrónico'
+COLUMNA_CAMPUS = 'Campus'
+COLUMNA_NOMBRE = 'Ingrese su nombre completo'
+COLUMNA_MARCA_TEMPORAL = 'Marca temporal'
+COLUMNA_CARRERA = '¿A qué carrera desea ingresar?'
+COLUMNA_SEXO = 'Seleccione su sexo'
+
+# Columnas del formulario que se leen además de los reactivos; el resto de la hoja se ignora.
+COLUMNAS_FORMULARIO = [COLUMNA_MARCA_TEMPORAL, COLUMNA_EMAIL, COLUMNA_NOMBRE, COLUMNA_SEXO, COLUMNA_CARRERA]
+N_REACTIVOS = 98
+# Orden del formulario original, para encabezados sin número de pregunta.
+POSICION_PRIMER_REACTIVO = 6
+FILAS_MUESTRA_ESQUEMA = 20
+
+# Qué envío se conserva cuando un estudiante contesta el formulario más de una vez.
+CRITERIOS_DUPLICADOS = {
+    'reciente': 'El más reciente (Marca temporal)',
+    'completo': 'El más completo (más celdas contestadas)',
+    'ninguno': 'Conservar todos los envíos'
+}
+CRITERIO_DUPLICADOS = 'reciente'
+
+MAPEO_RESPUESTAS = {
+    'sí': 1, 'si': 1, 's': 1, '1': 1, 'true': 1, 'verdadero': 1, 'x': 1,
+    'no': 0, 'n': 0, '0': 0, 'false': 0, 'falso': 0, '': 0, 'nan': 0
+}
+
+# Indicadores de calidad de respuesta. En modo 'cuantil' el valor es la proporción más
+# extrema que se marca; en modo 'absoluto' es el umbral directo del indicador.
+INDICADORES_CALIDAD = {
+    'Desv_Intrapersona': {
+        'etiqueta': 'Desviación intrapersona baja',
+        'sentido': 'menor',
+        'modo': 'cuantil',
+        'cuantil': 0.10,
+        'absoluto': 0.25,
+        'rango': (0.0, 0.6, 0.01)
+    },
+    'Racha_Maxima': {
+        'etiqueta': 'Racha larga de respuestas idénticas',
+        'sentido': 'mayor',
+        'modo': 'absoluto',
+        'cuantil': 0.02,
+        'absoluto': 30,
+        'rango': (2, 98, 1)
+    },
+    'Tasa_Alternancia': {
+        'etiqueta': 'Alternancia sí/no sistemática',
+        'sentido': 'mayor',
+        'modo': 'absoluto',
+        'cuantil': 0.02,
+        'absoluto': 0.90,
+        'rango': (0.0, 1.0, 0.01)
+    }
+}
+
+CRITERIOS_CALIDAD = {
+    indicador: {'modo': meta['modo'], 'valor': meta[meta['modo']]}
+    for indicador, meta in INDICADORES_CALIDAD.items()
+}
+
+TIMEOUT_FUENTE_SEG = 30.0
+REINTENTOS_FUENTE = 3
+MAX_CONEXIONES_FUENTES = 8
+
+RUTA_HISTORICO = "historico_chaside.sqlite"
+
+# Instantáneas Arrow de resultados procesados para arranques en frío sin descarga ni puntuación.
+RUTA_INSTANTANEAS = os.environ.get('CHASIDE_INSTANTANEAS', 'instantaneas_chaside')
+INSTANTANEA_MAX_HORAS = float(os.environ.get('CHASIDE_INSTANTANEA_MAX_HORAS', 12))
+FORMATO_INSTANTANEA = 1
+
+# Techo global de memoria (MB) para los resultados procesados que se comparten entre sesiones.
+MEMORIA_MAX_MB = float(os.environ.get('CHASIDE_MEMORIA_MAX_MB', 1024))
+
+
+# -------------------------------------------------
+# UTILIDADES
+# -------------------------------------------------
+def col_item(columnas_items, i: int) -> str:
+    return columnas_items[i - 1]
+
+
+def transformar_url_google_sheets(url: str) -> str:
+    url = url.strip()
+
+    if "export?format=csv" in url:
+        return url
+
+    if "docs.google.com/spreadsheets" in url:
+        try:
+            file_id = url.split("/d/")[1].split("/")[0]
+
+            gid = "0"
+            if "gid=" in url:
+                gid = url.split("gid=")[-1].split("&")[0].split("#")[0]
+
+            return f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=csv&gid={gid}"
+        except Exception:
+            raise ValueError(
+                "No se pudo transformar automáticamente el enlace de Google Sheets. "
+                "Pega el vínculo en formato /edit o directamente en formato /export?format=csv."
+            )
+
+    return url
+
+
+def parsear_fuentes(texto: str) -> list:
+    fuentes = []
+    for linea in texto.splitlines():
+        linea = linea.strip()
+        if not linea or linea.startswith('#'):
+            continue
+        if '|' in linea:
+            campus, url = (parte.strip() for parte in linea.split('|', 1))
+        else:
+            campus, url = '', linea
+        fuentes.append((campus or f"Fuente {len(fuentes) + 1}", url))
+
+    if not fuentes:
+        raise ValueError("Indica al menos una fuente de datos (una URL por línea).")
+
+    nombres_campus = [campus for campus, _ in fuentes]
+    campus_repetidos = sorted({c for c in nombres_campus if nombres_campus.count(c) > 1})
+    if campus_repetidos:
+        raise ValueError(f"Hay nombres de campus repetidos en las fuentes: {campus_repetidos}")
+    return fuentes
+
+
+def es_url_remota(url: str) -> bool:
+    return url.lower().startswith(('http://', 'https://'))
+
+
+async def _descargar_fuente(cliente, campus, url, timeout, reintentos) -> bytes:
+    for intento in range(1, reintentos + 1):
+        try:
+            respuesta = await cliente.get(url, timeout=timeout)
+            respuesta.raise_for_status()
+            return respuesta.content
+        except httpx.HTTPError as e:
+            definitivo = (
+                isinstance(e, httpx.HTTPStatusError)
+                and e.response.status_code < 500
+                and e.response.status_code != 429
+            )
+            if definitivo or intento == reintentos:
+                raise ValueError(
+                    f"No se pudo descargar la fuente '{campus}' (intento {intento} de {reintentos}): {e}"
+                ) from e
+            await asyncio.sleep(0.5 * 2 ** (intento - 1))
+
+
+async def _descargar_fuentes(fuentes, timeout, reintentos) -> list:
+    limites = httpx.Limits(
+        max_connections=MAX_CONEXIONES_FUENTES,
+        max_keepalive_connections=MAX_CONEXIONES_FUENTES
+    )
+    async with httpx.AsyncClient(follow_redirects=True, limits=limites) as cliente:
+        return await asyncio.gather(*(
+            _descargar_fuente(cliente, campus, url, timeout, reintentos)
+            for campus, url in fuentes
+        ))
+
+
+def cargar_fuentes(fuentes, timeout: float = TIMEOUT_FUENTE_SEG,
+                   reintentos: int = REINTENTOS_FUENTE) -> pd.DataFrame:
+    fuentes = [(campus, transformar_url_google_sheets(url)) for campus, url in fuentes]
+
+    remotas = [(campus, url) for campus, url in fuentes if es_url_remota(url)]
+    contenidos = dict(zip(
+        [campus for campus, _ in remotas],
+        asyncio.run(_descargar_fuentes(remotas, timeout, reintentos)) if remotas else []
+    ))
+
+    frames = []
+    for campus, url in fuentes:
+        remota = campus in contenidos
+        # Primero el encabezado y unas filas de muestra; la hoja completa sólo si el esquema es
+        # válido, y sólo con las columnas que se usan.
+        columnas = set(resolver_esquema(io.BytesIO(contenidos[campus]) if remota else url, campus))
+        try:
+            frame = pd.read_csv(
+                io.BytesIO(contenidos[campus]) if remota else url,
+                usecols=lambda c: str(c).strip() in columnas
+            )
+        except Exception as e:
+            raise ValueError(f"La fuente '{campus}' no es un CSV válido: {e}") from e
+        frame.columns = frame.columns.str.strip()
+        frames.append((campus, frame))
+
+    # Las columnas ajenas al formulario ya se descartaron; basta con que coincidan las leídas.
+    campus_base, base = frames[0]
+    for campus, frame in frames[1:]:
+        distintas = sorted(set(frame.columns).symmetric_difference(base.columns))
+        if distintas:
+            raise ValueError(
+                f"Las columnas de '{campus}' no coinciden con las de '{campus_base}'. "
+                f"Diferencias: {distintas}"
+            )
+
+    return pd.concat(
+        [frame.assign(**{COLUMNA_CAMPUS: campus}) for campus, frame in frames],
+        ignore_index=True
+    )
+
+
+def dataframe_a_excel_bytes(dic_hojas: dict) -> bytes:
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        for nombre_hoja, df_hoja in dic_hojas.items():
+            nombre_limpio = str(nombre_hoja)[:31] if nombre_hoja else "Hoja"
+            df_hoja.to_excel(writer, index=False, sheet_name=nombre_limpio)
+    output.seek(0)
+    return output.getvalue()
+
+
+# -------------------------------------------------
+# ESQUEMA DEL FORMULARIO
+# Antes de la lectura completa se resuelve el esquema con el encabezado y unas filas de
+# muestra: cada reactivo se ubica por el número con que empieza su pregunta ("12. ...") y se
+# valida que contenga respuestas Sí/No. process_data ubica los reactivos con el mismo mapeo.
+# -------------------------------------------------
+PATRON_NUMERO_REACTIVO = re.compile(r'^(\d{1,3})\s*[.):-]')
+
+
+def _resolver_items(columnas) -> tuple:
+    # (columnas de reactivos en orden CHASIDE, si se ubicaron por número de pregunta).
+    columnas = [str(c).strip() for c in columnas]
+    por_numero = {}
+    for c in columnas:
+        coincidencia = PATRON_NUMERO_REACTIVO.match(c)
+        if coincidencia and 1 <= int(coincidencia.group(1)) <= N_REACTIVOS:
+            por_numero.setdefault(int(coincidencia.group(1)), []).append(c)
+
+    if len(por_numero) <= N_REACTIVOS // 2:
+        # Encabezados sin numerar (o sólo algún dato suelto como "1. Semestre"): se asume el
+        # orden de columnas del formulario original.
+        columnas_items = columnas[POSICION_PRIMER_REACTIVO:POSICION_PRIMER_REACTIVO + N_REACTIVOS]
+        if len(columnas_items) != N_REACTIVOS:
+            raise ValueError(
+                f"Se esperaban {N_REACTIVOS} reactivos CHASIDE, pero se detectaron {len(columnas_items)}. "
+                f"Verifica el orden de columnas del archivo."
+            )
+        return pd.Index(columnas_items), False
+
+    repetidos = {n: cs for n, cs in sorted(por_numero.items()) if len(cs) > 1}
+    if repetidos:
+        raise ValueError(f"Hay reactivos con el mismo número de pregunta: {repetidos}")
+    faltantes = [n for n in range(1, N_REACTIVOS + 1) if n not in por_numero]
+    if faltantes:
+        raise ValueError(
+            f"Se esperaban {N_REACTIVOS} reactivos CHASIDE, pero faltan las preguntas {faltantes}. "
+            f"Verifica que cada reactivo empiece con su número (p. ej. '12. ...')."
+        )
+    return pd.Index([por_numero[n][0] for n in range(1, N_REACTIVOS + 1)]), True
+
+
+def resolver_columnas_items(columnas) -> pd.Index:
+    return _resolver_items(columnas)[0]
+
+
+def columnas_esquema(columnas) -> list:
+    # Datos del estudiante y reactivos. Con encabezados sin numerar se conserva el bloque
+    # inicial completo para que las posiciones de los reactivos no cambien.
+    columnas = [str(c).strip() for c in columnas]
+    columnas_items, numerados = _resolver_items(columnas)
+    if not numerados:
+        return columnas[:POSICION_PRIMER_REACTIVO + N_REACTIVOS]
+    return [c for c in columnas if c in COLUMNAS_FORMULARIO] + list(columnas_items)
+
+
+def resolver_esquema(origen, campus: str) -> list:
+    try:
+        muestra = pd.read_csv(origen, nrows=FILAS_MUESTRA_ESQUEMA)
+    except Exception as e:
+        raise ValueError(f"La fuente '{campus}' no es un CSV válido: {e}") from e
+    muestra.columns = muestra.columns.str.strip()
+
+    faltantes = [c for c in [COLUMNA_NOMBRE, COLUMNA_CARRERA] if c not in muestra.columns]
+    if faltantes:
+        raise ValueError(
+            f"Faltan columnas requeridas en la fuente '{campus}': {faltantes}. "
+            f"Columnas detectadas: {list(muestra.columns)}"
+        )
+    try:
+        columnas_items = resolver_columnas_items(muestra.columns)
+    except ValueError as e:
+        raise ValueError(f"En la fuente '{campus}': {e}") from e
+
+    # Un reactivo mal ubicado suele traer texto o números que no son respuestas Sí/No.
+    no_reconocidas = []
+    for c in columnas_items:
+        respuestas = muestra[c].dropna().astype(str).str.strip().str.lower()
+        if len(respuestas) and not respuestas.isin(list(MAPEO_RESPUESTAS)).any():
+            no_reconocidas.append(c)
+    if no_reconocidas:
+        raise ValueError(
+            f"En la fuente '{campus}' hay reactivos sin respuestas Sí/No reconocibles: {no_reconocidas[:5]}. "
+            f"Verifica el orden de columnas del archivo."
+        )
+    return columnas_esquema(muestra.columns)
+
+
+# -------------------------------------------------
+# DEPURACIÓN DE ENVÍOS DUPLICADOS
+# Un estudiante se identifica por su correo y nombre normalizados (minúsculas, sin acentos
+# ni espacios de más). Las identidades se indexan por su hash de 64 bits y cada criterio se
+# resuelve con un máximo por grupo sobre ese índice: tiempo lineal, sin ordenar la cohorte.
+# -------------------------------------------------
+def normalizar_identidad(serie: pd.Series) -> pd.Series:
+    return (
+        serie.fillna('').astype(str)
+        .str.normalize('NFKD')
+        .str.replace('[\u0300-\u036f]', '', regex=True)
+        .str.lower()
+        .str.replace(r'\s+', ' ', regex=True)
+        .str.strip()
+    )
+
+
+def _conservar_por_grupo(claves: np.ndarray, prioridades) -> np.ndarray:
+    # Desempata criterio por criterio; el último (la posición) es único, así que queda una fila por clave.
+    candidatos = np.ones(len(claves), dtype=bool)
+    for prioridad in prioridades:
+        valores = np.where(candidatos, prioridad, np.iinfo(np.int64).min)
+        maximo = pd.Series(valores).groupby(claves, sort=False).transform('max').to_numpy()
+        candidatos &= valores == maximo
+    return candidatos
+
+
+def depurar_duplicados(df: pd.DataFrame, criterio: str = CRITERIO_DUPLICADOS):
+    # Devuelve (df sin envíos repetidos, reporte de las filas descartadas).
+    if criterio not in CRITERIOS_DUPLICADOS:
+        raise ValueError(f"Criterio de duplicados desconocido: {criterio}. Opciones: {list(CRITERIOS_DUPLICADOS)}")
+
+    columnas_identidad = [c for c in [COLUMNA_EMAIL, COLUMNA_NOMBRE] if c in df.columns]
+    columnas_reporte = [
+        c for c in [COLUMNA_CAMPUS, COLUMNA_MARCA_TEMPORAL, COLUMNA_EMAIL, COLUMNA_NOMBRE, COLUMNA_CARRERA]
+        if c in df.columns
+    ]
+    reporte = pd.DataFrame(columns=['Fila_Hoja'] + columnas_reporte + ['Celdas_Contestadas', 'Fila_Hoja_Conservada'])
+    if criterio == 'ninguno' or not columnas_identidad or df.empty:
+        return df, reporte
+
+    identidad = pd.DataFrame({c: normalizar_identidad(df[c]) for c in columnas_identidad})
+    claves = pd.util.hash_pandas_object(identidad, index=False).to_numpy()
+    # Sin correo ni nombre no hay a quién atribuir el envío: nunca se trata como duplicado.
+    identificable = (identidad != '').any(axis=1).to_numpy()
+
+    posicion = np.arange(len(df), dtype=np.int64)
+    if COLUMNA_MARCA_TEMPORAL in df.columns:
+        # Sin marca legible (NaT) cuenta como la más antigua.
+        marca = (
+            pd.to_datetime(df[COLUMNA_MARCA_TEMPORAL], dayfirst=True, errors='coerce')
+            .to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        )
+    else:
+        marca = posicion
+    contestadas = df.notna().sum(axis=1).to_numpy(dtype=np.int64)
+
+    # Empates: a igual marca temporal (o sin ella) gana el que aparece más abajo en la hoja.
+    prioridades = [marca, posicion] if criterio == 'reciente' else [contestadas, marca, posicion]
+    conservar = np.ones(len(df), dtype=bool)
+    conservar[identificable] = _conservar_por_grupo(
+        claves[identificable], [p[identificable] for p in prioridades]
+    )
+    if conservar.all():
+        return df, reporte
+
+    # Fila de la hoja de origen (la 1 es el encabezado), por campus si se combinaron varias hojas.
+    if COLUMNA_CAMPUS in df.columns:
+        fila_hoja = df.groupby(COLUMNA_CAMPUS, sort=False).cumcount().to_numpy() + 2
+    else:
+        fila_hoja = posicion + 2
+    fila_conservada = pd.Series(fila_hoja[conservar & identificable], index=claves[conservar & identificable])
+
+    descartadas = ~conservar
+    reporte = df.loc[descartadas, columnas_reporte].reset_index(drop=True)
+    reporte.insert(0, 'Fila_Hoja', fila_hoja[descartadas])
+    reporte['Celdas_Contestadas'] = contestadas[descartadas]
+    reporte['Fila_Hoja_Conservada'] = fila_conservada.reindex(claves[descartadas]).to_numpy()
+    return df[conservar].reset_index(drop=True), reporte
+
+
+# -------------------------------------------------
+# PUNTUACIÓN Y CLASIFICACIÓN
+# -------------------------------------------------
+COLUMNAS_CLASIFICACION = [
+    'Coincidencia_Ponderada',
+    'Carrera_Mejor_Perfilada',
+    'Diagnóstico Primario Vocacional',
+    'Semáforo Vocacional'
+]
+
+
+def clasificar_semaforo(df: pd.DataFrame, perfil_carreras: dict, columna_carrera: str) -> pd.DataFrame:
+    def evaluar(area_chaside, carrera):
+        p = perfil_carreras.get(str(carrera).strip())
+        if not p:
+            return 'Sin perfil definido'
+        if area_chaside in p:
+            return 'Coherente'
+        return 'Neutral'
+
+    def carrera_mejor(r):
+        if r['Respondio_Siempre_Igual']:
+            return 'Información no confiable'
+        a = r['Area_Fuerte_Ponderada']
+        c_actual = str(r[columna_carrera]).strip()
+        sugeridas = [c for c, letras in perfil_carreras.items() if a in letras]
+        return c_actual if c_actual in sugeridas else (
+            ', '.join(sugeridas) if sugeridas else 'Sin sugerencia clara'
+        )
+
+    def diagnostico(r):
+        if r['Carrera_Mejor_Perfilada'] == 'Información no confiable':
+            return 'Información no confiable'
+        if str(r[columna_carrera]).strip() == str(r['Carrera_Mejor_Perfilada']).strip():
+            return 'Perfil adecuado'
+        if r['Carrera_Mejor_Perfilada'] == 'Sin sugerencia clara':
+            return 'Sin sugerencia clara'
+        return f"Sugerencia: {r['Carrera_Mejor_Perfilada']}"
+
+    def semaforo(r):
+        diag = r['Diagnóstico Primario Vocacional']
+        if diag == 'Información no confiable':
+            return 'Respondió siempre igual'
+        if diag == 'Sin sugerencia clara':
+            return 'Sin sugerencia'
+        if diag == 'Perfil adecuado' and r['Coincidencia_Ponderada'] == 'Coherente':
+            return 'Verde'
+        if diag == 'Perfil adecuado' and r['Coincidencia_Ponderada'] == 'Neutral':
+            return 'Amarillo'
+        if isinstance(diag, str) and diag.startswith('Sugerencia:') and r['Coincidencia_Ponderada'] == 'Coherente':
+            return 'Verde'
+        if isinstance(diag, str) and diag.startswith('Sugerencia:') and r['Coincidencia_Ponderada'] == 'Neutral':
+            return 'Amarillo'
+        return 'Rojo'
+
+    df['Coincidencia_Ponderada'] = df.apply(
+        lambda r: evaluar(r['Area_Fuerte_Ponderada'], r[columna_carrera]),
+        axis=1
+    )
+    df['Carrera_Mejor_Perfilada'] = df.apply(carrera_mejor, axis=1)
+    df['Diagnóstico Primario Vocacional'] = df.apply(diagnostico, axis=1)
+    df['Semáforo Vocacional'] = df.apply(semaforo, axis=1)
+    return df
+
+
+def asignar_intensidad(df: pd.DataFrame, columna_carrera: str) -> pd.DataFrame:
+    df_intensidad = df[df['Semáforo Vocacional'].isin(['Verde', 'Amarillo'])].copy()
+
+    def asignar_niveles_por_carrera(grupo):
+        grupo = grupo.copy()
+        grupo['Nivel_Intensidad'] = pd.Series(index=grupo.index, dtype='object')
+
+        amar = grupo[grupo['Semáforo Vocacional'] == 'Amarillo'].copy()
+        ver = grupo[grupo['Semáforo Vocacional'] == 'Verde'].copy()
+
+        if len(amar) > 0:
+            amar = amar.sort_values('Score', ascending=True).copy()
+            amar['rank_pct'] = (np.arange(len(amar)) + 1) / len(amar)
+            amar['Nivel_Intensidad'] = np.where(
+                amar['rank_pct'] <= 0.25,
+                'Sin perfil',
+                'Perfil en riesgo'
+            )
+            grupo.loc[amar.index, 'Nivel_Intensidad'] = amar['Nivel_Intensidad'].astype(object)
+
+        if len(ver) > 0:
+            ver = ver.sort_values('Score', ascending=True).copy()
+            ver['rank_pct'] = (np.arange(len(ver)) + 1) / len(ver)
+            ver['Nivel_Intensidad'] = np.where(
+                ver['rank_pct'] > 0.75,
+                'Jóven promesa',
+                'Perfil en transición'
+            )
+            grupo.loc[ver.index, 'Nivel_Intensidad'] = ver['Nivel_Intensidad'].astype(object)
+
+        return grupo
+
+    if not df_intensidad.empty:
+        df_intensidad = (
+            df_intensidad
+            .groupby(columna_carrera, group_keys=False)
+            .apply(asignar_niveles_por_carrera)
+            .copy()
+        )
+
+    return df_intensidad
+
+
+def calcular_destino_compatible(df: pd.DataFrame, perfil_carreras: dict, columna_carrera: str) -> pd.Series:
+    def letras_carrera(carrera):
+        return perfil_carreras.get(str(carrera).strip(), [])
+
+    def puntaje_promedio_carrera(row, carrera):
+        letras = letras_carrera(carrera)
+        if not letras:
+            return np.nan
+        return np.mean([row[f'PUNTAJE_COMBINADO_{l}'] for l in letras])
+
+    def mejor_destino_compatible(row):
+        carrera = str(row[columna_carrera]).strip()
+        letras = letras_carrera(carrera)
+
+        mejor = carrera
+        mejor_score = puntaje_promedio_carrera(row, carrera)
+
+        for c, letras_c in perfil_carreras.items():
+            if len(set(letras).intersection(letras_c)) >= 2:
+                score = puntaje_promedio_carrera(row, c)
+                if pd.notna(score) and score > mejor_score:
+                    mejor_score = score
+                    mejor = c
+
+        return mejor
+
+    return df.apply(mejor_destino_compatible, axis=1)
+
+
+def resolver_umbral_calidad(valores: np.ndarray, sentido: str, criterio: dict) -> float:
+    if criterio['modo'] == 'cuantil':
+        q = criterio['valor'] if sentido == 'menor' else 1 - criterio['valor']
+        return float(np.quantile(valores, q)) if len(valores) else np.nan
+    return float(criterio['valor'])
+
+
+def calcular_indicadores_calidad(items: np.ndarray) -> dict:
+    # Indicadores calculados por pasadas vectorizadas sobre la matriz de reactivos (n × 98).
+    items = np.asarray(items, dtype=np.int8)
+    n, m = items.shape
+
+    cambios = items[:, 1:] != items[:, :-1]
+
+    # Rachas: cada fila empieza una racha nueva, así que las rachas nunca cruzan filas.
+    inicio = np.ones((n, m), dtype=bool)
+    inicio[:, 1:] = cambios
+    posiciones = np.flatnonzero(inicio)
+    largos = np.diff(np.append(posiciones, n * m))
+    primeras = np.searchsorted(posiciones, np.arange(n) * m)
+    racha_maxima = np.maximum.reduceat(largos, primeras) if n else np.zeros(0, dtype=int)
+
+    # Varianza a partir de sumas enteras: da el mismo valor para una fila sola o dentro de un lote.
+    suma = items.sum(axis=1, dtype=np.int64)
+    suma_cuadrados = (items.astype(np.int64) ** 2).sum(axis=1)
+    varianza = (m * suma_cuadrados - suma * suma) / (m * (m - 1))
+
+    return {
+        'Desv_Intrapersona': np.sqrt(varianza),
+        'Racha_Maxima': racha_maxima.astype(int),
+        'Tasa_Alternancia': cambios.mean(axis=1),
+        'Todo_Si': suma == m,
+        'Todo_No': suma == 0
+    }
+
+
+def resolver_umbrales_calidad(indicadores: dict, criterios: dict = None) -> dict:
+    criterios = criterios or CRITERIOS_CALIDAD
+    return {
+        indicador: resolver_umbral_calidad(indicadores[indicador], meta['sentido'], criterios[indicador])
+        for indicador, meta in INDICADORES_CALIDAD.items()
+    }
+
+
+def marcar_calidad(indicadores: dict, umbrales: dict):
+    marcas = {'Todas las respuestas iguales': indicadores['Todo_Si'] | indicadores['Todo_No']}
+    for indicador, meta in INDICADORES_CALIDAD.items():
+        valores = indicadores[indicador]
+        umbral = umbrales[indicador]
+        marcas[meta['etiqueta']] = valores <= umbral if meta['sentido'] == 'menor' else valores >= umbral
+
+    no_confiable = np.logical_or.reduce(list(marcas.values()))
+    return no_confiable, marcas
+
+
+def evaluar_calidad_respuestas(items: np.ndarray, criterios: dict = None, umbrales: dict = None):
+    # Con `umbrales` se omite la resolución de cuantiles (p. ej. umbrales de una cohorte de referencia).
+    indicadores = calcular_indicadores_calidad(items)
+    if umbrales is None:
+        umbrales = resolver_umbrales_calidad(indicadores, criterios)
+    no_confiable, marcas = marcar_calidad(indicadores, umbrales)
+
+    calidad = pd.DataFrame(indicadores)
+    motivo = pd.Series('', index=calidad.index, dtype='object')
+    for etiqueta, marcado in marcas.items():
+        motivo[marcado] += etiqueta + '; '
+
+    calidad['Respondio_Siempre_Igual'] = no_confiable
+    calidad['Motivo_No_Confiable'] = motivo.str.rstrip('; ')
+    return calidad, umbrales
+
+
+def describir_criterios_calidad(criterios: dict, umbrales: dict) -> str:
+    partes = []
+    for indicador, meta in INDICADORES_CALIDAD.items():
+        criterio = criterios[indicador]
+        signo = '≤' if meta['sentido'] == 'menor' else '≥'
+        if criterio['modo'] == 'cuantil':
+            extremo = 'inferior' if meta['sentido'] == 'menor' else 'superior'
+            regla = f"{criterio['valor']:.0%} {extremo} ({signo} {umbrales[indicador]:.4g})"
+        else:
+            regla = f"{signo} {umbrales[indicador]:.4g}"
+        partes.append(f"{meta['etiqueta'].lower()}: {regla}")
+    return "; ".join(partes)
+
+
+def process_data(df: pd.DataFrame, perfil_carreras: dict, peso_intereses: float, peso_aptitudes: float,
+                 criterios_calidad: dict = None):
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+
+    columna_nombre = COLUMNA_NOMBRE
+    columna_carrera = COLUMNA_CARRERA
+
+    faltantes = [c for c in [columna_nombre, columna_carrera] if c not in df.columns]
+    if faltantes:
+        raise ValueError(
+            f"Faltan columnas requeridas: {faltantes}. "
+            f"Columnas detectadas: {list(df.columns)}"
+        )
+
+    columnas_items = resolver_columnas_items(df.columns)
+
+    df_items = (
+        df[columnas_items]
+        .astype(str)
+        .apply(lambda col: col.str.strip().str.lower())
+        .replace(MAPEO_RESPUESTAS)
+        .apply(pd.to_numeric, errors='coerce')
+        .fillna(0)
+        .astype(int)
+    )
+    df[columnas_items] = df_items
+
+    calidad, umbrales_calidad = evaluar_calidad_respuestas(df_items.to_numpy(), criterios_calidad)
+    df[list(calidad.columns)] = calidad.set_index(df.index)
+    umbral_intrapersonal = umbrales_calidad['Desv_Intrapersona']
+
+    for a in AREAS:
+        df[f'INTERES_{a}'] = df[[col_item(columnas_items, i) for i in INTERESES_ITEMS[a]]].sum(axis=1)
+        df[f'APTITUD_{a}'] = df[[col_item(columnas_items, i) for i in APTITUDES_ITEMS[a]]].sum(axis=1)
+
+    for a in AREAS:
+        df[f'PUNTAJE_COMBINADO_{a}'] = (
+            df[f'INTERES_{a}'] * peso_intereses +
+            df[f'APTITUD_{a}'] * peso_aptitudes
+        )
+        df[f'TOTAL_{a}'] = df[f'INTERES_{a}'] + df[f'APTITUD_{a}']
+
+    df['Area_Fuerte_Ponderada'] = df.apply(
+        lambda r: max(AREAS, key=lambda a: r[f'PUNTAJE_COMBINADO_{a}']),
+        axis=1
+    )
+
+    score_cols = [f'PUNTAJE_COMBINADO_{a}' for a in AREAS]
+    df['Score'] = df[score_cols].max(axis=1)
+
+    df = clasificar_semaforo(df, perfil_carreras, columna_carrera)
+
+    df['Carrera_Corta'] = (
+        df[columna_carrera]
+        .astype(str)
+        .str.replace('Ingeniería', 'Ing.', regex=False)
+    )
+
+    df_intensidad = asignar_intensidad(df, columna_carrera)
+
+    df['Destino_Compatible'] = calcular_destino_compatible(df, perfil_carreras, columna_carrera)
+
+    return df, df_intensidad, columnas_items, columna_carrera, columna_nombre, umbral_intrapersonal
+
+
+def carreras_con_perfil_modificado(perfil_anterior: dict, perfil_nuevo: dict) -> list:
+    return [
+        c for c in dict.fromkeys(list(perfil_anterior) + list(perfil_nuevo))
+        if list(perfil_anterior.get(c, [])) != list(perfil_nuevo.get(c, []))
+    ]
+
+
+def actualizar_por_perfiles(resultado, perfil_anterior: dict, perfil_nuevo: dict):
+    # Recalcula sólo las salidas que dependen de las carreras cuyo perfil cambió:
+    #   · Coincidencia / semáforo de quienes eligieron esas carreras,
+    #   · Carrera_Mejor_Perfilada de quienes tienen como área fuerte una letra añadida o quitada,
+    #   · intensidad de las carreras donde cambió algún semáforo,
+    #   · Destino_Compatible de las carreras que comparten ≥2 letras con las modificadas.
+    df, df_intensidad, columnas_items, columna_carrera, columna_nombre, umbral_intrapersonal = resultado
+
+    cambiadas = carreras_con_perfil_modificado(perfil_anterior, perfil_nuevo)
+    if not cambiadas:
+        return resultado
+
+    df = df.copy()
+    carrera_est = df[columna_carrera].astype(str).str.strip()
+
+    letras_movidas = set()
+    for c in cambiadas:
+        letras_movidas |= set(perfil_anterior.get(c, [])) ^ set(perfil_nuevo.get(c, []))
+
+    filas_clasif = carrera_est.isin(cambiadas) | df['Area_Fuerte_Ponderada'].isin(letras_movidas)
+
+    if filas_clasif.any():
+        semaforo_previo = df.loc[filas_clasif, 'Semáforo Vocacional']
+        sub = clasificar_semaforo(df.loc[filas_clasif].copy(), perfil_nuevo, columna_carrera)
+        df.loc[filas_clasif, COLUMNAS_CLASIFICACION] = sub[COLUMNAS_CLASIFICACION]
+        semaforo_cambio = sub['Semáforo Vocacional'] != semaforo_previo
+        grupos_intensidad = set(df.loc[semaforo_cambio[semaforo_cambio].index, columna_carrera])
+    else:
+        grupos_intensidad = set()
+
+    if grupos_intensidad:
+        en_grupos = df[columna_carrera].isin(grupos_intensidad)
+        conservado = df_intensidad[~df_intensidad.index.isin(df.index[en_grupos])].copy()
+        recalculado = asignar_intensidad(df[en_grupos], columna_carrera)
+        df_intensidad = pd.concat([conservado, recalculado])
+    else:
+        df_intensidad = df_intensidad.copy()
+
+    if not df_intensidad.empty:
+        refrescar = [c for c in COLUMNAS_CLASIFICACION if c in df_intensidad.columns]
+        df_intensidad[refrescar] = df.loc[df_intensidad.index, refrescar]
+
+    def compatibles(letras_a, letras_b):
+        return len(set(letras_a).intersection(letras_b)) >= 2
+
+    carreras_destino = set(cambiadas)
+    for c in set(carrera_est):
+        letras_c = perfil_nuevo.get(c, [])
+        if any(
+            compatibles(letras_c, perfil_anterior.get(x, [])) or compatibles(letras_c, perfil_nuevo.get(x, []))
+            for x in cambiadas
+        ):
+            carreras_destino.add(c)
+
+    filas_destino = carrera_est.isin(carreras_destino)
+    if filas_destino.any():
+        df.loc[filas_destino, 'Destino_Compatible'] = calcular_destino_compatible(
+            df.loc[filas_destino], perfil_nuevo, columna_carrera
+        )
+
+    return df, df_intensidad, columnas_items, columna_carrera, columna_nombre, umbral_intrapersonal
+
+
+# Gráfica de perfil por área dibujada con primitivas del lienzo de reportlab. La parte fija
+# (rejilla, ejes, etiquetas y leyenda) se calcula una sola vez; cada reporte sólo agrega sus
+# 14 barras, sin pasar por el árbol de formas de reportlab.graphics ni por un navegador.
+GRAFICA_ANCHO = 17 * cm
+GRAFICA_ALTO = 6.2 * cm
+GRAFICA_MARGEN_IZQ = 1.1 * cm
+GRAFICA_MARGEN_INF = 1.3 * cm
+GRAFICA_MARGEN_SUP = 0.9 * cm
+GRAFICA_BARRA = 0.62 * cm
+GRAFICA_ALTO_UTIL = GRAFICA_ALTO - GRAFICA_MARGEN_INF - GRAFICA_MARGEN_SUP
+GRAFICA_ANCHO_AREA = (GRAFICA_ANCHO - GRAFICA_MARGEN_IZQ) / len(AREAS)
+COLOR_INTERESES = colors.HexColor("#0F766E")
+COLOR_APTITUDES = colors.HexColor("#F59E0B")
+COLOR_EJES = colors.HexColor("#475569")
+COLOR_REJILLA = colors.HexColor("#CBD5E1")
+
+
+@lru_cache(maxsize=None)
+def plantilla_grafica_areas() -> dict:
+    # Textos agrupados por (fuente, tamaño, color, alineación) para fijar el estado una vez por grupo.
+    rejilla, textos = [], {}
+    for pct in range(0, 101, 25):
+        y = GRAFICA_MARGEN_INF + GRAFICA_ALTO_UTIL * pct / 100
+        rejilla.append((COLOR_REJILLA if pct else COLOR_EJES, GRAFICA_MARGEN_IZQ, y, GRAFICA_ANCHO, y))
+        textos.setdefault(('Helvetica', 7, COLOR_EJES, 'derecha'), []).append(
+            (GRAFICA_MARGEN_IZQ - 4, y - 2.5, f"{pct}%")
+        )
+
+    for k, a in enumerate(AREAS):
+        centro = GRAFICA_MARGEN_IZQ + GRAFICA_ANCHO_AREA * (k + 0.5)
+        textos.setdefault(('Helvetica-Bold', 8, colors.black, 'centro'), []).append(
+            (centro, GRAFICA_MARGEN_INF - 11, a)
+        )
+        textos.setdefault(('Helvetica', 5.5, COLOR_EJES, 'centro'), []).append(
+            (centro, GRAFICA_MARGEN_INF - 20, AREAS_LONG[a])
+        )
+
+    y_leyenda = GRAFICA_ALTO - 0.45 * cm
+    leyenda = [
+        (GRAFICA_MARGEN_IZQ, COLOR_INTERESES, f"Intereses (de {len(INTERESES_ITEMS[AREAS[0]])})"),
+        (GRAFICA_MARGEN_IZQ + 4.2 * cm, COLOR_APTITUDES, f"Aptitudes (de {len(APTITUDES_ITEMS[AREAS[0]])})")
+    ]
+    for x, _, texto in leyenda:
+        textos.setdefault(('Helvetica', 8, colors.black, 'izquierda'), []).append((x + 11, y_leyenda + 1, texto))
+
+    return {
+        'rejilla': rejilla,
+        'textos': textos,
+        'leyenda': [(x, y_leyenda, color) for x, color, _ in leyenda]
+    }
+
+
+def _dibujar_textos(canv, fuente, tamano, color, alineacion, textos):
+    canv.setFont(fuente, tamano)
+    canv.setFillColor(color)
+    dibujar = {
+        'izquierda': canv.drawString,
+        'centro': canv.drawCentredString,
+        'derecha': canv.drawRightString
+    }[alineacion]
+    for x, y, texto in textos:
+        dibujar(x, y, texto)
+
+
+class GraficaAreas(Flowable):
+    # Barras de intereses y aptitudes por área, como porcentaje del máximo de cada escala.
+    def __init__(self, puntajes):
+        super().__init__()
+        self.barras = []
+        for k, a in enumerate(AREAS):
+            x0 = GRAFICA_MARGEN_IZQ + GRAFICA_ANCHO_AREA * (k + 0.5) - GRAFICA_BARRA
+            for x, valor, maximo, color in (
+                (x0, puntajes[f'INTERES_{a}'], len(INTERESES_ITEMS[a]), COLOR_INTERESES),
+                (x0 + GRAFICA_BARRA, puntajes[f'APTITUD_{a}'], len(APTITUDES_ITEMS[a]), COLOR_APTITUDES)
+            ):
+                valor = float(valor)
+                altura = GRAFICA_ALTO_UTIL * min(max(valor / maximo, 0.0), 1.0)
+                self.barras.append((x, altura, color, f"{valor:g}"))
+
+    def wrap(self, ancho_disponible, alto_disponible):
+        return GRAFICA_ANCHO, GRAFICA_ALTO
+
+    def draw(self):
+        canv = self.canv
+        plantilla = plantilla_grafica_areas()
+        canv.saveState()
+        canv.setLineWidth(0.5)
+        for color, x1, y1, x2, y2 in plantilla['rejilla']:
+            canv.setStrokeColor(color)
+            canv.line(x1, y1, x2, y2)
+        for x, y, color in plantilla['leyenda']:
+            canv.setFillColor(color)
+            canv.rect(x, y, 7, 7, stroke=0, fill=1)
+        for (fuente, tamano, color, alineacion), textos in plantilla['textos'].items():
+            _dibujar_textos(canv, fuente, tamano, color, alineacion, textos)
+
+        for x, altura, color, _ in self.barras:
+            canv.setFillColor(color)
+            canv.rect(x + 1, GRAFICA_MARGEN_INF, GRAFICA_BARRA - 2, altura, stroke=0, fill=1)
+        _dibujar_textos(canv, 'Helvetica', 6.5, colors.black, 'centro', [
+            (x + GRAFICA_BARRA / 2, GRAFICA_MARGEN_INF + altura + 2, etiqueta)
+            for x, altura, _, etiqueta in self.barras
+        ])
+        canv.restoreState()
+
+
+@lru_cache(maxsize=None)
+def estilos_pdf():
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        name='TitleBlue',
+        parent=styles['Title'],
+        fontName='Helvetica-Bold',
+        fontSize=18,
+        leading=22,
+        textColor=colors.HexColor("#0F766E"),
+        alignment=TA_LEFT,
+        spaceAfter=10
+    ))
+    styles.add(ParagraphStyle(
+        name='HeadingTeal',
+        parent=styles['Heading2'],
+        fontName='Helvetica-Bold',
+        fontSize=12,
+        leading=15,
+        textColor=colors.HexColor("#0F766E"),
+        spaceBefore=8,
+        spaceAfter=6
+    ))
+    styles.add(ParagraphStyle(
+        name='BodySmall',
+        parent=styles['BodyText'],
+        fontName='Helvetica',
+        fontSize=10,
+        leading=14,
+        spaceAfter=6
+    ))
+    return styles
+
+
+def build_pdf_report(estudiante, carrera, categoria, intensidad, texto_ubicacion, conclusion_txt,
+                     puntajes=None):
+    buffer = io.BytesIO()
+
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=1.8 * cm,
+        leftMargin=1.8 * cm,
+        topMargin=1.6 * cm,
+        bottomMargin=1.6 * cm
+    )
+
+    styles = estilos_pdf()
+
+    story = []
+    story.append(Paragraph("Reporte individual CHASIDE", styles['TitleBlue']))
+    story.append(Paragraph(f"<b>Estudiante:</b> {estudiante}", styles['BodySmall']))
+    story.append(Paragraph(f"<b>Carrera:</b> {carrera}", styles['BodySmall']))
+    story.append(Paragraph(f"<b>Perfil identificado:</b> {categoria}", styles['BodySmall']))
+    story.append(Paragraph(f"<b>Intensidad vocacional:</b> {intensidad}", styles['BodySmall']))
+    story.append(Spacer(1, 8))
+
+    if texto_ubicacion.strip():
+        story.append(Paragraph("Resumen del participante", styles['HeadingTeal']))
+        for linea in texto_ubicacion.split("\n"):
+            if linea.strip():
+                story.append(Paragraph(linea.strip(), styles['BodySmall']))
+                
+    if puntajes is not None:
+        story.append(Paragraph("Perfil por área CHASIDE", styles['HeadingTeal']))
+        story.append(GraficaAreas(puntajes))
+
+    story.append(Paragraph("Conclusión y recomendación", styles['HeadingTeal']))
+    story.append(Paragraph(conclusion_txt, styles['BodySmall']))
+
+    doc.build(story)
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
+
+
+NIVELES_CON_DESTINO = ('Sin perfil', 'Perfil en riesgo')
+
+
+@lru_cache(maxsize=None)
+def conclusion_por_clave(categoria, respondio_igual, nivel_alumno, cambia_destino, destino_compatible):
+    # El texto sólo depende de esta clave, así que cada combinación se redacta una sola vez.
+    if respondio_igual or categoria == 'Respondió siempre igual':
+        return (
+            "El patrón de respuestas sugiere baja variabilidad, por lo que el perfil obtenido debe interpretarse con cautela. "
+            "Esto puede indicar que la prueba fue contestada con respuestas muy homogéneas o sin suficiente diferenciación entre intereses y aptitudes. "
+            "Se recomienda reaplicar la prueba en condiciones controladas y posteriormente realizar una entrevista breve de orientación vocacional."
+        )
+
+    if nivel_alumno == 'Sin perfil':
+        if cambia_destino:
+            return (
+                f"El estudiante muestra baja correspondencia entre su perfil vocacional y la carrera elegida. "
+                f"Además, el análisis compatible sugiere mayor afinidad hacia {destino_compatible}. "
+                f"Se recomienda repetir la prueba y, si el resultado persiste, valorar orientación vocacional y posible transición."
+            )
+        return (
+            f"El estudiante muestra baja correspondencia entre su perfil vocacional y la carrera elegida. "
+            f"Se recomienda repetir la prueba y acompañar el proceso con orientación vocacional individual."
+        )
+
+    if nivel_alumno == 'Perfil en riesgo':
+        if cambia_destino:
+            return (
+                f"El estudiante presenta coincidencia mínima entre su perfil vocacional y la carrera elegida. "
+                f"El análisis compatible sugiere mejor ajuste hacia {destino_compatible}. "
+                f"Se recomienda seguimiento tutorial temprano y orientación vocacional."
+            )
+        return (
+            f"El estudiante presenta coincidencia mínima entre su perfil vocacional y la carrera elegida. "
+            f"Se recomienda seguimiento tutorial, fortalecimiento de hábitos de estudio y revisión vocacional complementaria."
+        )
+
+    if nivel_alumno == 'Perfil en transición':
+        return (
+            f"El estudiante muestra una congruencia vocacional funcional con la carrera elegida. "
+            f"Se recomienda acompañamiento académico preventivo y seguimiento durante el primer semestre."
+        )
+
+    if nivel_alumno == 'Jóven promesa':
+        return (
+            f"El estudiante presenta alta congruencia entre su perfil vocacional y la carrera elegida. "
+            f"Se recomienda fortalecer su trayectoria y promover actividades de alto desempeño."
+        )
+
+    if categoria == 'Verde':
+        return "El perfil identificado coincide con la carrera elegida. Se recomienda mantener acompañamiento preventivo."
+
+    if categoria == 'Amarillo':
+        return "El perfil identificado no coincide plenamente con la carrera elegida. Se recomienda orientación vocacional y seguimiento tutorial."
+
+    return "El resultado sugiere la necesidad de una interpretación complementaria mediante orientación y seguimiento académico."
+
+
+def construir_conclusion_recomendacion(al, carrera_sel, destino_compatible, nivel_alumno):
+    nivel = nivel_alumno if isinstance(nivel_alumno, str) else None
+    cambia_destino = destino_compatible != carrera_sel
+    return conclusion_por_clave(
+        al['Semáforo Vocacional'],
+        bool(al.get('Respondio_Siempre_Igual', False)),
+        nivel,
+        cambia_destino,
+        destino_compatible if cambia_destino and nivel in NIVELES_CON_DESTINO else None
+    )
+
+
+def conclusiones_cohorte(df: pd.DataFrame, df_intensidad: pd.DataFrame, columna_carrera: str) -> pd.Series:
+    # Misma redacción que construir_conclusion_recomendacion para toda la cohorte: se agrupa
+    # a los estudiantes por clave y se redacta una vez por clave distinta.
+    nivel = (
+        df_intensidad['Nivel_Intensidad'].reindex(df.index).astype(object)
+        if 'Nivel_Intensidad' in df_intensidad.columns
+        else pd.Series(None, index=df.index, dtype='object')
+    )
+    nivel = nivel.where(nivel.notna(), None)
+    destino = df['Destino_Compatible']
+    cambia_destino = destino != df[columna_carrera]
+
+    claves = pd.DataFrame({
+        'categoria': df['Semáforo Vocacional'],
+        'respondio_igual': df['Respondio_Siempre_Igual'].astype(bool),
+        'nivel': nivel.fillna(''),
+        'cambia_destino': cambia_destino,
+        'destino': destino.where(cambia_destino & nivel.isin(NIVELES_CON_DESTINO), '')
+    }, index=df.index)
+    codigos, unicas = pd.MultiIndex.from_frame(claves).factorize()
+
+    textos = np.array([
+        conclusion_por_clave(categoria, respondio_igual, nivel or None, cambia, destino or None)
+        for categoria, respondio_igual, nivel, cambia, destino in unicas
+    ], dtype=object)
+    return pd.Series(textos[codigos], index=df.index, name='Conclusión y recomendación')
+
+
+# -------------------------------------------------
+# PARETO DE PRIORIDADES (bootstrap vectorizado)
+# -------------------------------------------------
+def errores_pareto(prom_riesgo: np.ndarray, prom_promesa: np.ndarray) -> np.ndarray:
+    # Error porcentual por letra del grupo en riesgo respecto a la meta (Jóven promesa); acepta lotes (..., 7).
+    with np.errstate(divide='ignore', invalid='ignore'):
+        error = (prom_promesa - prom_riesgo) / prom_promesa * 100
+    return np.where(prom_promesa == 0, 0.0, np.maximum(error, 0.0))
+
+
+def dentro_80_pareto(errores: np.ndarray) -> np.ndarray:
+    # Una letra entra al conjunto del 80% si el acumulado de las letras previas (ordenadas por
+    # error descendente) aún no llega a 80. Sin brecha total el acumulado es 0 y entran todas.
+    orden = np.argsort(-errores, axis=-1, kind='stable')
+    ordenados = np.take_along_axis(errores, orden, axis=-1)
+    total = ordenados.sum(axis=-1, keepdims=True)
+    relativo = np.divide(ordenados * 100, total, out=np.zeros_like(ordenados), where=total != 0)
+    acumulado_previo = np.cumsum(relativo, axis=-1) - relativo
+    dentro = np.empty(errores.shape, dtype=bool)
+    np.put_along_axis(dentro, orden, acumulado_previo < 80, axis=-1)
+    return dentro
+
+
+def bootstrap_pareto(riesgo: np.ndarray, promesa: np.ndarray, n_remuestras: int = 2000,
+                     nivel_confianza: float = 0.95, semilla: int = 0) -> pd.DataFrame:
+    # Remuestrea ambos grupos con reemplazo en un solo cálculo: cada remuestra es un vector de
+    # conteos multinomiales, de modo que sus promedios salen de un producto matricial (B × n) @ (n × 7).
+    rng = np.random.default_rng(semilla)
+    riesgo = np.asarray(riesgo, dtype=float)
+    promesa = np.asarray(promesa, dtype=float)
+
+    def promedios(grupo):
+        n = len(grupo)
+        conteos = rng.multinomial(n, np.full(n, 1.0 / n), size=n_remuestras)
+        return conteos @ grupo / n
+
+    errores = errores_pareto(promedios(riesgo), promedios(promesa))
+    alfa = (1 - nivel_confianza) / 2
+    limite_inf, limite_sup = np.quantile(errores, [alfa, 1 - alfa], axis=0)
+
+    return pd.DataFrame({
+        'Letra': AREAS,
+        'Error_Porcentual': errores_pareto(riesgo.mean(axis=0), promesa.mean(axis=0)),
+        'IC_Inferior': limite_inf,
+        'IC_Superior': limite_sup,
+        'Prob_Dentro_80': dentro_80_pareto(errores).mean(axis=0)
+    })
+
+
+# -------------------------------------------------
+# GRUPOS DE PERFIL (k-means por mini-lotes)
+# -------------------------------------------------
+def _distancias_cuadradas(X: np.ndarray, centroides: np.ndarray) -> np.ndarray:
+    # ‖x‖² − 2x·c + ‖c‖²; el redondeo puede dejar valores ligeramente negativos, se recortan a 0.
+    distancias = (
+        np.einsum('ij,ij->i', X, X)[:, None]
+        - 2 * X @ centroides.T
+        + np.einsum('ij,ij->i', centroides, centroides)[None, :]
+    )
+    return np.maximum(distancias, 0.0)
+
+
+def _inicializar_kmeans_pp(muestra: np.ndarray, k: int, rng) -> np.ndarray:
+    # k-means++ voraz: en cada paso se prueban varios candidatos y se queda el que más reduce la inercia.
+    n_candidatos = 2 + int(np.log(k))
+    centroides = [muestra[rng.integers(len(muestra))]]
+    distancia_min = ((muestra - centroides[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = distancia_min.sum()
+        if total <= 0:
+            candidatos = rng.integers(len(muestra), size=n_candidatos)
+        else:
+            candidatos = rng.choice(len(muestra), size=n_candidatos, p=distancia_min / total)
+        distancias = np.minimum(distancia_min, _distancias_cuadradas(muestra, muestra[candidatos]).T)
+        mejor = distancias.sum(axis=1).argmin()
+        centroides.append(muestra[candidatos[mejor]])
+        distancia_min = distancias[mejor]
+    return np.array(centroides, dtype=float)
+
+
+def asignar_grupos(X: np.ndarray, centroides: np.ndarray, tamano_bloque: int = 65536) -> np.ndarray:
+    # Asignación por bloques para que la memoria no crezca con el tamaño de la cohorte.
+    etiquetas = np.empty(len(X), dtype=np.int64)
+    for inicio in range(0, len(X), tamano_bloque):
+        bloque = np.asarray(X[inicio:inicio + tamano_bloque], dtype=float)
+        etiquetas[inicio:inicio + tamano_bloque] = _distancias_cuadradas(bloque, centroides).argmin(axis=1)
+    return etiquetas
+
+
+def kmeans_minilotes(X: np.ndarray, k: int, tamano_lote: int = 1024, iteraciones: int = 200,
+                     tolerancia: float = 1e-4, semilla: int = 0) -> np.ndarray:
+    # k-means por mini-lotes (Sculley, 2010): cada paso sólo toca un lote aleatorio y mueve cada
+    # centroide hacia el promedio de sus puntos con tasa 1 / (puntos acumulados). Memoria O(lote × k).
+    # Si la muestra de siembra tiene menos de k perfiles distintos, se devuelven menos centroides.
+    rng = np.random.default_rng(semilla)
+    n = len(X)
+    muestra = np.asarray(X[rng.choice(n, size=min(n, 10000), replace=False)], dtype=float)
+    k = min(k, len(np.unique(muestra, axis=0)))
+    centroides = _inicializar_kmeans_pp(muestra, k, rng)
+    acumulados = np.zeros(k)
+
+    for _ in range(iteraciones):
+        lote = np.asarray(X[rng.integers(0, n, size=min(tamano_lote, n))], dtype=float)
+        etiquetas = _distancias_cuadradas(lote, centroides).argmin(axis=1)
+        conteo = np.bincount(etiquetas, minlength=k)
+        suma = np.zeros_like(centroides)
+        np.add.at(suma, etiquetas, lote)
+
+        acumulados += conteo
+        activos = conteo > 0
+        tasa = conteo[activos] / acumulados[activos]
+        promedio_lote = suma[activos] / conteo[activos, None]
+        desplazamiento = tasa[:, None] * (promedio_lote - centroides[activos])
+        centroides[activos] += desplazamiento
+        if np.abs(desplazamiento).max() < tolerancia:
+            break
+    return centroides
+
+
+def agrupar_perfiles(X: np.ndarray, k: int, semilla: int = 0):
+    # Devuelve (etiquetas, centroides) con los grupos numerados del más grande al más pequeño.
+    X = np.asarray(X, dtype=float)
+    if len(X) == 0 or k < 1:
+        return np.empty(0, dtype=np.int64), np.empty((0, X.shape[1] if X.ndim == 2 else len(AREAS)))
+    centroides = kmeans_minilotes(X, int(k), semilla=semilla)
+    k = len(centroides)
+    etiquetas = asignar_grupos(X, centroides)
+    orden = np.argsort(-np.bincount(etiquetas, minlength=k), kind='stable')
+    nuevo = np.empty(k, dtype=np.int64)
+    nuevo[orden] = np.arange(k)
+    return nuevo[etiquetas], centroides[orden]
+
+
+def nombrar_grupos(centroides: np.ndarray) -> list:
+    # Cada grupo se nombra por sus dos letras más altas, p. ej. "Grupo 1 · I+E".
+    return [
+        f"Grupo {g + 1} · " + "+".join(AREAS[j] for j in np.argsort(-c, kind='stable')[:2])
+        for g, c in enumerate(centroides)
+    ]
+
+
+# -------------------------------------------------
+# ESTUDIANTES SIMILARES (distancia de Hamming)
+# -------------------------------------------------
+_BITS_POR_BYTE = np.array([bin(b).count('1') for b in range(256)], dtype=np.uint8)
+
+
+def _contar_bits(palabras: np.ndarray) -> np.ndarray:
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(palabras)
+    return _BITS_POR_BYTE[palabras.view(np.uint8)].reshape(len(palabras), -1).sum(axis=1)
+
+
+class IndiceHamming:
+    # Respuestas sí/no empaquetadas en bits (98 reactivos → 2 palabras de 64 bits por estudiante).
+    # La distancia a todos es un XOR + conteo de bits vectorizado y el top-k sale de argpartition,
+    # así una consulta sobre cientos de miles de respuestas toma pocos milisegundos.
+    def __init__(self, items: np.ndarray):
+        bits = np.packbits(np.asarray(items) > 0, axis=1)
+        relleno = -bits.shape[1] % 8
+        bits = np.pad(bits, ((0, 0), (0, relleno)))
+        # Una fila contigua por palabra (palabras × estudiantes): el XOR recorre memoria secuencial.
+        self.palabras = np.ascontiguousarray(np.ascontiguousarray(bits).view(np.uint64).T)
+        self.n_reactivos = np.asarray(items).shape[1]
+
+    def __len__(self):
+        return self.palabras.shape[1]
+
+    def distancias(self, posicion: int) -> np.ndarray:
+        distancias = np.zeros(len(self), dtype=np.int64)
+        for palabra in self.palabras:
+            distancias += _contar_bits(palabra ^ palabra[posicion])
+        return distancias
+
+    def vecinos(self, posicion: int, k: int = 10):
+        # Devuelve (posiciones, distancias) de los k más cercanos, sin incluir al propio estudiante;
+        # los empates se resuelven por posición para que el resultado sea estable.
+        distancias = self.distancias(posicion)
+        distancias[posicion] = self.n_reactivos + 1
+        k = min(k, len(distancias) - 1)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        candidatos = np.argpartition(distancias, k - 1)[:k]
+        umbral = distancias[candidatos].max()
+        candidatos = np.flatnonzero(distancias <= umbral)
+        orden = np.lexsort((candidatos, distancias[candidatos]))[:k]
+        return candidatos[orden], distancias[candidatos[orden]]
+
+
+# -------------------------------------------------
+# ANÁLISIS DE REACTIVOS
+# -------------------------------------------------
+# Un reactivo se marca para revisión si casi nadie (o casi todos) lo contestan con "sí",
+# o si apenas se relaciona con el resto de su área.
+TASA_SI_MIN = 0.05
+TASA_SI_MAX = 0.95
+CORRELACION_ITEM_RESTO_MIN = 0.20
+
+TOTAL_COHORTE = 'Toda la cohorte'
+
+
+def reactivos_por_area() -> dict:
+    # Escala de 14 reactivos por área: 10 de intereses + 4 de aptitudes (posiciones base 0).
+    return {a: [i - 1 for i in INTERESES_ITEMS[a] + APTITUDES_ITEMS[a]] for a in AREAS}
+
+
+def acumular_momentos(bloques) -> dict:
+    # Una sola pasada por bloques (items, grupos): por grupo y para toda la cohorte se acumulan
+    # n, la suma por reactivo y el producto cruzado XᵀX, suficientes para medias, varianzas y
+    # covarianzas. Así una cohorte que no cabe en memoria puede leerse por partes.
+    momentos = {}
+
+    def sumar(clave, X):
+        n, suma, cruzado = momentos.get(clave, (0, 0.0, 0.0))
+        momentos[clave] = (n + len(X), suma + X.sum(axis=0), cruzado + X.T @ X)
+
+    for items, grupos in bloques:
+        X = np.asarray(items, dtype=float)
+        sumar(TOTAL_COHORTE, X)
+        grupos = np.asarray(grupos, dtype=object)
+        for grupo in pd.unique(grupos):
+            sumar(grupo, X[grupos == grupo])
+    return momentos
+
+
+def _covarianza(n, suma, cruzado):
+    media = suma / n
+    return media, (cruzado - n * np.outer(media, media)) / max(n - 1, 1)
+
+
+def _alfa_cronbach(cov_area):
+    k = len(cov_area)
+    var_total = cov_area.sum()
+    if var_total <= 0:
+        return np.nan
+    return k / (k - 1) * (1 - np.trace(cov_area) / var_total)
+
+
+def analisis_reactivos(momentos: dict, nombres_reactivos=None) -> pd.DataFrame:
+    n, suma, cruzado = momentos[TOTAL_COHORTE]
+    media, cov = _covarianza(n, suma, cruzado)
+    varianza = np.diag(cov)
+    n_reactivos = len(media)
+
+    area_de = np.empty(n_reactivos, dtype=object)
+    tipo_de = np.empty(n_reactivos, dtype=object)
+    correlacion = np.full(n_reactivos, np.nan)
+    for a, posiciones in reactivos_por_area().items():
+        posiciones = np.array(posiciones)
+        area_de[posiciones] = a
+        tipo_de[[i - 1 for i in INTERESES_ITEMS[a]]] = 'Interés'
+        tipo_de[[i - 1 for i in APTITUDES_ITEMS[a]]] = 'Aptitud'
+
+        # Resto = total del área sin el propio reactivo; todo sale de la submatriz de covarianzas.
+        bloque = cov[np.ix_(posiciones, posiciones)]
+        cov_con_total = bloque.sum(axis=1)
+        var_j = np.diag(bloque)
+        cov_con_resto = cov_con_total - var_j
+        var_resto = bloque.sum() - 2 * cov_con_total + var_j
+        denominador = np.sqrt(var_j * var_resto)
+        correlacion[posiciones] = np.divide(
+            cov_con_resto, denominador, out=np.full(len(posiciones), np.nan), where=denominador > 0
+        )
+
+    tabla = pd.DataFrame({
+        'Reactivo': np.arange(1, n_reactivos + 1),
+        'Área': area_de,
+        'Tipo': tipo_de,
+        'Tasa_Si': media,
+        'Varianza': varianza,
+        'Correlacion_Item_Resto': correlacion
+    })
+    if nombres_reactivos is not None:
+        tabla.insert(1, 'Enunciado', list(nombres_reactivos))
+    tabla['Revisar'] = (
+        (tabla['Tasa_Si'] < TASA_SI_MIN)
+        | (tabla['Tasa_Si'] > TASA_SI_MAX)
+        | (tabla['Correlacion_Item_Resto'].fillna(-1) < CORRELACION_ITEM_RESTO_MIN)
+    )
+    return tabla
+
+
+def alfa_por_area(momentos: dict) -> pd.DataFrame:
+    # Alfa de Cronbach de cada escala de área para toda la cohorte y para cada grupo (carrera).
+    escalas = reactivos_por_area()
+    filas = []
+    for grupo, (n, suma, cruzado) in momentos.items():
+        _, cov = _covarianza(n, suma, cruzado)
+        fila = {'Grupo': grupo, 'N': n}
+        for a, posiciones in escalas.items():
+            fila[a] = _alfa_cronbach(cov[np.ix_(posiciones, posiciones)]) if n > 1 else np.nan
+        filas.append(fila)
+    tabla = pd.DataFrame(filas, columns=['Grupo', 'N'] + AREAS)
+    total = tabla['Grupo'] == TOTAL_COHORTE
+    return pd.concat([tabla[total], tabla[~total].sort_values('Grupo')], ignore_index=True)
+
+
+# -------------------------------------------------
+# NORMAS PERCENTILARES
+# -------------------------------------------------
+class TablasNormativas:
+    # Puntajes combinados ordenados por área, para toda la cohorte y por carrera. Se arman una
+    # vez por versión; después el percentil de cualquier puntaje (de la cohorte o recién
+    # calificado) sale por búsqueda binaria, sin recorrer la cohorte. Quienes respondieron
+    # siempre igual no forman parte de la norma.
+    def __init__(self, puntajes: np.ndarray, carreras: np.ndarray, validos: np.ndarray = None):
+        puntajes = np.asarray(puntajes, dtype=float)
+        carreras = np.asarray(carreras, dtype=object)
+        validos = np.ones(len(puntajes), dtype=bool) if validos is None else np.asarray(validos, dtype=bool)
+
+        self.general = np.ascontiguousarray(np.sort(puntajes[validos], axis=0).T)
+        self.por_carrera = {
+            carrera: np.ascontiguousarray(np.sort(puntajes[validos & (carreras == carrera)], axis=0).T)
+            for carrera in pd.unique(carreras[validos])
+        }
+        # Las mismas tablas por código entero (-1 = carrera sin norma, que da NaN), para que un
+        # lote se agrupe por código sin comparar cadenas.
+        self.codigos = {carrera: j for j, carrera in enumerate(self.por_carrera)}
+        self.indice_carreras = pd.Index(list(self.por_carrera), dtype=object)
+        self.tablas_carrera = list(self.por_carrera.values()) + [np.empty((len(AREAS), 0))]
+
+    @classmethod
+    def desde_resultado(cls, resultado):
+        df, _, _, columna_carrera, _, _ = resultado
+        return cls(
+            df[[f'PUNTAJE_COMBINADO_{a}' for a in AREAS]].to_numpy(dtype=float),
+            df[columna_carrera].astype(str).str.strip().to_numpy(),
+            ~df['Respondio_Siempre_Igual'].to_numpy(dtype=bool)
+        )
+
+    def tamano(self, carrera: str = None) -> int:
+        tabla = self.general if carrera is None else self.tablas_carrera[self.codigos.get(carrera, -1)]
+        return tabla.shape[1]
+
+    @staticmethod
+    def _percentiles_tabla(tabla: np.ndarray, puntajes: np.ndarray) -> np.ndarray:
+        # Percentil de rango medio (los empates cuentan la mitad) por búsqueda binaria en cada
+        # área. Con un solo envío pesa más la llamada que la búsqueda: se usan los métodos del
+        # arreglo y una sola salida.
+        n = tabla.shape[1]
+        resultado = np.empty(puntajes.shape)
+        if n == 0:
+            resultado.fill(np.nan)
+            return resultado
+        for k in range(len(AREAS)):
+            ordenado, valores = tabla[k], puntajes[..., k]
+            resultado[..., k] = ordenado.searchsorted(valores, 'left') + ordenado.searchsorted(valores, 'right')
+        resultado *= 50 / n
+        return resultado
+
+    def percentiles(self, puntajes, carrera: str = None) -> np.ndarray:
+        # puntajes: matriz (estudiantes × áreas) o un solo vector de 7 puntajes.
+        puntajes = np.asarray(puntajes, dtype=float)
+        tabla = self.general if carrera is None else self.tablas_carrera[self.codigos.get(carrera, -1)]
+        return self._percentiles_tabla(tabla, puntajes)
+
+    def codigos_carrera(self, carreras) -> np.ndarray:
+        if len(carreras) <= 32:
+            return np.array([self.codigos.get(c, -1) for c in carreras], dtype=np.int64)
+        return self.indice_carreras.get_indexer(np.asarray(carreras, dtype=object))
+
+    def percentiles_lote(self, puntajes, carreras) -> np.ndarray:
+        # Percentil de cada estudiante frente a su propia carrera.
+        puntajes = np.asarray(puntajes, dtype=float)
+        codigos = self.codigos_carrera(carreras)
+        if len(codigos) == 0 or (codigos == codigos[0]).all():
+            # Un solo envío o un lote de una sola carrera: una búsqueda por área, sin agrupar.
+            return self._percentiles_tabla(self.tablas_carrera[codigos[0] if len(codigos) else -1], puntajes)
+
+        resultado = np.empty(puntajes.shape)
+        for codigo in np.unique(codigos):
+            filas = codigos == codigo
+            resultado[filas] = self._percentiles_tabla(self.tablas_carrera[codigo], puntajes[filas])
+        return resultado
+
+
+def describir_percentiles(percentiles) -> str:
+    return " · ".join(
+        f"{a} {p:.0f}" if p == p else f"{a} s/d" for a, p in zip(AREAS, percentiles)
+    )
+
+
+# -------------------------------------------------
+# INSTANTÁNEAS DE RESULTADOS (Arrow IPC)
+# -------------------------------------------------
+def validadores_fuentes(fuentes, timeout: float = TIMEOUT_FUENTE_SEG) -> tuple:
+    # Qué contenido tiene hoy cada fuente, sin descargarla: fecha de modificación y tamaño de un
+    # archivo local, ETag o Last-Modified de una URL (petición HEAD). None si el servidor no
+    # da ninguno o no responde; en ese caso sólo el contenido descargado identifica la fuente.
+    validadores = []
+    with httpx.Client(follow_redirects=True, timeout=timeout) as cliente:
+        for _, url in fuentes:
+            url = transformar_url_google_sheets(url)
+            if not es_url_remota(url):
+                estado = os.stat(url) if os.path.exists(url) else None
+                validadores.append(estado and f"{estado.st_mtime_ns}:{estado.st_size}")
+                continue
+            try:
+                respuesta = cliente.head(url)
+                respuesta.raise_for_status()
+            except httpx.HTTPError:
+                validadores.append(None)
+                continue
+            etag, modificado = respuesta.headers.get('etag'), respuesta.headers.get('last-modified')
+            validadores.append(f"etag:{etag}" if etag else modificado and f"modificado:{modificado}")
+    return tuple(validadores)
+
+
+def huella_contenido(df: pd.DataFrame) -> str:
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()[:24]
+
+
+def clave_instantanea(fuentes, huella_datos, peso_intereses, peso_aptitudes, criterios_calidad, perfil_carreras,
+                      criterio_duplicados: str = CRITERIO_DUPLICADOS) -> str:
+    # huella_datos identifica el contenido de las fuentes (ver validadores_fuentes / huella_contenido).
+    ajustes = {
+        'formato': FORMATO_INSTANTANEA,
+        'fuentes': [list(f) for f in fuentes],
+        'huella_datos': huella_datos,
+        'criterio_duplicados': criterio_duplicados,
+        'peso_intereses': float(peso_intereses),
+        'peso_aptitudes': float(peso_aptitudes),
+        'criterios_calidad': criterios_calidad,
+        'perfiles': {c: list(l) for c, l in perfil_carreras.items()}
+    }
+    texto = json.dumps(ajustes, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:24]
+
+
+def guardar_instantanea(directorio: str, clave: str, resultado, ajustes: dict = None,
+                        duplicados: pd.DataFrame = None) -> str:
+    # Se escribe en una carpeta temporal y se renombra al final: un lector nunca ve una instantánea a medias.
+    df, df_intensidad, columnas_items, columna_carrera, columna_nombre, umbral_intrapersonal = resultado
+    destino = os.path.join(directorio, clave)
+    os.makedirs(directorio, exist_ok=True)
+    temporal = tempfile.mkdtemp(prefix=f'.{clave}-', dir=directorio)
+    try:
+        feather.write_feather(df, os.path.join(temporal, 'df.arrow'), compression='uncompressed')
+        feather.write_feather(df_intensidad, os.path.join(temporal, 'df_intensidad.arrow'),
+                              compression='uncompressed')
+        if duplicados is not None:
+            feather.write_feather(duplicados.reset_index(drop=True), os.path.join(temporal, 'duplicados.arrow'),
+                                  compression='uncompressed')
+        metadatos = {
+            'formato': FORMATO_INSTANTANEA,
+            'creada': time.time(),
+            'columnas_items': list(columnas_items),
+            'columna_carrera': columna_carrera,
+            'columna_nombre': columna_nombre,
+            'umbral_intrapersonal': float(umbral_intrapersonal),
+            'ajustes': ajustes or {}
+        }
+        with open(os.path.join(temporal, 'metadatos.json'), 'w', encoding='utf-8') as f:
+            json.dump(metadatos, f, ensure_ascii=False, default=str)
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(temporal, destino)
+    except Exception:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+    return destino
+
+
+def cargar_instantanea(directorio: str, clave: str, max_horas: float = INSTANTANEA_MAX_HORAS):
+    # Devuelve el resultado si existe una instantánea vigente para la clave; si no, None.
+    carpeta = os.path.join(directorio, clave)
+    try:
+        with open(os.path.join(carpeta, 'metadatos.json'), encoding='utf-8') as f:
+            metadatos = json.load(f)
+        if metadatos.get('formato') != FORMATO_INSTANTANEA:
+            return None
+        if max_horas is not None and time.time() - metadatos['creada'] > max_horas * 3600:
+            return None
+        # to_pandas copia las columnas: la instantánea ahorra la descarga y la puntuación, no memoria.
+        df = feather.read_table(os.path.join(carpeta, 'df.arrow'), memory_map=True).to_pandas()
+        df_intensidad = feather.read_table(
+            os.path.join(carpeta, 'df_intensidad.arrow'), memory_map=True
+        ).to_pandas()
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return (
+        df,
+        df_intensidad,
+        pd.Index(metadatos['columnas_items']),
+        metadatos['columna_carrera'],
+        metadatos['columna_nombre'],
+        metadatos['umbral_intrapersonal']
+    )
+
+
+def cargar_duplicados_instantanea(directorio: str, clave: str):
+    # Reporte de envíos duplicados descartados que se guardó con la instantánea; None si no lo hay.
+    try:
+        return feather.read_feather(os.path.join(directorio, clave, 'duplicados.arrow'))
+    except (OSError, ValueError):
+        return None
+
+
+# -------------------------------------------------
+# RESULTADOS COMPARTIDOS ENTRE SESIONES
+# -------------------------------------------------
+def memoria_resultado(resultado) -> int:
+    df, df_intensidad = resultado[0], resultado[1]
+    return int(df.memory_usage(deep=True).sum() + df_intensidad.memory_usage(deep=True).sum())
+
+
+def memoria_objeto(objeto, vistos: set = None) -> int:
+    # Estimación de lo que ocupa una tabla derivada: tablas y arreglos por su tamaño real, y
+    # contenedores u objetos (índices, tablas normativas) por la suma de lo que contienen.
+    vistos = set() if vistos is None else vistos
+    if id(objeto) in vistos:
+        return 0
+    vistos.add(id(objeto))
+    if isinstance(objeto, (pd.DataFrame, pd.Series, pd.Index)):
+        uso = objeto.memory_usage(deep=True)
+        return int(uso.sum() if isinstance(objeto, pd.DataFrame) else uso)
+    if isinstance(objeto, np.ndarray):
+        return int(objeto.nbytes)
+    if isinstance(objeto, dict):
+        return sum(memoria_objeto(k, vistos) + memoria_objeto(v, vistos) for k, v in objeto.items())
+    if isinstance(objeto, (list, tuple, set, frozenset)):
+        return sys.getsizeof(objeto) + sum(memoria_objeto(v, vistos) for v in objeto)
+    atributos = getattr(objeto, '__dict__', None)
+    if atributos is not None:
+        return sys.getsizeof(objeto) + memoria_objeto(atributos, vistos)
+    return sys.getsizeof(objeto)
+
+
+class ResultadoCompartido:
+    # Resultado procesado de una versión del conjunto de datos (fuentes + ajustes + perfiles).
+    # Es de sólo lectura: las sesiones trabajan sobre vistas y nunca lo modifican.
+    __slots__ = ('version', 'resultado', 'bytes_resultado', 'derivados', 'bytes_derivados', 'bytes',
+                 'fijos', 'registro', '_en_curso', '_candado', '__weakref__')
+
+    def __init__(self, version, resultado, registro=None):
+        self.version = version
+        self.resultado = resultado
+        self.bytes_resultado = memoria_resultado(resultado)
+        self.bytes = self.bytes_resultado
+        # Derivados en orden de último uso, para liberar primero los que nadie ha pedido hace más.
+        self.derivados = OrderedDict()
+        self.bytes_derivados = {}
+        # Anexos que no se pueden reconstruir (p. ej. el reporte de duplicados): nunca se liberan.
+        self.fijos = set()
+        self.registro = None if registro is None else weakref.ref(registro)
+        # Derivados que alguna sesión está construyendo: quien pida la misma clave espera su evento.
+        self._en_curso = {}
+        self._candado = threading.Lock()
+
+    def derivado(self, clave, construir):
+        # Memoriza tablas derivadas (listados, agregados) junto a la versión de la que salen;
+        # se construyen la primera vez que alguna sesión las pide. Cuentan para el techo de
+        # memoria del registro, que puede liberarlas bajo presión; se reconstruyen si vuelven a pedirse.
+        # Se construyen fuera del candado: un derivado lento sólo hace esperar a quien pide esa misma clave.
+        while True:
+            with self._candado:
+                if clave in self.derivados:
+                    self.derivados.move_to_end(clave)
+                    return self.derivados[clave]
+                evento = self._en_curso.get(clave)
+                if evento is None:
+                    evento = self._en_curso[clave] = threading.Event()
+                    break
+            evento.wait()
+
+        try:
+            valor = construir()
+            tamano = memoria_objeto(valor)
+        except BaseException:
+            # Si falla, quien estaba esperando lo intenta por su cuenta.
+            with self._candado:
+                del self._en_curso[clave]
+            evento.set()
+            raise
+        with self._candado:
+            self.derivados[clave] = valor
+            self.bytes_derivados[clave] = tamano
+            self.bytes += tamano
+            del self._en_curso[clave]
+        evento.set()
+        registro = self.registro and self.registro()
+        if registro is not None:
+            registro.ajustar_memoria()
+        return valor
+
+    def fijar(self, clave, valor):
+        with self._candado:
+            self.bytes -= self.bytes_derivados.get(clave, 0)
+            self.derivados[clave] = valor
+            self.bytes_derivados[clave] = memoria_objeto(valor)
+            self.bytes += self.bytes_derivados[clave]
+            self.fijos.add(clave)
+        return valor
+
+    def liberar_derivados(self, bytes_objetivo: int) -> int:
+        # Suelta derivados, del menos al más recientemente usado, hasta liberar bytes_objetivo.
+        with self._candado:
+            liberados = 0
+            for clave in [c for c in self.derivados if c not in self.fijos]:
+                if liberados >= bytes_objetivo:
+                    break
+                del self.derivados[clave]
+                liberados += self.bytes_derivados.pop(clave)
+            self.bytes -= liberados
+            return liberados
+
+
+class Precalentamiento:
+    # Ejecuta en un hilo de fondo una lista de (versión, trabajo). Las sesiones pueden consultar
+    # el avance o esperar a una versión pendiente en lugar de calcularla por duplicado.
+    def __init__(self, tareas):
+        self.tareas = list(tareas)
+        self.eventos = {version: threading.Event() for version, _ in self.tareas}
+        self.completadas = 0
+        self.errores = []
+        self._hilo = threading.Thread(target=self._ejecutar, name='chaside-precalentamiento', daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def _ejecutar(self):
+        for version, trabajo in self.tareas:
+            try:
+                trabajo()
+            except Exception as e:
+                self.errores.append(str(e))
+            finally:
+                self.eventos[version].set()
+                self.completadas += 1
+
+    def pendiente(self, version) -> bool:
+        evento = self.eventos.get(version)
+        return evento is not None and not evento.is_set()
+
+    def esperar(self, version, timeout: float = None) -> bool:
+        evento = self.eventos.get(version)
+        return evento is None or evento.wait(timeout)
+
+    def estado(self) -> dict:
+        return {'total': len(self.tareas), 'completadas': self.completadas, 'errores': list(self.errores)}
+
+
+class RegistroResultados:
+    # Cada versión se procesa y publica una sola vez para todas las sesiones. Las sesiones
+    # guardan la referencia fuerte; el registro sólo conserva por su cuenta las versiones
+    # más recientes mientras quepan en el techo de memoria. Cuando ninguna sesión usa una
+    # versión y el registro ya no la retiene, se libera con su última referencia.
+    def __init__(self, memoria_max_mb: float = MEMORIA_MAX_MB):
+        self.memoria_max_bytes = int(memoria_max_mb * 1024 * 1024)
+        self._candado = threading.Lock()
+        self._vivas = weakref.WeakValueDictionary()
+        self._retenidas = OrderedDict()
+
+    def obtener(self, version):
+        with self._candado:
+            compartido = self._vivas.get(version)
+            if compartido is not None and version in self._retenidas:
+                self._retenidas.move_to_end(version)
+            return compartido
+
+    def publicar(self, version, resultado) -> ResultadoCompartido:
+        # Si otra sesión publicó la misma versión mientras ésta procesaba, se reutiliza la existente.
+        with self._candado:
+            compartido = self._vivas.get(version)
+            if compartido is None:
+                compartido = ResultadoCompartido(version, resultado, self)
+                self._vivas[version] = compartido
+            self._retenidas[version] = compartido
+            self._retenidas.move_to_end(version)
+            self._ajustar_memoria()
+            return compartido
+
+    def memoria_en_uso(self) -> int:
+        return sum(c.bytes for c in list(self._vivas.values()))
+
+    def ajustar_memoria(self):
+        with self._candado:
+            self._ajustar_memoria()
+
+    def _ajustar_memoria(self):
+        # Deja de retener las versiones más antiguas hasta volver bajo el techo; la más
+        # reciente siempre se conserva. Las que alguna sesión sigue usando permanecen
+        # vivas (y compartibles) hasta que esa sesión cambie de versión o termine.
+        while len(self._retenidas) > 1 and self.memoria_en_uso() > self.memoria_max_bytes:
+            self._retenidas.popitem(last=False)
+
+        # Si aún se excede, se liberan tablas derivadas: primero las de versiones que el registro
+        # ya no retiene, luego las de las retenidas de la más antigua a la más reciente.
+        exceso = self.memoria_en_uso() - self.memoria_max_bytes
+        if exceso > 0:
+            vivas = list(self._vivas.values())
+            orden = [c for c in vivas if c.version not in self._retenidas] + [
+                c for v, c in self._retenidas.items()
+            ]
+            for compartido in orden:
+                if exceso <= 0:
+                    break
+                exceso -= compartido.liberar_derivados(exceso)
+
+    def estado(self) -> dict:
+        with self._candado:
+            return {
+                'versiones': len(self._vivas),
+                'retenidas': len(self._retenidas),
+                'memoria_mb': self.memoria_en_uso() / (1024 * 1024),
+                'memoria_max_mb': self.memoria_max_bytes / (1024 * 1024)
+            }
+
+
+# -------------------------------------------------
+# SENSIBILIDAD A LOS PESOS (barrido vectorizado)
+# -------------------------------------------------
+PESOS_BARRIDO = np.round(np.linspace(0, 1, 21), 2)
+
+ETIQUETAS_SEMAFORO = ['Verde', 'Amarillo', 'Rojo', 'Sin sugerencia', 'Respondió siempre igual']
+
+
+def matriz_perfiles(perfil_carreras: dict):
+    nombres = list(perfil_carreras)
+    membresia = np.array(
+        [[a in perfil_carreras[c] for a in AREAS] for c in nombres],
+        dtype=bool
+    ).reshape(len(nombres), len(AREAS))
+    return nombres, membresia
+
+
+def compilar_perfiles(perfil_carreras: dict) -> dict:
+    # Estructuras precalculadas de los perfiles; se reutilizan entre llamadas a clasificar_combinado.
+    nombres, membresia = matriz_perfiles(perfil_carreras)
+    n_carreras = len(nombres)
+    compatibles = (membresia.astype(int) @ membresia.T.astype(int)) >= 2
+
+    # Posiciones de las letras de cada perfil, en su orden, rellenadas con una columna de ceros
+    # (índice len(AREAS)) para sumarlas en bloque.
+    posiciones = [[AREAS.index(l) for l in perfil_carreras[c]] for c in nombres]
+    largo = max((len(p) for p in posiciones), default=0)
+    posiciones_relleno = np.full((n_carreras, max(largo, 1)), len(AREAS), dtype=int)
+    for k, p in enumerate(posiciones):
+        posiciones_relleno[k, :len(p)] = p
+
+    return {
+        'nombres': nombres,
+        'indice': {c: k for k, c in enumerate(nombres)},
+        'membresia_ext': np.vstack([membresia, np.zeros((1, len(AREAS)), dtype=bool)]),
+        'area_sugerible': membresia.any(axis=0),
+        'posiciones_relleno': posiciones_relleno,
+        'conteo_letras': np.array([len(p) for p in posiciones], dtype=float),
+        'compatibles_ext': np.vstack([compatibles, np.zeros((1, n_carreras), dtype=bool)])
+    }
+
+
+def clasificar_combinado(combinado, idx_carrera, respondio_igual, compilado: dict):
+    # Mismas reglas que process_data sobre puntajes combinados de forma (n_pesos, n_estudiantes, 7).
+    # Todos los códigos devueltos tienen forma (n_pesos, n_estudiantes):
+    #   area_idx     → posición en AREAS
+    #   semaforo_idx → posición en ETIQUETAS_SEMAFORO
+    #   destino_idx  → posición en compilado['nombres'] (-1 = se mantiene en la carrera elegida)
+    n_carreras = len(compilado['nombres'])
+    n = combinado.shape[1]
+    filas = np.arange(n)
+
+    area_idx = combinado.argmax(axis=2)
+
+    idx_carrera = np.asarray(idx_carrera)
+    idx_seguro = np.where(idx_carrera < 0, n_carreras, idx_carrera)
+    perfil_propio = compilado['membresia_ext'][idx_seguro]
+
+    semaforo_idx = np.where(perfil_propio.any(axis=1), 1, 2)
+    semaforo_idx = np.where(perfil_propio[filas, area_idx], 0, semaforo_idx)
+    semaforo_idx = np.where(compilado['area_sugerible'][area_idx], semaforo_idx, 3)
+    semaforo_idx = np.where(np.asarray(respondio_igual, dtype=bool), 4, semaforo_idx)
+
+    if not n_carreras:
+        return area_idx, semaforo_idx, np.full(area_idx.shape, -1)
+
+    # Las letras se suman en el orden de cada perfil (más ceros de relleno) para reproducir
+    # exactamente np.mean: los empates entre carreras se deciden con la misma aritmética que process_data.
+    combinado_ext = np.concatenate([combinado, np.zeros(combinado.shape[:2] + (1,))], axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        medias = combinado_ext[..., compilado['posiciones_relleno']].sum(axis=3) / compilado['conteo_letras']
+
+    candidatas = compilado['compatibles_ext'][idx_seguro]
+    puntaje_candidatas = np.where(candidatas, medias, -np.inf)
+    mejor_idx = puntaje_candidatas.argmax(axis=2)
+    mejor_puntaje = puntaje_candidatas.max(axis=2)
+    puntaje_propio = np.where(
+        idx_carrera >= 0,
+        medias[:, filas, np.minimum(idx_seguro, n_carreras - 1)],
+        np.nan
+    )
+    with np.errstate(invalid='ignore'):
+        mejora = mejor_puntaje > puntaje_propio
+
+    return area_idx, semaforo_idx, np.where(mejora, mejor_idx, -1)
+
+
+def barrido_sensibilidad_pesos(interes, aptitud, carreras, respondio_igual, perfil_carreras,
+                               pesos_intereses=PESOS_BARRIDO):
+    # Evalúa todas las relaciones de pesos en un solo cálculo matricial (ver clasificar_combinado).
+    interes = np.asarray(interes, dtype=float)
+    aptitud = np.asarray(aptitud, dtype=float)
+    carreras = pd.Series(carreras).astype(str).str.strip()
+
+    w_int = np.asarray(pesos_intereses, dtype=float)[:, None, None]
+    w_apt = np.round(1 - w_int, 2)
+    combinado = interes[None] * w_int + aptitud[None] * w_apt
+
+    compilado = compilar_perfiles(perfil_carreras)
+    idx_carrera = pd.Index(compilado['nombres']).get_indexer(carreras)
+    area_idx, semaforo_idx, destino_idx = clasificar_combinado(
+        combinado, idx_carrera, respondio_igual, compilado
+    )
+
+    return {
+        'pesos_intereses': np.asarray(pesos_intereses, dtype=float),
+        'area_idx': area_idx,
+        'semaforo_idx': semaforo_idx,
+        'destino_idx': destino_idx,
+        'carreras_perfil': compilado['nombres']
+    }
+
+
+def _distintos_por_columna(codigos):
+    ordenados = np.sort(codigos, axis=0)
+    return (np.diff(ordenados, axis=0) != 0).sum(axis=0) + 1
+
+
+def resumir_estabilidad(barrido, carreras, peso_actual):
+    pesos = barrido['pesos_intereses']
+    i_actual = int(np.abs(pesos - peso_actual).argmin())
+
+    semaforo_idx = barrido['semaforo_idx']
+    area_idx = barrido['area_idx']
+    destino_idx = barrido['destino_idx']
+
+    etiquetas_semaforo = np.array(ETIQUETAS_SEMAFORO, dtype=object)
+    letras = np.array(AREAS, dtype=object)
+    carreras = pd.Series(carreras).astype(str).str.strip().to_numpy(dtype=object)
+
+    nombres = np.array(barrido['carreras_perfil'] + [''], dtype=object)
+    destino_actual = np.where(
+        destino_idx[i_actual] >= 0,
+        nombres[destino_idx[i_actual]],
+        carreras
+    )
+
+    presente = np.zeros((len(AREAS), semaforo_idx.shape[1]), dtype=bool)
+    np.put_along_axis(presente, area_idx, True, axis=0)
+    areas_observadas = [
+        ''.join(letras[presente[:, j]]) for j in range(presente.shape[1])
+    ]
+
+    por_estudiante = pd.DataFrame({
+        'Semáforo actual': etiquetas_semaforo[semaforo_idx[i_actual]],
+        'Área fuerte actual': letras[area_idx[i_actual]],
+        'Destino compatible actual': destino_actual,
+        'Estabilidad semáforo (%)': (semaforo_idx == semaforo_idx[i_actual]).mean(axis=0) * 100,
+        'Semáforos distintos': _distintos_por_columna(semaforo_idx),
+        'Áreas fuertes observadas': areas_observadas,
+        'Estabilidad destino (%)': (destino_idx == destino_idx[i_actual]).mean(axis=0) * 100,
+        'Destinos distintos': _distintos_por_columna(destino_idx)
+    })
+
+    codigos_carrera, carreras_unicas = pd.factorize(carreras)
+    n_pesos = len(pesos)
+    n_grupos = len(carreras_unicas)
+    n_cat = len(ETIQUETAS_SEMAFORO)
+
+    indice = (
+        (np.arange(n_pesos)[:, None] * n_grupos + codigos_carrera[None, :]) * n_cat
+        + semaforo_idx
+    )
+    conteos = np.bincount(indice.ravel(), minlength=n_pesos * n_grupos * n_cat)
+    conteos = conteos.reshape(n_pesos, n_grupos, n_cat)
+
+    por_carrera = pd.DataFrame(
+        conteos.reshape(-1, n_cat),
+        columns=ETIQUETAS_SEMAFORO
+    )
+    por_carrera.insert(0, 'Carrera', np.tile(np.asarray(carreras_unicas, dtype=object), n_pesos))
+    por_carrera.insert(0, 'Peso_Intereses', np.repeat(pesos, n_grupos))
+
+    return por_estudiante, por_carrera
+
+
+# -------------------------------------------------
+# RECOMENDACIÓN DE CARRERAS (top-k sobre todo el catálogo)
+# La afinidad con una carrera es el promedio de los puntajes combinados en las letras de su
+# perfil (la misma medida que Destino_Compatible), pero contra todas las carreras a la vez:
+# un producto estudiantes × áreas por áreas × carreras. De cada fila sólo se ordenan las
+# mejores, separadas antes con argpartition.
+# -------------------------------------------------
+def matriz_afinidad(perfil_carreras: dict):
+    # (nombres, pesos) con pesos[a, c] = 1 / número de letras de c si la letra a está en su perfil.
+    # Las carreras sin letras no se pueden recomendar y quedan fuera del catálogo.
+    nombres, membresia = matriz_perfiles(perfil_carreras)
+    con_perfil = membresia.any(axis=1)
+    membresia = membresia[con_perfil]
+    pesos = (membresia / membresia.sum(axis=1, keepdims=True)).T
+    return [c for c, ok in zip(nombres, con_perfil) if ok], pesos.reshape(len(AREAS), -1)
+
+
+def compilar_catalogo(perfil_carreras: dict) -> dict:
+    # Lo que no cambia entre llamadas: se arma una vez por conjunto de perfiles (p. ej. en
+    # MotorPuntuacion) y se pasa a recomendar_compilado.
+    nombres, pesos = matriz_afinidad(perfil_carreras)
+    return {
+        'nombres': nombres,
+        'pesos': np.ascontiguousarray(pesos),
+        'indice': {c: j for j, c in enumerate(nombres)}
+    }
+
+
+def recomendar_carreras(combinado, perfil_carreras: dict, k: int = 3, carreras_elegidas=None,
+                        tamano_bloque: int = 65536) -> dict:
+    catalogo = compilar_catalogo(perfil_carreras)
+    idx_elegida = None
+    if carreras_elegidas is not None:
+        idx_elegida = pd.Index(catalogo['nombres']).get_indexer(
+            pd.Series(carreras_elegidas).astype(str).str.strip()
+        )
+    return recomendar_compilado(combinado, catalogo, k, idx_elegida, tamano_bloque)
+
+
+def recomendar_compilado(combinado, catalogo: dict, k: int = 3, idx_elegida=None,
+                         tamano_bloque: int = 65536) -> dict:
+    # combinado: (n_estudiantes, 7) en el orden de AREAS; idx_elegida: posición de la carrera
+    # elegida en catalogo['nombres'] (-1 = fuera del catálogo). Por estudiante devuelve:
+    #   indices          (n, k) → posición en 'nombres' de las k carreras más afines, de mayor a menor
+    #   afinidad         (n, k) → afinidad con cada una
+    #   margen           (n, k) → ventaja sobre la siguiente del ranking (NaN si no hay siguiente)
+    #   lugar_elegida    (n,)   → lugar de la carrera elegida en todo el catálogo (0 = sin perfil)
+    # Los empates se ordenan como aparecen en el catálogo.
+    nombres, pesos = catalogo['nombres'], catalogo['pesos']
+    combinado = np.asarray(combinado, dtype=float).reshape(-1, len(AREAS))
+    n, m = len(combinado), len(nombres)
+    k = min(k, m)
+    k_margen = min(k + 1, m)
+    idx_elegida = np.full(n, -1) if idx_elegida is None else np.asarray(idx_elegida)
+
+    indices = np.zeros((n, k), dtype=np.int64)
+    afinidad = np.zeros((n, k))
+    margen = np.full((n, k), np.nan)
+    lugar_elegida = np.zeros(n, dtype=np.int64)
+    if not m:
+        return {'nombres': nombres, 'indices': indices, 'afinidad': afinidad, 'margen': margen,
+                'lugar_elegida': lugar_elegida}
+
+    for inicio in range(0, n, tamano_bloque):
+        fin = min(inicio + tamano_bloque, n)
+        # Redondeo para que dos perfiles con el mismo promedio empaten aunque sumen en otro orden.
+        bloque = np.round(combinado[inicio:fin] @ pesos, 9)
+
+        if k_margen < m:
+            mejores = np.sort(np.argpartition(-bloque, k_margen - 1, axis=1)[:, :k_margen], axis=1)
+        else:
+            mejores = np.broadcast_to(np.arange(m), bloque.shape)
+        puntajes = np.take_along_axis(bloque, mejores, axis=1)
+        orden = np.argsort(-puntajes, axis=1, kind='stable')
+        mejores = np.take_along_axis(mejores, orden, axis=1)
+        puntajes = np.take_along_axis(puntajes, orden, axis=1)
+
+        indices[inicio:fin] = mejores[:, :k]
+        afinidad[inicio:fin] = puntajes[:, :k]
+        margen[inicio:fin, :k_margen - 1] = puntajes[:, :-1] - puntajes[:, 1:]
+
+        elegida = idx_elegida[inicio:fin]
+        propia = bloque[np.arange(fin - inicio), np.maximum(elegida, 0)]
+        lugar_elegida[inicio:fin] = np.where(elegida >= 0, (bloque > propia[:, None]).sum(axis=1) + 1, 0)
+
+    return {'nombres': nombres, 'indices': indices, 'afinidad': afinidad, 'margen': margen,
+            'lugar_elegida': lugar_elegida}
+
+
+# -------------------------------------------------
+# HISTÓRICO DE COHORTES (SQLite)
+# -------------------------------------------------
+ESQUEMA_HISTORICO = """
+CREATE TABLE IF NOT EXISTS cohortes (
+    cohorte TEXT PRIMARY KEY,
+    fecha_guardado TEXT NOT NULL,
+    peso_intereses REAL,
+    peso_aptitudes REAL,
+    n_estudiantes INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS resultados (
+    cohorte TEXT NOT NULL,
+    carrera TEXT,
+    email TEXT,
+    nombre TEXT,
+    area_fuerte TEXT,
+    semaforo TEXT,
+    nivel_intensidad TEXT,
+    destino_compatible TEXT,
+    score REAL,
+    total_C REAL, total_H REAL, total_A REAL, total_S REAL,
+    total_I REAL, total_D REAL, total_E REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_resultados_cohorte ON resultados (cohorte);
+CREATE INDEX IF NOT EXISTS idx_resultados_carrera ON resultados (carrera, cohorte);
+CREATE INDEX IF NOT EXISTS idx_resultados_email ON resultados (email);
+"""
+
+
+def abrir_historico(ruta: str = RUTA_HISTORICO) -> sqlite3.Connection:
+    conexion = sqlite3.connect(ruta)
+    conexion.executescript(ESQUEMA_HISTORICO)
+    return conexion
+
+
+def guardar_cohorte(ruta, cohorte, df, df_intensidad, columna_carrera, columna_nombre,
+                    peso_intereses, peso_aptitudes) -> int:
+    cohorte = str(cohorte).strip()
+    if not cohorte:
+        raise ValueError("El nombre de la cohorte no puede estar vacío.")
+
+    niveles = (
+        df_intensidad['Nivel_Intensidad'].reindex(df.index)
+        if 'Nivel_Intensidad' in df_intensidad.columns
+        else pd.Series(None, index=df.index, dtype='object')
+    )
+    # Sin fillna, astype(str) convierte un correo vacío en 'nan' en pandas 2.x; se guardan como NULL.
+    email = (
+        df[COLUMNA_EMAIL].fillna('').astype(str).str.strip().str.lower()
+        if COLUMNA_EMAIL in df.columns
+        else pd.Series('', index=df.index)
+    )
+    email = email.where(email != '')
+
+    registros = pd.DataFrame({
+        'cohorte': cohorte,
+        'carrera': df[columna_carrera].astype(str).str.strip(),
+        'email': email,
+        'nombre': df[columna_nombre].astype(str),
+        'area_fuerte': df['Area_Fuerte_Ponderada'],
+        'semaforo': df['Semáforo Vocacional'],
+        'nivel_intensidad': niveles,
+        'destino_compatible': df['Destino_Compatible'],
+        'score': df['Score'].astype(float),
+        **{f'total_{a}': df[f'TOTAL_{a}'].astype(float) for a in AREAS}
+    })
+    registros = registros.astype(object).where(registros.notna(), None)
+
+    columnas = list(registros.columns)
+    insercion = (
+        f"INSERT INTO resultados ({', '.join(columnas)}) "
+        f"VALUES ({', '.join('?' for _ in columnas)})"
+    )
+
+    with abrir_historico(ruta) as conexion:
+        conexion.execute("DELETE FROM resultados WHERE cohorte = ?", (cohorte,))
+        conexion.executemany(insercion, registros.itertuples(index=False, name=None))
+        conexion.execute(
+            "INSERT OR REPLACE INTO cohortes VALUES (?, ?, ?, ?, ?)",
+            (cohorte, datetime.now().isoformat(timespec='seconds'),
+             float(peso_intereses), float(peso_aptitudes), len(registros))
+        )
+    conexion.close()
+    return len(registros)
+
+
+def consultar_historico(ruta: str, consulta: str, parametros=()) -> pd.DataFrame:
+    conexion = abrir_historico(ruta)
+    try:
+        return pd.read_sql_query(consulta, conexion, params=list(parametros))
+    finally:
+        conexion.close()
+
+
+def listar_cohortes(ruta: str = RUTA_HISTORICO) -> pd.DataFrame:
+    return consultar_historico(
+        ruta,
+        "SELECT cohorte, fecha_guardado, peso_intereses, peso_aptitudes, n_estudiantes "
+        "FROM cohortes ORDER BY cohorte"
+    )
+
+
+def listar_carreras_historico(ruta: str = RUTA_HISTORICO) -> list:
+    return consultar_historico(
+        ruta,
+        "SELECT DISTINCT carrera FROM resultados WHERE carrera IS NOT NULL ORDER BY carrera"
+    )['carrera'].tolist()
+
+
+def _filtro_cohortes_carrera(cohortes, carrera):
+    condiciones = [f"cohorte IN ({', '.join('?' for _ in cohortes)})"]
+    parametros = list(cohortes)
+    if carrera:
+        condiciones.append("carrera = ?")
+        parametros.append(carrera)
+    return " AND ".join(condiciones), parametros
+
+
+def tendencia_por_columna(ruta, columna, cohortes, carrera=None) -> pd.DataFrame:
+    if columna not in ('semaforo', 'nivel_intensidad', 'area_fuerte', 'destino_compatible'):
+        raise ValueError(f"Columna no agregable en el histórico: {columna}")
+    if not cohortes:
+        return pd.DataFrame(columns=['cohorte', columna, 'N', 'Porcentaje'])
+
+    where, parametros = _filtro_cohortes_carrera(cohortes, carrera)
+    return consultar_historico(
+        ruta,
+        f"""
+        SELECT cohorte, {columna}, COUNT(*) AS N,
+               100.0 * COUNT(*) / SUM(COUNT(*)) OVER (PARTITION BY cohorte) AS Porcentaje
+        FROM resultados
+        WHERE {where} AND {columna} IS NOT NULL
+        GROUP BY cohorte, {columna}
+        ORDER BY cohorte, {columna}
+        """,
+        parametros
+    )
+
+
+def promedio_areas_historico(ruta, cohortes, carrera=None) -> pd.DataFrame:
+    if not cohortes:
+        return pd.DataFrame(columns=['cohorte', 'N'] + AREAS)
+
+    where, parametros = _filtro_cohortes_carrera(cohortes, carrera)
+    promedios = ", ".join(f"AVG(total_{a}) AS {a}" for a in AREAS)
+    return consultar_historico(
+        ruta,
+        f"SELECT cohorte, COUNT(*) AS N, {promedios} FROM resultados "
+        f"WHERE {where} GROUP BY cohorte ORDER BY cohorte",
+        parametros
+    )
+
+
+def historial_estudiante(ruta, email) -> pd.DataFrame:
+    return consultar_historico(
+        ruta,
+        "SELECT cohorte, carrera, nombre, area_fuerte, semaforo, nivel_intensidad, destino_compatible "
+        "FROM resultados WHERE email = ? ORDER BY cohorte",
+        (str(email).strip().lower(),)
+    )
+
+
+# -------------------------------------------------
+# CAMBIOS DE CLASIFICACIÓN ENTRE VERSIONES
+# Dos versiones procesadas (o una cohorte del histórico) se reducen a una fila por correo con
+# las columnas del histórico y se alinean sobre el índice hash del correo: la unión y los
+# reindex son lineales, sin ordenar ni unir tablas completas.
+# -------------------------------------------------
+CAMPOS_COMPARACION = {
+    'carrera': 'Carrera elegida',
+    'semaforo': 'Semáforo vocacional',
+    'nivel_intensidad': 'Nivel de intensidad',
+    'destino_compatible': 'Carrera sugerida compatible'
+}
+
+SIN_VALOR = '—'
+
+
+def _preparar_clasificacion(tabla: pd.DataFrame) -> pd.DataFrame:
+    # Correo normalizado como llave única (gana el último envío); los envíos sin correo no se comparan.
+    campos = list(CAMPOS_COMPARACION)
+    email = tabla['email'].fillna('').astype(str).str.strip().str.lower()
+    tabla = tabla.assign(email=email)[email != '']
+    tabla = tabla.drop_duplicates('email', keep='last').set_index('email')
+    valores = tabla[campos].astype(object)
+    return tabla[['nombre']].join(valores.where(valores.notna(), SIN_VALOR))
+
+
+def clasificacion_resultado(df, df_intensidad, columna_carrera, columna_nombre) -> pd.DataFrame:
+    # Mismas columnas y normalización que guarda guardar_cohorte.
+    return _preparar_clasificacion(pd.DataFrame({
+        'email': df[COLUMNA_EMAIL] if COLUMNA_EMAIL in df.columns else None,
+        'nombre': df[columna_nombre].astype(str),
+        'carrera': df[columna_carrera].astype(str).str.strip(),
+        'semaforo': df['Semáforo Vocacional'],
+        'nivel_intensidad': (
+            df_intensidad['Nivel_Intensidad'].reindex(df.index)
+            if 'Nivel_Intensidad' in df_intensidad.columns else None
+        ),
+        'destino_compatible': df['Destino_Compatible']
+    }, index=df.index))
+
+
+def clasificacion_historico(ruta, cohorte) -> pd.DataFrame:
+    return _preparar_clasificacion(consultar_historico(
+        ruta,
+        "SELECT email, nombre, carrera, semaforo, nivel_intensidad, destino_compatible "
+        "FROM resultados WHERE cohorte = ?",
+        (cohorte,)
+    ))
+
+
+def comparar_clasificaciones(anterior: pd.DataFrame, actual: pd.DataFrame) -> dict:
+    # Devuelve {'cambios': una fila por estudiante nuevo, ausente o con algún campo distinto,
+    #           'resumen': estudiantes por (carrera, campo, antes, ahora), 'conteos': totales}.
+    campos = list(CAMPOS_COMPARACION)
+    correos = anterior.index.union(actual.index, sort=False)
+    pos_antes = anterior.index.get_indexer(correos)
+    pos_ahora = actual.index.get_indexer(correos)
+    estaba, esta = pos_antes >= 0, pos_ahora >= 0
+
+    def alinear(tabla, posiciones):
+        # Cada columna se convierte una sola vez; la posición -1 toma el None agregado al final.
+        return {c: np.append(tabla[c].to_numpy(dtype=object), None)[posiciones] for c in ['nombre'] + campos}
+
+    antes, ahora = alinear(anterior, pos_antes), alinear(actual, pos_ahora)
+
+    distinto = {c: antes[c] != ahora[c] for c in campos}
+    cambio = np.logical_or.reduce([distinto[c] for c in campos]) & estaba & esta
+    tipo = np.select([~estaba, ~esta, cambio], ['Nuevo', 'Ya no aparece', 'Cambió'], '')
+    fila = tipo != ''
+
+    etiquetas = np.array([CAMPOS_COMPARACION[c] for c in campos], dtype=object)
+    marcas = np.column_stack([distinto[c] & cambio for c in campos])[fila]
+    carrera = np.where(esta, ahora['carrera'], antes['carrera'])
+
+    cambios = pd.DataFrame({
+        'Correo electrónico': correos[fila],
+        'Nombre del estudiante': np.where(esta, ahora['nombre'], antes['nombre'])[fila],
+        'Carrera': carrera[fila],
+        'Cambio': tipo[fila],
+        'Campos que cambiaron': [', '.join(etiquetas[m]) for m in marcas],
+        **{
+            f'{CAMPOS_COMPARACION[c]} ({momento})': valores[c][fila]
+            for c in campos
+            for momento, valores in (('antes', antes), ('ahora', ahora))
+        }
+    })
+
+    movimientos = []
+    for c in campos:
+        m = distinto[c] & cambio
+        if m.any():
+            grupos = pd.DataFrame({
+                'Carrera': carrera[m],
+                'Antes': antes[c][m],
+                'Ahora': ahora[c][m]
+            }).groupby(['Carrera', 'Antes', 'Ahora'], sort=False).size()
+            movimientos.append(grupos.rename('Estudiantes').reset_index().assign(Campo=CAMPOS_COMPARACION[c]))
+    resumen = pd.concat(movimientos, ignore_index=True) if movimientos else pd.DataFrame(
+        columns=['Carrera', 'Antes', 'Ahora', 'Estudiantes', 'Campo']
+    )
+    resumen = resumen[['Campo', 'Carrera', 'Antes', 'Ahora', 'Estudiantes']].sort_values(
+        'Estudiantes', ascending=False, kind='stable', ignore_index=True
+    )
+    resumen['Descripción'] = [
+        f"{n} estudiante{'s' if n != 1 else ''} de {carrera_r}: {campo.lower()} {a} → {b}"
+        for campo, carrera_r, a, b, n in resumen[['Campo', 'Carrera', 'Antes', 'Ahora', 'Estudiantes']].itertuples(
+            index=False, name=None
+        )
+    ]
+
+    return {
+        'cambios': cambios,
+        'resumen': resumen,
+        'conteos': {
+            'comparados': int((estaba & esta).sum()),
+            'con_cambios': int(cambio.sum()),
+            'nuevos': int((~estaba).sum()),
+            'ya_no_aparecen': int((~esta).sum())
+        }
+    }
+
+
+# -------------------------------------------------
+# ENVÍO MASIVO DE REPORTES (SMTP)
+# -------------------------------------------------
+RUTA_BITACORA_ENVIOS = os.environ.get('CHASIDE_BITACORA_ENVIOS', 'envios_chaside.sqlite')
+
+# Valores por omisión; cada clave se puede fijar con la variable CHASIDE_SMTP_<CLAVE>
+# (p. ej. CHASIDE_SMTP_HOST) o con la sección [smtp] de los secretos de la app.
+CONFIG_SMTP = {
+    'host': '',
+    'puerto': 587,
+    'usuario': '',
+    'contrasena': '',
+    'remitente': '',
+    'tls': 'starttls',            # 'starttls', 'ssl' o 'ninguno'
+    'conexiones': 4,              # conexiones SMTP simultáneas
+    'por_minuto': 120,            # tope de mensajes por minuto entre todas las conexiones
+    'mensajes_por_conexion': 100, # se renueva la conexión al llegar a este número
+    'reintentos': 4,              # reintentos tras el primer envío fallido
+    'timeout': 30.0
+}
+
+ESQUEMA_BITACORA_ENVIOS = """
+CREATE TABLE IF NOT EXISTS envios (
+    campana TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    correo TEXT,
+    nombre TEXT,
+    estado TEXT NOT NULL,
+    intentos INTEGER NOT NULL,
+    error TEXT,
+    fecha TEXT NOT NULL,
+    PRIMARY KEY (campana, clave)
+);
+"""
+
+
+def config_smtp(secretos: dict = None) -> dict:
+    config = dict(CONFIG_SMTP)
+    for clave, valor in CONFIG_SMTP.items():
+        if clave in (secretos or {}):
+            config[clave] = secretos[clave]
+        elif f'CHASIDE_SMTP_{clave.upper()}' in os.environ:
+            config[clave] = os.environ[f'CHASIDE_SMTP_{clave.upper()}']
+        config[clave] = type(valor)(config[clave])
+    config['remitente'] = config['remitente'] or config['usuario']
+    if config['tls'] not in ('starttls', 'ssl', 'ninguno'):
+        raise ValueError(f"Modo TLS no reconocido: {config['tls']}")
+    return config
+
+
+def _error_definitivo_smtp(e: Exception) -> bool:
+    # Los códigos 5xx (destinatario inexistente, autenticación rechazada, …) no mejoran
+    # al reintentar; los 4xx y las caídas de conexión sí.
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(codigo >= 500 for codigo, _ in e.recipients.values())
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code >= 500
+    return isinstance(e, (ValueError, smtplib.SMTPNotSupportedError))
+
+
+class LimitadorTasa:
+    # Cubeta de fichas compartida por todos los hilos: admite ráfagas cortas de hasta
+    # 'rafaga' mensajes y, en promedio, no más de 'por_minuto'.
+    def __init__(self, por_minuto: float, rafaga: int = 1):
+        self.intervalo = 60.0 / por_minuto if por_minuto > 0 else 0.0
+        self.rafaga = max(1, int(rafaga))
+        self.fichas = float(self.rafaga)
+        self.ultimo = time.monotonic()
+        self._candado = threading.Lock()
+
+    def esperar(self):
+        if not self.intervalo:
+            return
+        while True:
+            with self._candado:
+                ahora = time.monotonic()
+                self.fichas = min(self.rafaga, self.fichas + (ahora - self.ultimo) / self.intervalo)
+                self.ultimo = ahora
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return
+                espera = (1 - self.fichas) * self.intervalo
+            time.sleep(espera)
+
+
+class PoolSMTP:
+    # Conjunto acotado de conexiones SMTP autenticadas que se reutilizan entre mensajes.
+    # Una conexión que falla se descarta y la siguiente petición abre otra.
+    def __init__(self, config: dict):
+        if not config['host']:
+            raise ValueError("No hay servidor SMTP configurado (CHASIDE_SMTP_HOST o secretos [smtp]).")
+        self.config = config
+        self._libres = queue.LifoQueue()
+        self._usos = {}
+        self._candado = threading.Lock()
+
+    def _conectar(self):
+        c = self.config
+        if c['tls'] == 'ssl':
+            conexion = smtplib.SMTP_SSL(c['host'], c['puerto'], timeout=c['timeout'])
+        else:
+            conexion = smtplib.SMTP(c['host'], c['puerto'], timeout=c['timeout'])
+            if c['tls'] == 'starttls':
+                conexion.starttls()
+        if c['usuario']:
+            conexion.login(c['usuario'], c['contrasena'])
+        return conexion
+
+    def enviar(self, mensaje: EmailMessage):
+        try:
+            conexion = self._libres.get_nowait()
+        except queue.Empty:
+            conexion = self._conectar()
+        try:
+            conexion.send_message(mensaje)
+        except Exception as e:
+            # Un rechazo del destinatario deja la conexión utilizable; cualquier otro error la descarta.
+            if isinstance(e, smtplib.SMTPRecipientsRefused):
+                self._devolver(conexion)
+            else:
+                self._cerrar(conexion)
+            raise
+        self._devolver(conexion)
+
+    def _devolver(self, conexion):
+        with self._candado:
+            self._usos[id(conexion)] = self._usos.get(id(conexion), 0) + 1
+            agotada = self._usos[id(conexion)] >= self.config['mensajes_por_conexion']
+        if agotada:
+            self._cerrar(conexion)
+        else:
+            self._libres.put(conexion)
+
+    def _cerrar(self, conexion):
+        with self._candado:
+            self._usos.pop(id(conexion), None)
+        try:
+            conexion.quit()
+        except Exception:
+            conexion.close()
+
+    def cerrar(self):
+        while True:
+            try:
+                self._cerrar(self._libres.get_nowait())
+            except queue.Empty:
+                return
+
+
+class BitacoraEnvios:
+    # Registro persistente (SQLite) del resultado de cada envío. Permite reanudar una
+    # campaña interrumpida sin volver a mandar los reportes que ya salieron.
+    def __init__(self, ruta: str = RUTA_BITACORA_ENVIOS):
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.executescript(ESQUEMA_BITACORA_ENVIOS)
+        self._candado = threading.Lock()
+
+    def enviados(self, campana: str) -> set:
+        with self._candado:
+            filas = self._conexion.execute(
+                "SELECT clave FROM envios WHERE campana = ? AND estado = 'enviado'", (campana,)
+            ).fetchall()
+        return {clave for (clave,) in filas}
+
+    def registrar(self, campana, clave, correo, nombre, estado, intentos, error=None):
+        with self._candado, self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO envios VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (campana, clave, correo, nombre, estado, intentos, error,
+                 datetime.now().isoformat(timespec='seconds'))
+            )
+
+    def resumen(self, campana: str) -> pd.DataFrame:
+        with self._candado:
+            return pd.read_sql_query(
+                "SELECT correo, nombre, estado, intentos, error, fecha FROM envios "
+                "WHERE campana = ? ORDER BY fecha", self._conexion, params=(campana,)
+            )
+
+    def cerrar(self):
+        self._conexion.close()
+
+
+def clave_envio(correo: str, nombre: str) -> str:
+    return f"{str(correo).strip().lower()}|{str(nombre).strip()}"
+
+
+def mensaje_reporte(remitente: str, correo: str, nombre: str, pdf: bytes) -> EmailMessage:
+    mensaje = EmailMessage()
+    mensaje['From'] = remitente
+    mensaje['To'] = correo
+    mensaje['Subject'] = "Tu reporte de orientación vocacional CHASIDE"
+    mensaje.set_content(
+        f"Hola, {nombre}:\n\n"
+        "Adjuntamos tu reporte individual del cuestionario CHASIDE con tu perfil identificado "
+        "y la recomendación vocacional.\n\nSaludos."
+    )
+    mensaje.add_attachment(
+        pdf, maintype='application', subtype='pdf',
+        filename=f"perfil_CHASIDE_{str(nombre).replace(' ', '_')}.pdf"
+    )
+    return mensaje
+
+
+def enviar_reportes(envios, construir_pdf, config: dict, bitacora: BitacoraEnvios, campana: str,
+                    al_avanzar=None) -> dict:
+    # envios: dicts con 'correo' y 'nombre' (más lo que necesite construir_pdf). El PDF se
+    # genera dentro de cada tarea, justo antes de enviarse. al_avanzar(hechos, total) se llama
+    # desde el hilo que invoca esta función, así que puede actualizar la interfaz.
+    ya_enviados = bitacora.enviados(campana)
+    pendientes = [e for e in envios if clave_envio(e['correo'], e['nombre']) not in ya_enviados]
+    resumen = {'omitidos': len(envios) - len(pendientes), 'enviados': 0, 'fallidos': 0}
+
+    pool = PoolSMTP(config)
+    limitador = LimitadorTasa(config['por_minuto'], rafaga=config['conexiones'])
+
+    def enviar(envio):
+        clave = clave_envio(envio['correo'], envio['nombre'])
+        try:
+            mensaje = mensaje_reporte(config['remitente'], envio['correo'], envio['nombre'], construir_pdf(envio))
+        except Exception as e:
+            bitacora.registrar(campana, clave, envio['correo'], envio['nombre'], 'fallido', 0,
+                               f"No se pudo generar el reporte: {e}")
+            return False
+        # El primer envío más los reintentos configurados; reintentos=0 deja sólo el primero.
+        intentos = 1 + max(0, config['reintentos'])
+        for intento in range(1, intentos + 1):
+            limitador.esperar()
+            try:
+                pool.enviar(mensaje)
+            except (smtplib.SMTPException, OSError, ValueError) as e:
+                if _error_definitivo_smtp(e) or intento == intentos:
+                    bitacora.registrar(campana, clave, envio['correo'], envio['nombre'],
+                                       'fallido', intento, str(e))
+                    return False
+                time.sleep(0.5 * 2 ** (intento - 1))
+            else:
+                bitacora.registrar(campana, clave, envio['correo'], envio['nombre'], 'enviado', intento)
+                return True
+
+    try:
+        with ThreadPoolExecutor(max_workers=config['conexiones']) as ejecutor:
+            tareas = [ejecutor.submit(enviar, e) for e in pendientes]
+            for hechos, tarea in enumerate(as_completed(tareas), start=1):
+                resumen['enviados' if tarea.result() else 'fallidos'] += 1
+                if al_avanzar is not None:
+                    al_avanzar(hechos, len(tareas))
+    finally:
+        pool.cerrar()
+    return resumen
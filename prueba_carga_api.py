@@ -0,0 +1,133 @@
+# ============================================
+# PRUEBA DE CARGA · SERVICIO DE PUNTUACIÓN CHASIDE
+# Envía solicitudes concurrentes a servicio_puntuacion.py y reporta la latencia
+# (p50 / p90 / p99) de extremo a extremo y el tiempo de puntuación del servidor.
+#
+# Uso:
+#   python prueba_carga_api.py --url http://127.0.0.1:8000 --solicitudes 5000 --concurrencia 16
+#   python prueba_carga_api.py --en-proceso        # mide MotorPuntuacion sin HTTP
+# ============================================
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from motor_chaside import DEFAULT_PERFILES, process_data
+from servicio_puntuacion import N_REACTIVOS, MotorPuntuacion
+
+
+def generar_envios(n: int, semilla: int = 0) -> list:
+    rng = np.random.default_rng(semilla)
+    carreras = list(DEFAULT_PERFILES)
+    probabilidad = rng.uniform(0.2, 0.8, size=(n, 1))
+    respuestas = np.where(rng.random((n, N_REACTIVOS)) < probabilidad, 'Sí', 'No')
+    return [
+        {'respuestas': fila.tolist(), 'carrera': carreras[rng.integers(len(carreras))]}
+        for fila in respuestas
+    ]
+
+
+def cohorte_sintetica(n: int, semilla: int = 0) -> pd.DataFrame:
+    envios = generar_envios(n, semilla)
+    datos = {
+        'Marca temporal': pd.Timestamp('2025-01-01'),
+        'Dirección de correo electrónico': [f'estudiante{i}@ejemplo.mx' for i in range(n)],
+        'Ingrese su nombre completo': [f'Estudiante {i}' for i in range(n)],
+        'Seleccione su sexo': 'No especificado',
+        '¿A qué carrera desea ingresar?': [e['carrera'] for e in envios],
+        'Semestre': 1
+    }
+    items = pd.DataFrame(
+        [e['respuestas'] for e in envios],
+        columns=[f'{i}. Reactivo {i}' for i in range(1, N_REACTIVOS + 1)]
+    )
+    return pd.concat([pd.DataFrame(datos), items], axis=1)
+
+
+def resumen_latencias(nombre: str, latencias_ms) -> str:
+    lat = np.asarray(latencias_ms)
+    p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+    return (
+        f"{nombre:<28} n={len(lat):>6}  p50={p50:8.3f} ms  p90={p90:8.3f} ms  "
+        f"p99={p99:8.3f} ms  máx={lat.max():8.3f} ms"
+    )
+
+
+def lotes(envios: list, tamano: int) -> list:
+    return [envios[i:i + tamano] for i in range(0, len(envios), tamano)]
+
+
+def prueba_en_proceso(args):
+    df_ref = cohorte_sintetica(args.referencia_sintetica, semilla=1)
+    resultado = process_data(df_ref, DEFAULT_PERFILES, 0.8, 0.2)
+    motor = MotorPuntuacion(resultado, DEFAULT_PERFILES, 0.8, 0.2)
+
+    envios = generar_envios(args.solicitudes, semilla=2)
+    motor.puntuar([envios[0]['respuestas']], [envios[0]['carrera']])
+
+    latencias = []
+    inicio_total = time.perf_counter()
+    for lote in lotes(envios, args.lote):
+        inicio = time.perf_counter()
+        motor.puntuar([e['respuestas'] for e in lote], [e['carrera'] for e in lote])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    total = time.perf_counter() - inicio_total
+
+    print(resumen_latencias(f"puntuar (lote={args.lote})", latencias))
+    print(f"Rendimiento: {len(envios) / total:,.0f} envíos/s")
+
+
+def prueba_http(args):
+    envios = generar_envios(args.solicitudes, semilla=2)
+    cuerpos = [
+        lote[0] if args.lote == 1 else {'envios': lote}
+        for lote in lotes(envios, args.lote)
+    ]
+
+    limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+    with httpx.Client(base_url=args.url, limits=limites, timeout=30.0) as cliente:
+        cliente.get('/salud').raise_for_status()
+
+        def enviar(cuerpo):
+            inicio = time.perf_counter()
+            respuesta = cliente.post('/puntuar', json=cuerpo)
+            latencia = (time.perf_counter() - inicio) * 1000
+            respuesta.raise_for_status()
+            return latencia, respuesta.json()['tiempo_ms']
+
+        inicio_total = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrencia) as pool:
+            medidas = list(pool.map(enviar, cuerpos))
+        total = time.perf_counter() - inicio_total
+
+    print(resumen_latencias("HTTP extremo a extremo", [m[0] for m in medidas]))
+    print(resumen_latencias("puntuación en servidor", [m[1] for m in medidas]))
+    print(
+        f"Rendimiento: {len(cuerpos) / total:,.0f} solicitudes/s · "
+        f"{len(envios) / total:,.0f} envíos/s (lote={args.lote}, concurrencia={args.concurrencia})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de puntuación CHASIDE.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--solicitudes', type=int, default=2000, help="Número total de envíos a puntuar.")
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--lote', type=int, default=1, help="Envíos por solicitud.")
+    parser.add_argument('--en-proceso', action='store_true', help="Mide MotorPuntuacion directamente, sin HTTP.")
+    parser.add_argument('--referencia-sintetica', type=int, default=2000,
+                        help="Tamaño de la cohorte de referencia sintética en modo --en-proceso.")
+    args = parser.parse_args()
+
+    if args.en_proceso:
+        prueba_en_proceso(args)
+    else:
+        prueba_http(args)
+
+
+if __name__ == '__main__':
+    main()
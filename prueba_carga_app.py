@@ -0,0 +1,256 @@
+# ============================================
+# PRUEBA DE CARGA · APP STREAMLIT CHASIDE
+# Simula varios orientadores usando la app al mismo tiempo con la API de pruebas de
+# Streamlit (AppTest). Cada sesión recorre un guion de interacciones (cambio de página,
+# nivel y carrera, estudiante, controles deslizantes, descarga del PDF) y se mide la
+# latencia de cada reejecución. Las sesiones comparten el proceso, como en un servidor,
+# así que también comparten cachés y resultados; se reporta el crecimiento de memoria.
+#
+# Uso:
+#   python prueba_carga_app.py --sesiones 8 --rondas 3 --estudiantes 5000
+#   python prueba_carga_app.py --sesiones 1 --rondas 1        # línea base de una sola sesión
+#
+# Las descargas diferidas (data=callable) no se generan bajo AppTest porque no hay
+# servidor de archivos; su clic mide sólo la reejecución. El PDF individual sí se
+# genera durante la reejecución y entra en la medición.
+# ============================================
+
+import argparse
+import contextlib
+import os
+import resource
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from streamlit import config as config_streamlit
+from streamlit import logger as logger_streamlit
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest, app_test, local_script_runner
+
+from prueba_carga_api import cohorte_sintetica, resumen_latencias
+
+RUTA_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+# AppTest está pensado para una sesión a la vez; para correr varias en paralelo dentro del
+# mismo proceso (como en un servidor) se ajustan tres estados globales que toca en cada
+# reejecución:
+#   · crea un ScriptCache nuevo y recompila main.py en el hilo de cada sesión; compilar en
+#     paralelo no es seguro en CPython 3.11/3.12. Un servidor compila una vez en un caché
+#     compartido, y aquí se hace lo mismo.
+#   · instala un Runtime simulado al empezar y lo borra (Runtime._instance = None) al
+#     terminar, dejando sin Runtime a las sesiones que siguen corriendo. Se ignora el borrado.
+#   · activa global.appTest parchando config.get_option sólo durante cada reejecución; al
+#     terminar una sesión restaura el original y las demás dejan de guardar los format_func
+#     de sus widgets. Se activa una sola vez para todo el proceso.
+_CACHE_SCRIPT = ScriptCache()
+local_script_runner.ScriptCache = lambda: _CACHE_SCRIPT
+config_streamlit.set_option('global.appTest', True)
+app_test.patch_config_options = lambda _opciones: contextlib.nullcontext()
+
+
+class _RuntimeCompartido:
+    def __getattr__(self, nombre):
+        return getattr(Runtime, nombre)
+
+    def __setattr__(self, nombre, valor):
+        if not (nombre == '_instance' and valor is None):
+            setattr(Runtime, nombre, valor)
+
+    def __dir__(self):
+        return dir(Runtime)
+
+
+app_test.Runtime = _RuntimeCompartido()
+
+
+def memoria_rss_mb() -> float:
+    # RSS actual del proceso; fuera de Linux se usa el máximo histórico.
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MonitorMemoria:
+    def __init__(self, intervalo: float = 0.25):
+        self.intervalo = intervalo
+        self.inicial = memoria_rss_mb()
+        self.maxima = self.inicial
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            self.maxima = max(self.maxima, memoria_rss_mb())
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *_):
+        self._detener.set()
+        self._hilo.join()
+        self.final = memoria_rss_mb()
+        self.maxima = max(self.maxima, self.final)
+
+
+# -------------------------------------------------
+# GUION DE INTERACCIONES
+# -------------------------------------------------
+def _por_etiqueta(widgets, inicio: str):
+    return next(w for w in widgets if w.label.startswith(inicio))
+
+
+def _otra_opcion(widget, rng):
+    opciones = [o for o in widget.options if o != widget.value] or list(widget.options)
+    return opciones[rng.integers(len(opciones))]
+
+
+def ir_a(seccion: str):
+    def paso(at, rng):
+        at.sidebar.radio[0].set_value(seccion).run()
+    return paso
+
+
+def elegir(tipo: str, clave: str):
+    def paso(at, rng):
+        widget = getattr(at, tipo)(key=clave)
+        widget.set_value(_otra_opcion(widget, rng)).run()
+    return paso
+
+
+def mover_grupos(at, rng):
+    control = _por_etiqueta(at.sidebar.slider, "Grupos de perfil")
+    control.set_value(int(rng.integers(2, 9))).run()
+
+
+def mover_similares(at, rng):
+    at.slider(key="ind_similares_k").set_value(int(rng.integers(5, 26))).run()
+
+
+def alternar_reactivos(at, rng):
+    control = at.toggle(key="reactivos_revisar")
+    control.set_value(not control.value).run()
+
+
+def descargar_pdf(at, rng):
+    _por_etiqueta(at.get('download_button'), "⬇️ Descargar perfil").click().run()
+
+
+GUION = [
+    ("análisis general", ir_a("Análisis general")),
+    ("nivel de intensidad", elegir("segmented_control", "listado_nivel")),
+    ("carrera del Sankey", elegir("selectbox", "sankey_carrera")),
+    ("grupos de perfil (k)", mover_grupos),
+    ("información individual", ir_a("Información individual")),
+    ("carrera individual", elegir("selectbox", "ind_carrera")),
+    ("estudiante", elegir("selectbox", "ind_estudiante")),
+    ("estudiantes similares", mover_similares),
+    ("descarga del PDF", descargar_pdf),
+    ("análisis de reactivos", ir_a("Análisis de reactivos")),
+    ("reactivos a revisar", alternar_reactivos),
+]
+
+
+def sesion(numero: int, rondas: int, timeout: float) -> list:
+    rng = np.random.default_rng(numero)
+    medidas = []
+
+    def medir(nombre, accion):
+        inicio = time.perf_counter()
+        try:
+            accion()
+            error = '; '.join(str(e.value) for e in at.exception) or None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        medidas.append((nombre, (time.perf_counter() - inicio) * 1000, error))
+        return error is None
+
+    at = AppTest.from_file(RUTA_APP, default_timeout=timeout)
+    if not medir("carga inicial", at.run):
+        return medidas
+    for _ in range(rondas):
+        for nombre, paso in GUION:
+            medir(nombre, lambda: paso(at, rng))
+    return medidas
+
+
+# -------------------------------------------------
+# EJECUCIÓN
+# -------------------------------------------------
+def preparar_entorno(args) -> str:
+    directorio = tempfile.mkdtemp(prefix='chaside_carga_')
+    ruta_csv = os.path.join(directorio, 'cohorte.csv')
+    cohorte_sintetica(args.estudiantes, semilla=args.semilla).to_csv(ruta_csv, index=False)
+
+    os.environ['CHASIDE_FUENTE'] = ruta_csv
+    os.environ['CHASIDE_INSTANTANEAS'] = os.path.join(directorio, 'instantaneas')
+    if args.sin_precalentamiento:
+        os.environ['CHASIDE_PRECALENTAMIENTO'] = '0'
+    return directorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la app Streamlit CHASIDE.")
+    parser.add_argument('--sesiones', type=int, default=4, help="Sesiones simultáneas.")
+    parser.add_argument('--rondas', type=int, default=2, help="Veces que cada sesión repite el guion.")
+    parser.add_argument('--estudiantes', type=int, default=2000, help="Tamaño de la cohorte sintética.")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=300.0, help="Tiempo máximo por reejecución (s).")
+    parser.add_argument('--sin-precalentamiento', action='store_true',
+                        help="Desactiva el precalentamiento de cachés en segundo plano.")
+    args = parser.parse_args()
+
+    # Los avisos de Streamlit de cada reejecución taparían el reporte. El nivel se fija en la
+    # opción (se vuelve a aplicar si se relee la configuración) y en los loggers ya creados.
+    config_streamlit.set_option('logger.level', 'error')
+    logger_streamlit.set_log_level('error')
+    directorio = preparar_entorno(args)
+    print(f"Cohorte sintética de {args.estudiantes:,} estudiantes en {directorio}")
+
+    with MonitorMemoria() as memoria:
+        inicio_total = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sesiones) as pool:
+            resultados = list(pool.map(
+                lambda n: sesion(n, args.rondas, args.timeout), range(args.sesiones)
+            ))
+        total = time.perf_counter() - inicio_total
+
+    por_interaccion = defaultdict(list)
+    errores = []
+    for medidas in resultados:
+        for nombre, latencia, error in medidas:
+            por_interaccion[nombre].append(latencia)
+            if error:
+                errores.append(f"{nombre}: {error}")
+
+    print()
+    for nombre in ["carga inicial"] + [nombre for nombre, _ in GUION]:
+        if por_interaccion[nombre]:
+            print(resumen_latencias(nombre, por_interaccion[nombre]))
+    print(resumen_latencias("todas las reejecuciones", [x for lat in por_interaccion.values() for x in lat]))
+
+    n_interacciones = sum(len(m) for m in resultados)
+    print(
+        f"\n{args.sesiones} sesiones · {n_interacciones:,} interacciones en {total:.1f} s "
+        f"({n_interacciones / total:.1f} reejecuciones/s)"
+    )
+    print(
+        f"Memoria RSS: inicial {memoria.inicial:,.0f} MB · máxima {memoria.maxima:,.0f} MB · "
+        f"final {memoria.final:,.0f} MB · crecimiento por sesión "
+        f"{(memoria.final - memoria.inicial) / args.sesiones:,.1f} MB"
+    )
+    if errores:
+        print(f"\n{len(errores)} interacciones con error:")
+        for error in errores[:20]:
+            print(f"  {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+# ============================================
+# SERVICIO DE PUNTUACIÓN CHASIDE
+# API HTTP local para puntuar envíos individuales o por lote con las mismas reglas
+# que process_data. Las salidas relativas a la cohorte (umbrales de calidad por
+# cuantil y nivel de intensidad) se resuelven contra una cohorte de referencia
+# procesada una sola vez al arrancar.
+#
+# Uso:
+#   python servicio_puntuacion.py --referencia "https://docs.google.com/.../export?format=csv"
+#
+#   POST /puntuar  {"respuestas": [98 valores], "carrera": "Arquitectura"}
+#   POST /puntuar  {"envios": [{"respuestas": [...], "carrera": "..."}, ...]}
+#   GET  /salud
+# ============================================
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from motor_chaside import (
+    AREAS,
+    INTERESES_ITEMS,
+    APTITUDES_ITEMS,
+    DEFAULT_PERFILES,
+    CAT_MAP_LARGO,
+    CRITERIOS_DUPLICADOS,
+    CRITERIO_DUPLICADOS,
+    MAPEO_RESPUESTAS,
+    N_REACTIVOS,
+    ETIQUETAS_SEMAFORO,
+    parsear_fuentes,
+    cargar_fuentes,
+    depurar_duplicados,
+    process_data,
+    calcular_indicadores_calidad,
+    resolver_umbrales_calidad,
+    marcar_calidad,
+    compilar_perfiles,
+    TablasNormativas,
+    compilar_catalogo,
+    recomendar_compilado,
+    clasificar_combinado
+)
+
+
+def matrices_reactivos():
+    w_int = np.zeros((N_REACTIVOS, len(AREAS)), dtype=np.int64)
+    w_apt = np.zeros((N_REACTIVOS, len(AREAS)), dtype=np.int64)
+    for k, a in enumerate(AREAS):
+        w_int[[i - 1 for i in INTERESES_ITEMS[a]], k] = 1
+        w_apt[[i - 1 for i in APTITUDES_ITEMS[a]], k] = 1
+    return w_int, w_apt
+
+
+def codificar_respuesta(valor) -> int:
+    # Misma normalización que process_data: texto reconocido → 0/1, número → entero, resto → 0.
+    if isinstance(valor, bool):
+        return int(valor)
+    if isinstance(valor, (int, float)):
+        return 0 if valor != valor else int(valor)
+    texto = str(valor).strip().lower()
+    if texto in MAPEO_RESPUESTAS:
+        return MAPEO_RESPUESTAS[texto]
+    try:
+        return int(float(texto))
+    except ValueError:
+        return 0
+
+
+def percentiles_json(percentiles) -> dict:
+    # Sin norma para la carrera → null (NaN no es JSON válido).
+    return {a: (round(float(p), 1) if p == p else None) for a, p in zip(AREAS, percentiles)}
+
+
+def recomendaciones_json(nombres, indices, afinidad, margen) -> list:
+    return [
+        {'carrera': nombres[c], 'afinidad': round(a, 4), 'margen': round(m, 4) if m == m else None}
+        for c, a, m in zip(indices.tolist(), afinidad.tolist(), margen.tolist())
+    ]
+
+
+class MotorPuntuacion:
+    def __init__(self, resultado_referencia, perfil_carreras: dict, peso_intereses: float,
+                 peso_aptitudes: float, criterios_calidad: dict = None):
+        df_ref, _, columnas_items, columna_carrera, _, _ = resultado_referencia
+
+        self.peso_intereses = float(peso_intereses)
+        self.peso_aptitudes = float(peso_aptitudes)
+        self.w_int, self.w_apt = matrices_reactivos()
+        self.claves_interes = [f'INTERES_{a}' for a in AREAS]
+        self.claves_aptitud = [f'APTITUD_{a}' for a in AREAS]
+        self.claves_combinado = [f'PUNTAJE_COMBINADO_{a}' for a in AREAS]
+        self.tabla_respuestas = {
+            **{variante: v for k, v in MAPEO_RESPUESTAS.items() for variante in (k, k.upper(), k.capitalize())},
+            0: 0, 1: 1
+        }
+        self.compilado = compilar_perfiles(perfil_carreras)
+        self.catalogo = compilar_catalogo(perfil_carreras)
+        self.n_referencia = len(df_ref)
+        self.normas = TablasNormativas.desde_resultado(resultado_referencia)
+
+        indicadores_ref = calcular_indicadores_calidad(df_ref[columnas_items].to_numpy())
+        self.umbrales_calidad = resolver_umbrales_calidad(indicadores_ref, criterios_calidad)
+
+        # Scores ordenados por (carrera, semáforo) para ubicar el nivel de intensidad por búsqueda binaria.
+        en_intensidad = df_ref[df_ref['Semáforo Vocacional'].isin(['Verde', 'Amarillo'])]
+        self.referencia_intensidad = {
+            (carrera, semaforo): np.sort(grupo['Score'].to_numpy(dtype=float))
+            for (carrera, semaforo), grupo in en_intensidad.groupby(
+                [en_intensidad[columna_carrera].astype(str).str.strip(), 'Semáforo Vocacional']
+            )
+        }
+
+    @classmethod
+    def desde_fuentes(cls, texto_fuentes: str, perfil_carreras: dict = None, peso_intereses: float = 0.8,
+                      peso_aptitudes: float = 0.2, criterios_calidad: dict = None,
+                      criterio_duplicados: str = CRITERIO_DUPLICADOS):
+        perfil_carreras = perfil_carreras or DEFAULT_PERFILES
+        df_raw, _ = depurar_duplicados(cargar_fuentes(parsear_fuentes(texto_fuentes)), criterio_duplicados)
+        resultado = process_data(df_raw, perfil_carreras, peso_intereses, peso_aptitudes, criterios_calidad)
+        return cls(resultado, perfil_carreras, peso_intereses, peso_aptitudes, criterios_calidad)
+
+    def nivel_intensidad(self, carrera: str, semaforo: str, score: float):
+        if semaforo not in ('Verde', 'Amarillo'):
+            return None
+        referencia = self.referencia_intensidad.get((carrera, semaforo), np.empty(0))
+        rank_pct = (np.searchsorted(referencia, score, side='left') + 1) / (len(referencia) + 1)
+        if semaforo == 'Amarillo':
+            return 'Sin perfil' if rank_pct <= 0.25 else 'Perfil en riesgo'
+        return 'Jóven promesa' if rank_pct > 0.75 else 'Perfil en transición'
+
+    def puntuar(self, respuestas, carreras) -> list:
+        tabla = self.tabla_respuestas
+        items = np.asarray(
+            [[tabla[v] if v in tabla else codificar_respuesta(v) for v in fila] for fila in respuestas],
+            dtype=np.int64
+        ).reshape(-1, N_REACTIVOS)
+        carreras = [str(c).strip() for c in carreras]
+
+        interes = items @ self.w_int
+        aptitud = items @ self.w_apt
+        combinado = interes * self.peso_intereses + aptitud * self.peso_aptitudes
+
+        indicadores = calcular_indicadores_calidad(items)
+        no_confiable, marcas = marcar_calidad(indicadores, self.umbrales_calidad)
+
+        idx_carrera = [self.compilado['indice'].get(c, -1) for c in carreras]
+        area_idx, semaforo_idx, destino_idx = clasificar_combinado(
+            combinado[None], idx_carrera, no_confiable, self.compilado
+        )
+        score = combinado.max(axis=1)
+        percentil_cohorte = self.normas.percentiles(combinado)
+        percentil_carrera = self.normas.percentiles_lote(combinado, carreras)
+        rec = recomendar_compilado(
+            combinado, self.catalogo, idx_elegida=[self.catalogo['indice'].get(c, -1) for c in carreras]
+        )
+
+        marcas_por_fila = [
+            '; '.join(e for e, m in marcas.items() if m[i]) if no_confiable[i] else ''
+            for i in range(len(carreras))
+        ]
+        nombres = self.compilado['nombres']
+
+        resultados = []
+        for i, carrera in enumerate(carreras):
+            semaforo = ETIQUETAS_SEMAFORO[semaforo_idx[0, i]]
+            destino = int(destino_idx[0, i])
+            resultados.append({
+                'carrera': carrera,
+                **dict(zip(self.claves_interes, interes[i].tolist())),
+                **dict(zip(self.claves_aptitud, aptitud[i].tolist())),
+                **dict(zip(self.claves_combinado, combinado[i].tolist())),
+                'Area_Fuerte_Ponderada': AREAS[area_idx[0, i]],
+                'Score': float(score[i]),
+                'Semáforo Vocacional': semaforo,
+                'Categoría': CAT_MAP_LARGO.get(semaforo, semaforo),
+                'Nivel_Intensidad': self.nivel_intensidad(carrera, semaforo, score[i]),
+                'Destino_Compatible': nombres[destino] if destino >= 0 else carrera,
+                'Percentil_Carrera': percentiles_json(percentil_carrera[i]),
+                'Percentil_Cohorte': percentiles_json(percentil_cohorte[i]),
+                'Carreras_Recomendadas': recomendaciones_json(
+                    rec['nombres'], rec['indices'][i], rec['afinidad'][i], rec['margen'][i]
+                ),
+                'Lugar_Carrera_Elegida': int(rec['lugar_elegida'][i]) or None,
+                'Respondio_Siempre_Igual': bool(no_confiable[i]),
+                'Motivo_No_Confiable': marcas_por_fila[i]
+            })
+        return resultados
+
+
+def crear_manejador(motor: MotorPuntuacion):
+    class ManejadorPuntuacion(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _responder(self, estado: int, cuerpo: dict):
+            datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+            self.send_response(estado)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_GET(self):
+            if self.path == '/salud':
+                self._responder(200, {'estado': 'ok', 'cohorte_referencia': motor.n_referencia})
+            else:
+                self._responder(404, {'error': f'Ruta no encontrada: {self.path}'})
+
+        def do_POST(self):
+            if self.path != '/puntuar':
+                self._responder(404, {'error': f'Ruta no encontrada: {self.path}'})
+                return
+            try:
+                largo = int(self.headers.get('Content-Length', 0))
+                solicitud = json.loads(self.rfile.read(largo) or b'{}')
+                envios = solicitud['envios'] if 'envios' in solicitud else [solicitud]
+                for envio in envios:
+                    if len(envio.get('respuestas', [])) != N_REACTIVOS:
+                        raise ValueError(f"Cada envío debe incluir {N_REACTIVOS} respuestas.")
+
+                inicio = time.perf_counter()
+                resultados = motor.puntuar(
+                    [e['respuestas'] for e in envios],
+                    [e.get('carrera', '') for e in envios]
+                )
+                tiempo_ms = (time.perf_counter() - inicio) * 1000
+            except (ValueError, KeyError, TypeError) as e:
+                self._responder(400, {'error': str(e)})
+                return
+
+            cuerpo = {'resultados': resultados} if 'envios' in solicitud else dict(resultados[0])
+            cuerpo['tiempo_ms'] = tiempo_ms
+            self._responder(200, cuerpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    return ManejadorPuntuacion
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio local de puntuación CHASIDE.")
+    parser.add_argument('--referencia', required=True,
+                        help="Fuente(s) de la cohorte de referencia; varias separadas por salto de línea "
+                             "con el formato 'Campus | URL'.")
+    parser.add_argument('--perfiles', help="JSON con el perfil esperado por carrera (por defecto DEFAULT_PERFILES).")
+    parser.add_argument('--peso-intereses', type=float, default=0.8)
+    parser.add_argument('--peso-aptitudes', type=float, default=0.2)
+    parser.add_argument('--duplicados', choices=list(CRITERIOS_DUPLICADOS), default=CRITERIO_DUPLICADOS,
+                        help="Envío que se conserva cuando un estudiante de la referencia contestó más de una vez.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8000)
+    args = parser.parse_args()
+
+    perfiles = DEFAULT_PERFILES
+    if args.perfiles:
+        with open(args.perfiles, encoding='utf-8') as f:
+            perfiles = json.load(f)
+
+    motor = MotorPuntuacion.desde_fuentes(
+        args.referencia, perfiles, args.peso_intereses, args.peso_aptitudes,
+        criterio_duplicados=args.duplicados
+    )
+    servidor = ThreadingHTTPServer((args.host, args.puerto), crear_manejador(motor))
+    print(f"Servicio CHASIDE escuchando en http://{args.host}:{args.puerto} "
+          f"(cohorte de referencia: {motor.n_referencia} estudiantes)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()